@@ -1,6 +1,6 @@
 from fastapi import FastAPI, HTTPException, UploadFile, File
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel
 from typing import List, Optional, Dict, Any
 from dataclasses import dataclass
@@ -8,19 +8,30 @@ import uvicorn
 import asyncio
 from datetime import datetime
 import uuid
+import os
 
 # 导入自定义模块
 try:
     from .models.script_parser import ScriptParser
-    from .models.character_generator import CharacterGenerator
+    from .models.character_generator import CharacterGenerator, MAX_CANDIDATES
     from .models.scene_generator import SceneGenerator
     from .models.video_generator import VideoGenerator
+    from .models.quality_tiers import QUALITY_TIERS, get_quality_tier
+    from .models.warmup import StartupWarmup
+    from .models.shared_weights import PREFORK_PARENT_ENV, memory_report, child_pids
+    from .models.model_store import get_model_store
+    from .models.voice_bank import get_voice_bank
 except ImportError:
     # 直接运行时使用绝对导入
     from models.script_parser import ScriptParser
-    from models.character_generator import CharacterGenerator
+    from models.character_generator import CharacterGenerator, MAX_CANDIDATES
     from models.scene_generator import SceneGenerator
     from models.video_generator import VideoGenerator
+    from models.quality_tiers import QUALITY_TIERS, get_quality_tier
+    from models.warmup import StartupWarmup
+    from models.shared_weights import PREFORK_PARENT_ENV, memory_report, child_pids
+    from models.model_store import get_model_store
+    from models.voice_bank import get_voice_bank
 
 # 简化的数据模型
 @dataclass
@@ -75,6 +86,9 @@ character_generator = CharacterGenerator()
 scene_generator = SceneGenerator()
 video_generator = VideoGenerator()
 
+# 启动预热与就绪状态（AI_VIDEO_WARMUP=1 时预热完成前 /ready 返回 503）
+startup_warmup = StartupWarmup()
+
 # 任务状态存储 (实际应用中应该使用数据库或Redis)
 task_status = {}
 
@@ -89,6 +103,18 @@ class CharacterRequest(BaseModel):
     name: str
     description: str
     voice_model: Optional[str] = "default"
+    quality: Optional[str] = None
+    num_candidates: int = 1  # 候选形象数，大于 1 时返回候选缩略图供选择
+
+class CandidateSelectRequest(BaseModel):
+    candidate: int  # 候选序号
+
+class VoiceExtractRequest(BaseModel):
+    references: Dict[str, str]  # 音色ID -> 参考音频路径
+
+class SpeechPreviewRequest(BaseModel):
+    text: str
+    voice_model: Optional[str] = "default"
 
 class CharacterWithImageRequest(BaseModel):
     name: str
@@ -96,16 +122,73 @@ class CharacterWithImageRequest(BaseModel):
     voice_model: Optional[str] = "default"
     image_path: Optional[str] = None
 
+class SceneVariationRequest(BaseModel):
+    asset_id: str  # 场景生成返回的资产ID
+    variation: str  # 变体描述: 时间 / 天气 / 视角，如 "夜晚"、"下雨"
+    strength: float = 0.35  # 重绘强度 (0, 1]，越小越接近原图、耗时越短
+    quality: Optional[str] = None
+
 class VideoGenerationRequest(BaseModel):
     script_id: str
-    quality: str = "high"
+    quality: Optional[str] = None  # 质量档位: draft / standard / high，未指定时使用部署默认档位
     duration: int = 30
 
+def resolve_quality(quality: Optional[str]):
+    """校验质量档位（draft / standard / high），未指定时使用部署默认档位"""
+    try:
+        return get_quality_tier(quality)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def character_candidates(character) -> Optional[Dict[str, Any]]:
+    """角色候选形象信息（单张生成时为 None）"""
+    candidates = character.metadata.get("candidates")
+    if not candidates:
+        return None
+    return {
+        "id": character.id,
+        "selected": character.metadata.get("selected", 0),
+        "candidates": [
+            {"index": c["index"], "image_path": c["image_path"], "thumbnail_path": c["thumbnail_path"]}
+            for c in candidates
+        ],
+    }
+
+@app.on_event("startup")
+async def warmup_pipelines():
+    """后台预热已加载的管线，避免首个请求承担内核初始化开销"""
+    startup_warmup.start({
+        **video_generator.warmup_targets(),
+        **character_generator.warmup_targets(),
+        **scene_generator.warmup_targets(),
+    })
+
 # API端点
+@app.get("/ready")
+async def readiness():
+    """就绪检查：预热完成前返回 503，负载均衡器据此摘除冷节点"""
+    status = {**startup_warmup.status(), "cold_start": get_model_store().cold_start_report()}
+    return JSONResponse(status_code=200 if status["ready"] else 503, content=status)
+
+@app.get("/api/system/memory")
+async def system_memory():
+    """进程内存报告；预分叉模式下汇总父进程与全部工作进程，展示权重共享效果"""
+    parent = os.environ.get(PREFORK_PARENT_ENV)
+    pids = [int(parent), *child_pids(int(parent))] if parent else [os.getpid()]
+    return {"prefork": bool(parent), **memory_report(pids), "residency": video_generator.residency.stats()}
+
 @app.get("/")
 async def root():
     return {"message": "AI视频生成工具API服务", "version": "1.0.0"}
 
+@app.get("/api/quality-tiers")
+async def list_quality_tiers():
+    """列出可用的质量档位及其采样参数"""
+    return {
+        "default": get_quality_tier().name,
+        "tiers": {name: tier.to_dict() for name, tier in QUALITY_TIERS.items()}
+    }
+
 @app.post("/api/scripts/parse")
 async def parse_script(request: ScriptRequest):
     """解析剧本文本"""
@@ -148,8 +231,15 @@ async def parse_script(request: ScriptRequest):
 async def generate_character(request: CharacterRequest):
     """生成角色形象"""
     try:
-        # 生成角色形象
-        character = character_generator.generate_character(request.description)
+        tier = resolve_quality(request.quality)
+        if not 1 <= request.num_candidates <= MAX_CANDIDATES:
+            raise HTTPException(status_code=400, detail=f"候选数需在 1 到 {MAX_CANDIDATES} 之间")
+        
+        # 生成角色形象（在线程池中运行，并发请求由 SDXL 微批处理器合批）
+        character = await asyncio.to_thread(
+            character_generator.generate_character, request.description,
+            quality=tier.name, num_candidates=request.num_candidates
+        )
         
         # 保存角色信息
         character_id = str(uuid.uuid4())
@@ -172,25 +262,78 @@ async def generate_character(request: CharacterRequest):
                 "voice_model": character_data.voice_model,
                 "created_at": character_data.created_at.isoformat()
             },
+            "quality": tier.name,
+            "candidate_set": character_candidates(character),
             "message": "角色生成成功"
         }
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"角色生成失败: {str(e)}")
 
+@app.post("/api/characters/candidates/{candidate_set_id}/select")
+async def select_character_candidate(candidate_set_id: str, request: CandidateSelectRequest):
+    """从候选形象中选定一张作为角色形象（无需重新生成）"""
+    try:
+        character = await asyncio.to_thread(
+            character_generator.select_candidate, candidate_set_id, request.candidate
+        )
+        return {
+            "appearance_path": character.image_path,
+            "candidate_set": character_candidates(character),
+            "message": "候选形象已选定"
+        }
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e.args[0]) if e.args else "角色不存在")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"候选形象选定失败: {str(e)}")
+
+@app.get("/api/voices")
+async def list_voices():
+    """列出声音库中已登记的音色（voice_model 可用的 ID）"""
+    return {"voices": get_voice_bank().voices()}
+
+@app.post("/api/voices/extract")
+async def extract_voices(request: VoiceExtractRequest):
+    """从参考音频批量提取说话人嵌入并登记为音色（同一段音频只提取一次）"""
+    try:
+        sources = await asyncio.to_thread(get_voice_bank().extract, request.references)
+        return {"voices": sources, "message": "音色登记成功"}
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=400, detail=f"参考音频不存在: {e.filename}")
+    except ImportError as e:
+        raise HTTPException(status_code=503, detail=f"音色提取依赖未安装: {str(e)}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"音色提取失败: {str(e)}")
+
+@app.post("/api/voices/stream")
+async def stream_speech(request: SpeechPreviewRequest):
+    """台词试听：逐句合成，以分块 WAV 流式返回（每合成完一句即下发，无需等整句合成完成）"""
+    if not request.text.strip():
+        raise HTTPException(status_code=400, detail="台词不能为空")
+    chunks = video_generator.stream_speech(request.text, request.voice_model)
+    if chunks is None:
+        raise HTTPException(status_code=503, detail="TTS模型未加载")
+    # 同步迭代器由 Starlette 在线程池中逐块执行，合成不阻塞事件循环
+    return StreamingResponse(chunks, media_type="audio/wav")
+
 @app.post("/api/characters/generate-with-image")
 async def generate_character_with_image(request: CharacterWithImageRequest):
     """使用指定图片生成角色形象"""
     try:
         if request.image_path:
             # 使用指定图片生成角色
-            character = character_generator.generate_character_with_image(
+            character = await asyncio.to_thread(
+                character_generator.generate_character_with_image,
                 request.description, 
                 request.image_path,
                 request.name
             )
         else:
             # 使用默认生成方式
-            character = character_generator.generate_character(request.description)
+            character = await asyncio.to_thread(character_generator.generate_character, request.description)
         
         # 保存角色信息
         character_id = str(uuid.uuid4())
@@ -219,15 +362,17 @@ async def generate_character_with_image(request: CharacterWithImageRequest):
         raise HTTPException(status_code=500, detail=f"角色生成失败: {str(e)}")
 
 @app.post("/api/scenes/generate")
-async def generate_scene(scene_description: Optional[str] = None):
+async def generate_scene(scene_description: Optional[str] = None, quality: Optional[str] = None):
     """生成场景"""
     try:
+        tier = resolve_quality(quality)
+        
         # 如果没有提供场景描述，使用默认值
         if not scene_description:
             scene_description = "默认场景"
         
-        # 生成场景
-        scene = scene_generator.generate_scene(scene_description)
+        # 生成场景（在线程池中运行，并发请求由 SDXL 微批处理器合批）
+        scene = await asyncio.to_thread(scene_generator.generate_scene, scene_description, quality=tier.name)
         
         scene_id = str(uuid.uuid4())
         scene_data = Scene(
@@ -245,15 +390,55 @@ async def generate_scene(scene_description: Optional[str] = None):
                 "background_path": scene_data.background_path,
                 "created_at": scene_data.created_at.isoformat()
             },
+            "asset_id": scene.metadata.get("asset_id"),
+            "quality": tier.name,
             "message": "场景生成成功"
         }
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"场景生成失败: {str(e)}")
 
+@app.post("/api/scenes/variations")
+async def generate_scene_variation(request: SceneVariationRequest):
+    """从已生成场景的缓存潜变量派生时间 / 天气 / 视角变体"""
+    try:
+        tier = resolve_quality(request.quality)
+        
+        scene = await asyncio.to_thread(
+            scene_generator.generate_variation,
+            request.asset_id, request.variation, strength=request.strength, quality=tier.name
+        )
+        
+        return {
+            "scene_id": scene.id,
+            "scene": {
+                "id": scene.id,
+                "description": scene.description,
+                "background_path": scene.background_path,
+                "created_at": datetime.utcnow().isoformat()
+            },
+            "asset_id": scene.metadata["asset_id"],
+            "parent_asset_id": scene.metadata["parent_asset_id"],
+            "steps": scene.metadata["steps"],
+            "quality": tier.name,
+            "message": "场景变体生成成功"
+        }
+    except HTTPException:
+        raise
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e.args[0]) if e.args else "场景资产不存在")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"场景变体生成失败: {str(e)}")
+
 @app.post("/api/videos/generate")
 async def generate_video(request: VideoGenerationRequest):
     """生成视频"""
     try:
+        tier = resolve_quality(request.quality)
+        
         # 创建任务ID
         task_id = str(uuid.uuid4())
         
@@ -261,17 +446,21 @@ async def generate_video(request: VideoGenerationRequest):
         task_status[task_id] = {
             "status": "processing",
             "progress": 0,
-            "message": "任务已启动"
+            "message": "任务已启动",
+            "quality": tier.to_dict()
         }
         
         # 启动异步处理
-        asyncio.create_task(process_video_generation(task_id, request))
+        asyncio.create_task(process_video_generation(task_id, request, tier))
         
         return {
             "task_id": task_id,
             "status": "processing",
+            "quality": tier.name,
             "message": "视频生成任务已启动"
         }
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"视频生成失败: {str(e)}")
 
@@ -287,6 +476,7 @@ async def get_video_status(task_id: str):
         "status": status["status"],
         "progress": status["progress"],
         "message": status["message"],
+        "quality": status.get("quality"),
         "estimated_time": "2分钟" if status["status"] == "processing" else None
     }
 
@@ -300,10 +490,10 @@ async def download_video(task_id: str):
         "message": "视频生成完成"
     }
 
-async def process_video_generation(task_id: str, request: VideoGenerationRequest):
-    """异步处理视频生成"""
+async def process_video_generation(task_id: str, request: VideoGenerationRequest, tier):
+    """异步处理视频生成（模拟进度：剧本尚未持久化，无法按 script_id 取回剧本交给视频生成器）"""
     try:
-        print(f"视频生成任务 {task_id} 开始...")
+        print(f"视频生成任务 {task_id} 开始（{tier.name}）...")
         
         # 更新进度
         task_status[task_id]["progress"] = 10
@@ -0,0 +1,165 @@
+from typing import Dict, List, Optional, Sequence
+from dataclasses import dataclass, field
+import numpy as np
+
+# 缓动曲线：输入输出均为 [0, 1] 区间的数组
+EASINGS = {
+    "linear": lambda t: t,
+    "ease_in": lambda t: t * t,
+    "ease_out": lambda t: 1.0 - (1.0 - t) ** 2,
+    "ease_in_out": lambda t: t * t * (3.0 - 2.0 * t),
+    "step": lambda t: np.floor(t),
+}
+EASING_NAMES = list(EASINGS)
+
+# 角色可动画属性及默认值（x、y 为角色图像中心点坐标）
+PROPERTIES = ("x", "y", "scale", "opacity")
+PROPERTY_DEFAULTS = {"scale": 1.0, "opacity": 1.0}
+
+
+@dataclass
+class Keyframe:
+    """关键帧"""
+    time: float  # 相对场景开始的时间（秒）
+    value: float
+    easing: str = "linear"  # 从本关键帧过渡到下一关键帧使用的缓动曲线
+
+
+@dataclass
+class CharacterTransforms:
+    """预计算的角色变换数组，形状均为 (角色数, 帧数)"""
+    x: np.ndarray
+    y: np.ndarray
+    scale: np.ndarray
+    opacity: np.ndarray
+
+    @property
+    def num_frames(self) -> int:
+        return self.x.shape[1]
+
+    def tile_rects(self, tile_size: int) -> np.ndarray:
+        """计算每个角色每帧的图像区域 (left, top, right, bottom)，形状 (角色数, 帧数, 4)"""
+        size = np.maximum(np.rint(tile_size * self.scale), 1).astype(np.int32)
+        left = np.rint(self.x - size / 2).astype(np.int32)
+        top = np.rint(self.y - size / 2).astype(np.int32)
+        return np.stack([left, top, left + size, top + size], axis=-1)
+
+
+@dataclass
+class AnimationTimeline:
+    """关键帧动画时间线 - 对一个场景内所有角色、所有帧批量求值
+
+    每个 (角色, 属性) 是一条轨道。求值时所有轨道的关键帧被打包成补齐的二维数组，
+    通过一次广播比较定位每帧所在的关键帧区间，再按缓动曲线插值，
+    整个场景的变换只需少量 NumPy 运算，合成阶段逐帧读取即可。
+    """
+    character_ids: List[str]
+    base_x: Sequence[float]
+    base_y: Sequence[float]
+    tracks: Dict[tuple, List[Keyframe]] = field(default_factory=dict)
+
+    def add_keyframe(self, character_id: str, prop: str, time: float, value: float, easing: str = "linear"):
+        """添加关键帧"""
+        if prop not in PROPERTIES:
+            raise ValueError(f"不支持的动画属性: {prop}")
+        if easing not in EASINGS:
+            raise ValueError(f"不支持的缓动曲线: {easing}")
+        if character_id not in self.character_ids:
+            raise ValueError(f"未知角色: {character_id}")
+
+        track = self.tracks.setdefault((character_id, prop), [])
+        track.append(Keyframe(time=float(time), value=float(value), easing=easing))
+        track.sort(key=lambda keyframe: keyframe.time)
+
+    def evaluate(self, num_frames: int, fps: float) -> CharacterTransforms:
+        """批量计算所有角色所有帧的变换"""
+        num_characters = len(self.character_ids)
+        values = {
+            "x": np.repeat(np.asarray(self.base_x, dtype=np.float64).reshape(-1, 1), num_frames, axis=1),
+            "y": np.repeat(np.asarray(self.base_y, dtype=np.float64).reshape(-1, 1), num_frames, axis=1),
+            "scale": np.full((num_characters, num_frames), PROPERTY_DEFAULTS["scale"]),
+            "opacity": np.full((num_characters, num_frames), PROPERTY_DEFAULTS["opacity"]),
+        }
+
+        tracks = [(key, keyframes) for key, keyframes in self.tracks.items() if keyframes]
+        if tracks and num_frames > 0:
+            curves = self._interpolate([keyframes for _, keyframes in tracks], np.arange(num_frames) / fps)
+            for (character_id, prop), curve in zip((key for key, _ in tracks), curves):
+                values[prop][self.character_ids.index(character_id)] = curve
+
+        values["opacity"] = np.clip(values["opacity"], 0.0, 1.0)
+        values["scale"] = np.maximum(values["scale"], 0.0)
+        return CharacterTransforms(**values)
+
+    @staticmethod
+    def _interpolate(tracks: List[List[Keyframe]], times: np.ndarray) -> np.ndarray:
+        """对多条轨道批量插值，返回形状 (轨道数, 帧数)"""
+        max_keys = max(len(track) for track in tracks)
+        key_times = np.full((len(tracks), max_keys), np.inf)
+        key_values = np.zeros((len(tracks), max_keys))
+        key_easings = np.zeros((len(tracks), max_keys), dtype=np.int64)
+        counts = np.array([len(track) for track in tracks])
+
+        for i, track in enumerate(tracks):
+            key_times[i, :len(track)] = [keyframe.time for keyframe in track]
+            key_values[i, :len(track)] = [keyframe.value for keyframe in track]
+            key_easings[i, :len(track)] = [EASING_NAMES.index(keyframe.easing) for keyframe in track]
+            # 补齐位置沿用最后一个值，超出最后关键帧时保持不变
+            key_values[i, len(track):] = track[-1].value
+
+        # 每帧所在区间的起始关键帧下标
+        start = (key_times[:, None, :] <= times[None, :, None]).sum(axis=-1) - 1
+        start = np.clip(start, 0, None)
+        end = np.minimum(start + 1, counts[:, None] - 1)
+
+        rows = np.arange(len(tracks))[:, None]
+        t0, t1 = key_times[rows, start], key_times[rows, end]
+        v0, v1 = key_values[rows, start], key_values[rows, end]
+
+        # 只在有后续关键帧的区间上计算进度，避免单关键帧轨道除以零
+        moving = end > start
+        span = np.where(moving, t1 - t0, 1.0)
+        progress = np.zeros(span.shape)
+        np.divide(times[None, :] - t0, span, out=progress, where=moving & (span > 0))
+        progress = np.clip(progress, 0.0, 1.0)
+        # 首个关键帧之前保持首值
+        progress = np.where(times[None, :] < key_times[:, :1], 0.0, progress)
+
+        easing_ids = key_easings[rows, start]
+        eased = np.select(
+            [easing_ids == index for index in range(len(EASING_NAMES))],
+            [EASINGS[name](progress) for name in EASING_NAMES],
+            default=progress
+        )
+        return v0 + (v1 - v0) * eased
+
+    @classmethod
+    def from_spec(cls, character_ids: List[str], base_positions: List[tuple], tile_size: int,
+                  spec: Optional[List[Dict]] = None) -> "AnimationTimeline":
+        """根据场景动画描述创建时间线
+
+        spec 格式: [{"character": "char_0", "property": "x",
+                     "keyframes": [{"time": 0, "value": 300, "easing": "ease_out"}, {"time": 2, "value": 900}]}]
+        base_positions 为角色图像左上角坐标，未设置动画的属性保持静止布局。
+        """
+        timeline = cls(
+            character_ids=list(character_ids),
+            base_x=[x + tile_size / 2 for x, _ in base_positions],
+            base_y=[y + tile_size / 2 for _, y in base_positions],
+        )
+        for track in spec or []:
+            character_id = track.get("character")
+            if isinstance(character_id, int):
+                character_id = character_ids[character_id] if character_id < len(character_ids) else None
+            if character_id not in timeline.character_ids:
+                continue
+            for keyframe in track.get("keyframes") or []:
+                try:
+                    timeline.add_keyframe(
+                        character_id, track["property"], keyframe["time"], keyframe["value"],
+                        keyframe.get("easing", "linear")
+                    )
+                except (KeyError, TypeError, ValueError, AttributeError) as e:
+                    # 单个关键帧无效时跳过，不影响其他轨道和整个场景的渲染
+                    print(f"⚠️ 跳过无效的动画关键帧 {keyframe}: {e!r}")
+        return timeline
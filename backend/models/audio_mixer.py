@@ -0,0 +1,284 @@
+import os
+from math import gcd
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .env_config import env_float
+from .ffmpeg_utils import run_ffmpeg
+
+# 背景音乐文件（为空表示不加背景音乐）、背景音乐电平与对白出现时的额外压低量（dB）
+MUSIC_BED_ENV = "AI_VIDEO_MUSIC_BED"
+MUSIC_GAIN_DB_ENV = "AI_VIDEO_MUSIC_GAIN_DB"
+DUCK_DB_ENV = "AI_VIDEO_DUCK_DB"
+DEFAULT_MUSIC_GAIN_DB = -20.0
+DEFAULT_DUCK_DB = -10.0
+# 响度归一化目标（LUFS，ITU-R BS.1770 积分响度）
+TARGET_LUFS_ENV = "AI_VIDEO_TARGET_LUFS"
+DEFAULT_TARGET_LUFS = -16.0
+
+# 混音采样率与分块长度：整条音轨按固定长度的块生成，内存占用与视频时长无关
+MIX_SAMPLE_RATE = 48000
+MIX_BLOCK_SIZE = MIX_SAMPLE_RATE
+
+# 片段首尾淡入淡出（秒），相邻片段重叠时在重叠区间内做等功率交叉淡化
+CLIP_FADE = 0.01
+# 背景音乐在片头片尾的淡入淡出（秒）
+MUSIC_FADE = 1.0
+# 闪避（sidechain ducking）：对白电平超过阈值时压低背景音乐，按 10ms 一帧平滑
+DUCK_THRESHOLD_DB = -45.0
+DUCK_ATTACK = 0.05
+DUCK_RELEASE = 0.5
+# 归一化最大增益与峰值上限（dBFS）：增益同时受峰值上限约束，归一化后不会削波
+MAX_NORMALIZE_GAIN_DB = 20.0
+PEAK_CEILING_DB = -1.0
+
+# BS.1770 K 计权滤波器（48kHz）：高频搁架 + 高通
+_K_WEIGHTING = (
+    (np.array([1.53512485958697, -2.69169618940638, 1.19839281085285]),
+     np.array([1.0, -1.69065929318241, 0.73248077421585])),
+    (np.array([1.0, -2.0, 1.0]),
+     np.array([1.0, -1.99004745483398, 0.99007225036621])),
+)
+
+
+def resample(audio: np.ndarray, source_rate: int, target_rate: int) -> np.ndarray:
+    """多相滤波重采样（整数比 up/down，一次向量化完成）"""
+    if source_rate == target_rate:
+        return np.asarray(audio, dtype=np.float32)
+    from scipy.signal import resample_poly
+
+    divisor = gcd(target_rate, source_rate)
+    return resample_poly(audio, target_rate // divisor, source_rate // divisor).astype(np.float32)
+
+
+def db_to_gain(db: float) -> float:
+    return float(10 ** (db / 20))
+
+
+class LoudnessMeter:
+    """流式积分响度测量（ITU-R BS.1770：K 计权、400ms 块 75% 重叠、绝对 / 相对门限）
+
+    只保存每 100ms 的均方值，测量一小时音频也只需几万个浮点数。
+    """
+
+    def __init__(self, sample_rate: int = MIX_SAMPLE_RATE):
+        if sample_rate != MIX_SAMPLE_RATE:
+            raise ValueError(f"K 计权滤波器系数按 {MIX_SAMPLE_RATE}Hz 设计: {sample_rate}")
+        self.step = sample_rate // 10
+        self._states = [np.zeros(len(a) - 1) for _, a in _K_WEIGHTING]
+        self._pending = np.zeros(0, dtype=np.float64)
+        self._powers: List[float] = []
+
+    def add(self, block: np.ndarray):
+        from scipy.signal import lfilter
+
+        weighted = np.asarray(block, dtype=np.float64)
+        for stage, (b, a) in enumerate(_K_WEIGHTING):
+            weighted, self._states[stage] = lfilter(b, a, weighted, zi=self._states[stage])
+
+        weighted = np.concatenate([self._pending, weighted])
+        usable = len(weighted) // self.step * self.step
+        if usable:
+            self._powers.extend(np.mean(weighted[:usable].reshape(-1, self.step) ** 2, axis=1))
+        self._pending = weighted[usable:]
+
+    def integrated(self) -> Optional[float]:
+        """积分响度（LUFS），全程低于绝对门限（静音）时返回 None"""
+        if len(self._powers) < 4:
+            return None
+        powers = np.asarray(self._powers)
+        blocks = np.convolve(powers, np.ones(4) / 4, mode="valid")  # 400ms 块，步长 100ms
+        loudness = -0.691 + 10 * np.log10(np.maximum(blocks, 1e-12))
+
+        gated = blocks[loudness > -70.0]
+        if not len(gated):
+            return None
+        relative = -0.691 + 10 * np.log10(np.mean(gated)) - 10.0
+        gated = blocks[(loudness > -70.0) & (loudness > relative)]
+        return float(-0.691 + 10 * np.log10(np.mean(gated)))
+
+
+class AudioMixer:
+    """分块音频混音器
+
+    把对白片段按时间轴放到音轨上（片段首尾淡入淡出，重叠处交叉淡化），叠加可选的循环背景音乐，
+    对白出现时按对白电平压低背景音乐，最后归一化到目标响度（增益不超过峰值余量）。
+    整条音轨按固定长度的块生成两遍：第一遍测量响度与峰值，第二遍施加增益并逐块写入文件。
+    """
+
+    def __init__(self, music_path: Optional[str] = None, music_gain_db: Optional[float] = None,
+                 duck_db: Optional[float] = None, target_lufs: Optional[float] = None,
+                 sample_rate: int = MIX_SAMPLE_RATE, block_size: int = MIX_BLOCK_SIZE):
+        """
+        :param music_path: 背景音乐文件，默认读取环境变量 AI_VIDEO_MUSIC_BED，为空时不加背景音乐
+        :param music_gain_db: 背景音乐电平，默认读取环境变量 AI_VIDEO_MUSIC_GAIN_DB，未设置时为 -20 dB
+        :param duck_db: 对白出现时背景音乐的额外压低量，默认读取环境变量 AI_VIDEO_DUCK_DB，未设置时为 -10 dB
+        :param target_lufs: 响度目标，默认读取环境变量 AI_VIDEO_TARGET_LUFS，未设置时为 -16 LUFS
+        """
+        self.music_path = music_path or os.environ.get(MUSIC_BED_ENV) or None
+        self.music_gain_db = music_gain_db if music_gain_db is not None else env_float(
+            MUSIC_GAIN_DB_ENV, DEFAULT_MUSIC_GAIN_DB)
+        self.duck_db = duck_db if duck_db is not None else env_float(DUCK_DB_ENV, DEFAULT_DUCK_DB)
+        self.target_lufs = target_lufs if target_lufs is not None else env_float(TARGET_LUFS_ENV, DEFAULT_TARGET_LUFS)
+        self.sample_rate = sample_rate
+        self.hop = sample_rate // 100  # 闪避包络的帧长（10ms）
+        self.block_size = max(block_size // self.hop, 1) * self.hop
+        self._music: Optional[np.ndarray] = None
+
+    # ------------------------------------------------------------------
+    # 混音
+    # ------------------------------------------------------------------
+
+    def mix_to_file(self, clips: Sequence[Any], duration: float, output_path: str) -> Dict[str, Any]:
+        """
+        混音并写出 16 位 WAV
+
+        :param clips: 带 audio / sample_rate / start 的语音片段（SpeechClip）
+        :param duration: 音轨总时长（秒），通常与视频时长一致
+        :return: 混音统计（响度、归一化增益、峰值等）
+        """
+        import soundfile as sf
+
+        placed = self._place_clips(clips)
+        total = int(round(duration * self.sample_rate))
+
+        meter = LoudnessMeter(self.sample_rate)
+        source_peak = 0.0
+        for block in self.blocks(placed, total):
+            meter.add(block)
+            source_peak = max(source_peak, float(np.max(np.abs(block))) if len(block) else 0.0)
+        loudness = meter.integrated()
+
+        # 响度目标需要的增益受峰值余量限制（无前瞻限幅器，宁可略低于目标响度也不削波）
+        gain_db = 0.0 if loudness is None else min(self.target_lufs - loudness, MAX_NORMALIZE_GAIN_DB)
+        headroom_db = PEAK_CEILING_DB - 20 * np.log10(source_peak) if source_peak > 0 else None
+        peak_limited = bool(headroom_db is not None and gain_db > headroom_db)
+        if peak_limited:
+            gain_db = float(headroom_db)
+
+        gain, ceiling, peak = db_to_gain(gain_db), db_to_gain(PEAK_CEILING_DB), 0.0
+        with sf.SoundFile(output_path, "w", samplerate=self.sample_rate, channels=1, subtype="PCM_16") as f:
+            for block in self.blocks(placed, total):
+                block = np.clip(block * gain, -ceiling, ceiling)
+                peak = max(peak, float(np.max(np.abs(block))) if len(block) else 0.0)
+                f.write(block)
+
+        return {
+            "duration": round(total / self.sample_rate, 3),
+            "sample_rate": self.sample_rate,
+            "clips": len(placed),
+            "music": self.music_path if self._load_music() is not None else None,
+            "loudness_lufs": round(loudness, 2) if loudness is not None else None,
+            "gain_db": round(gain_db, 2),
+            "peak_limited": peak_limited,
+            "peak_dbfs": round(float(20 * np.log10(peak)), 2) if peak > 0 else None,  # 写出后的峰值
+        }
+
+    def blocks(self, placed: List[Tuple[int, np.ndarray]], total: int) -> Iterator[np.ndarray]:
+        """逐块生成混音（未归一化），每块 block_size 个采样"""
+        music = self._load_music()
+        music_fade = max(int(MUSIC_FADE * self.sample_rate), 1)
+        duck_gain = db_to_gain(self.duck_db)
+        threshold = db_to_gain(DUCK_THRESHOLD_DB) ** 2
+        attack = np.exp(-self.hop / (DUCK_ATTACK * self.sample_rate))
+        release = np.exp(-self.hop / (DUCK_RELEASE * self.sample_rate))
+        level = 1.0  # 闪避增益状态（跨块延续）
+        previous = level  # 上一块最后一帧的闪避增益
+        first = 0  # 第一个可能与当前块重叠的片段
+
+        for start in range(0, total, self.block_size):
+            length = min(self.block_size, total - start)
+            dialogue = np.zeros(length, dtype=np.float32)
+            while first < len(placed) and placed[first][0] + len(placed[first][1]) <= start:
+                first += 1
+            for offset, audio in placed[first:]:
+                if offset >= start + length:
+                    break
+                lo, hi = max(offset, start), min(offset + len(audio), start + length)
+                if hi > lo:
+                    dialogue[lo - start:hi - start] += audio[lo - offset:hi - offset]
+
+            if music is None:
+                yield dialogue
+                continue
+
+            # 侧链：按 10ms 帧计算对白电平（向量化），超过阈值的帧目标增益为 duck_gain；
+            # 起音 / 释放平滑是逐帧递推，用 Python 循环（每秒 100 次迭代）
+            frames = -(-length // self.hop)
+            padded = np.zeros(frames * self.hop, dtype=np.float32)
+            padded[:length] = dialogue
+            active = np.mean(padded.reshape(frames, self.hop) ** 2, axis=1) > threshold
+            gains = np.empty(frames, dtype=np.float32)
+            for i, speaking in enumerate(active):
+                target = duck_gain if speaking else 1.0
+                coefficient = attack if target < level else release
+                level = target + (level - target) * coefficient
+                gains[i] = level
+            envelope = np.interp(np.arange(length), np.arange(-1, frames) * self.hop + self.hop - 1,
+                                 np.concatenate([[previous], gains]))
+            previous = gains[-1]
+
+            positions = np.arange(start, start + length)
+            fade = np.minimum(np.minimum(positions, total - positions) / music_fade, 1.0)
+            bed = np.take(music, positions, mode="wrap")
+            yield dialogue + (bed * envelope * fade).astype(np.float32)
+
+    def _place_clips(self, clips: Sequence[Any]) -> List[Tuple[int, np.ndarray]]:
+        """片段重采样到混音采样率并加上淡入淡出包络，按起始采样排序"""
+        placed = sorted(
+            ((int(round(clip.start * self.sample_rate)), resample(clip.audio, clip.sample_rate, self.sample_rate))
+             for clip in clips if len(clip.audio)),
+            key=lambda item: item[0],
+        )
+        fade = int(CLIP_FADE * self.sample_rate)
+
+        result = []
+        for i, (offset, audio) in enumerate(placed):
+            overlap_before = placed[i - 1][0] + len(placed[i - 1][1]) - offset if i > 0 else 0
+            overlap_after = offset + len(audio) - placed[i + 1][0] if i + 1 < len(placed) else 0
+            fade_in = min(max(fade, overlap_before), len(audio) // 2)
+            fade_out = min(max(fade, overlap_after), len(audio) // 2)
+
+            audio = audio.copy()
+            # 等功率曲线：重叠区间内前一片段淡出、后一片段淡入，总功率不变
+            if fade_in:
+                audio[:fade_in] *= np.sin(0.5 * np.pi * np.arange(fade_in) / fade_in)
+            if fade_out:
+                audio[len(audio) - fade_out:] *= np.cos(0.5 * np.pi * (np.arange(fade_out) + 1) / fade_out)
+            result.append((offset, audio))
+        return result
+
+    def _load_music(self) -> Optional[np.ndarray]:
+        """读取背景音乐（单声道、混音采样率、已施加电平），在音轨中循环播放"""
+        if self._music is None and self.music_path:
+            try:
+                import soundfile as sf
+
+                audio, rate = sf.read(self.music_path, dtype="float32", always_2d=True)
+                self._music = resample(audio.mean(axis=1), rate, self.sample_rate) * db_to_gain(self.music_gain_db)
+            except Exception as e:
+                print(f"⚠️ 背景音乐读取失败，不加背景音乐: {e}")
+                self.music_path = None
+        return self._music if self._music is not None and len(self._music) else None
+
+
+def mux_audio_track(video_path: str, audio_path: str, output_path: str, bitrate: str = "192k") -> Optional[str]:
+    """将混音封装为视频的 AAC 音轨（视频流直接复制，不重新编码）
+
+    :return: 输出视频路径，失败返回 None
+    """
+    temp_path = f"{os.path.splitext(output_path)[0]}.audio_tmp.mp4"
+    success = run_ffmpeg([
+        "-i", video_path, "-i", audio_path,
+        "-map", "0:v", "-map", "1:a",
+        "-c:v", "copy", "-c:a", "aac", "-b:a", bitrate,
+        temp_path
+    ])
+    if not success:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        return None
+
+    os.replace(temp_path, output_path)
+    return output_path
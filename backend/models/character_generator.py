@@ -1,11 +1,26 @@
 import os
 import json
-from typing import Dict, Any, Optional
+import shutil
+from typing import Dict, Any, List, Optional
 from dataclasses import dataclass
 import uuid
 from PIL import Image
 import numpy as np
 
+from .inference_profile import get_inference_profile
+from .memory_planner import MemoryPlanner
+from .quality_tiers import get_quality_tier
+from .prompt_embedding_cache import get_prompt_embedding_cache
+from .warmup import sdxl_warmup
+from .model_store import get_model_store
+from .sdxl_batcher import SDXLMicroBatcher
+
+CHARACTER_NEGATIVE_PROMPT = "low quality, blurry, distorted, deformed, worst quality, bad anatomy"
+
+# 单次请求的候选形象数上限与候选缩略图尺寸
+MAX_CANDIDATES = 8
+THUMBNAIL_SIZE = (256, 256)
+
 @dataclass
 class Character:
     id: str
@@ -28,27 +43,31 @@ class CharacterGenerator:
         
         # 初始化AI模型
         self.sd_model = None
+        self.profile = get_inference_profile()
+        self.prompt_cache = get_prompt_embedding_cache()
         self._init_ai_models()
         
+        # 并发请求合批生成（同尺寸、同档位的请求合成一次管线调用）
+        self.batcher = SDXLMicroBatcher(self.sd_model, self.profile, self.prompt_cache) if self.sd_model else None
+        
         print(f"角色生成器初始化完成，模型路径: {model_path}")
     
     def _init_ai_models(self):
         """初始化AI模型"""
         try:
-            import torch
             from diffusers import StableDiffusionXLPipeline
             
             print("🔄 正在加载角色生成模型...")
             
-            self.sd_model = StableDiffusionXLPipeline.from_pretrained(
-                self.model_path,
-                torch_dtype=torch.float16,
-                variant="fp16",
-                use_safetensors=True
-            )
+            memory_plan = MemoryPlanner(self.profile).plan(["sdxl"], {"sdxl": (512, 512)})
+            memory_plan.report()
             
-            if torch.cuda.is_available():
-                self.sd_model = self.sd_model.to("cuda")
+            self.sd_model = get_model_store().load_pipeline(
+                self.model_path, StableDiffusionXLPipeline,
+                use_safetensors=True,
+                **self.profile.pretrained_kwargs()
+            )
+            self.sd_model = memory_plan.get("sdxl").apply(self.sd_model, self.profile)
             
             print("✅ Stable Diffusion XL 角色生成模型加载成功")
             
@@ -56,6 +75,14 @@ class CharacterGenerator:
             print(f"⚠️ 角色生成模型加载失败，使用占位模式: {e}")
             self.sd_model = None
     
+    def warmup_targets(self) -> Dict[str, Any]:
+        """已加载管线的预热任务"""
+        if not self.sd_model:
+            return {}
+        tier = get_quality_tier()
+        return {"character.sdxl": sdxl_warmup(self.sd_model, self.profile, self.prompt_cache, tier.image_size(512, 512),
+                                              tier, CHARACTER_NEGATIVE_PROMPT)}
+    
     def _load_character_templates(self) -> Dict[str, Dict[str, Any]]:
         """加载角色模板"""
         templates = {
@@ -88,8 +115,18 @@ class CharacterGenerator:
         }
         return templates
     
-    def generate_character(self, description: str, name: str = "") -> Character:
-        """根据描述生成角色形象"""
+    def generate_character(self, description: str, name: str = "", quality: Optional[str] = None,
+                           num_candidates: int = 1) -> Character:
+        """
+        根据描述生成角色形象
+        
+        :param quality: 质量档位，默认使用部署配置
+        :param num_candidates: 候选形象数；大于 1 时一次管线调用生成全部候选（共享提示词编码），
+                               存于同一角色 ID 下并附缩略图，默认选中第一张，可用 select_candidate 切换
+        """
+        tier = get_quality_tier(quality)
+        if not 1 <= num_candidates <= MAX_CANDIDATES:
+            raise ValueError(f"候选数需在 1 到 {MAX_CANDIDATES} 之间: {num_candidates}")
         try:
             # 解析角色描述
             char_info = self._parse_character_description(description)
@@ -101,7 +138,14 @@ class CharacterGenerator:
             prompt = self._build_character_prompt(char_info)
             
             # 生成角色图像
-            image_path = self._generate_character_image(prompt, character_id)
+            metadata = dict(char_info)
+            if num_candidates > 1:
+                candidates = self._generate_character_candidates(prompt, character_id, tier, num_candidates)
+                image_path = os.path.join(self.output_dir, f"{character_id}.png")
+                shutil.copyfile(candidates[0]["image_path"], image_path)
+                metadata.update(candidates=candidates, selected=0)
+            else:
+                image_path = self._generate_character_image(prompt, character_id, tier)
             
             # 创建角色对象
             character = Character(
@@ -110,7 +154,7 @@ class CharacterGenerator:
                 description=description,
                 image_path=image_path,
                 voice_model=self._select_voice_model(char_info),
-                metadata=char_info
+                metadata=metadata
             )
             
             # 保存角色信息
@@ -123,6 +167,21 @@ class CharacterGenerator:
             # 返回默认角色
             return self._create_default_character(description, name)
     
+    def select_candidate(self, character_id: str, index: int) -> Character:
+        """选定角色的候选形象（复制为角色主图像）"""
+        character = self.get_character(character_id)
+        if character is None:
+            raise KeyError(f"角色不存在: {character_id}")
+        
+        candidates = character.metadata.get("candidates") or []
+        if not 0 <= index < len(candidates):
+            raise ValueError(f"候选序号无效: {index}（共 {len(candidates)} 个候选）")
+        
+        shutil.copyfile(candidates[index]["image_path"], character.image_path)
+        character.metadata["selected"] = index
+        self._save_character_info(character)
+        return character
+    
     def generate_character_with_image(self, description: str, image_path: str, name: str = "") -> Character:
         """根据描述和指定图片路径生成角色"""
         try:
@@ -138,7 +197,6 @@ class CharacterGenerator:
             
             # 复制图片到角色目录
             new_image_path = os.path.join(self.output_dir, f"{character_id}.png")
-            import shutil
             shutil.copy2(image_path, new_image_path)
             
             # 创建角色对象
@@ -239,33 +297,26 @@ class CharacterGenerator:
         
         return ", ".join(prompt_parts)
     
-    def _generate_character_image(self, prompt: str, character_id: str) -> str:
+    def _generate_character_image(self, prompt: str, character_id: str, tier=None) -> str:
         """生成角色图像"""
         image_path = os.path.join(self.output_dir, f"{character_id}.png")
+        tier = tier or get_quality_tier()
         
         if self.sd_model:
             # 使用AI模型生成角色图像
             try:
-                print(f"🎨 正在生成角色图像: {prompt[:50]}...")
+                print(f"🎨 正在生成角色图像（{tier.name}）: {prompt[:50]}...")
                 
-                # 生成图像
-                result = self.sd_model(
-                    prompt=prompt,
-                    negative_prompt="low quality, blurry, distorted, deformed, worst quality, bad anatomy",
-                    num_inference_steps=30,
-                    guidance_scale=7.5,
-                    width=512,
-                    height=512
-                )
+                # 生成图像（经微批处理器与并发请求合批；模板拼接的提示词高度重复，文本编码结果走缓存）
+                width, height = tier.image_size(512, 512)
+                image = self.batcher.generate(prompt, width, height, tier, CHARACTER_NEGATIVE_PROMPT)
                 
                 # 检查结果
-                if hasattr(result, 'images') and len(result.images) > 0:
-                    image = result.images[0]
-                    image.save(image_path)
-                    print(f"✅ 角色图像生成成功: {image_path}")
-                    return image_path
-                else:
+                if image is None:
                     raise Exception("生成结果为空")
+                image.save(image_path)
+                print(f"✅ 角色图像生成成功: {image_path}")
+                return image_path
                     
             except Exception as e:
                 print(f"⚠️ AI角色图像生成失败: {e}")
@@ -277,6 +328,39 @@ class CharacterGenerator:
             self._create_placeholder_image(image_path, prompt)
             return image_path
     
+    def _generate_character_candidates(self, prompt: str, character_id: str, tier, num_candidates: int) -> List[Dict[str, Any]]:
+        """一次管线调用生成多张候选图像（num_images_per_prompt），保存原图与缩略图"""
+        images = []
+        if self.sd_model:
+            try:
+                print(f"🎨 正在生成 {num_candidates} 个候选角色形象（{tier.name}）: {prompt[:50]}...")
+                width, height = tier.image_size(512, 512)
+                images = self.batcher.generate_candidates(
+                    prompt, width, height, tier, num_candidates, CHARACTER_NEGATIVE_PROMPT
+                )
+            except Exception as e:
+                print(f"⚠️ AI候选形象生成失败: {e}")
+        
+        candidates = []
+        for index in range(len(images) or 1):
+            image_path = os.path.join(self.output_dir, f"{character_id}_candidate_{index}.png")
+            if images:
+                images[index].save(image_path)
+            else:
+                # 模型不可用或生成失败时只返回一个占位候选
+                self._create_placeholder_image(image_path, prompt)
+            
+            thumbnail_path = os.path.join(self.output_dir, f"{character_id}_candidate_{index}_thumb.jpg")
+            with Image.open(image_path) as image:
+                thumbnail = image.convert("RGB")
+                thumbnail.thumbnail(THUMBNAIL_SIZE)
+                thumbnail.save(thumbnail_path, quality=85)
+            
+            candidates.append({"index": index, "image_path": image_path, "thumbnail_path": thumbnail_path})
+        
+        print(f"✅ 候选角色形象生成完成: {len(candidates)} 个")
+        return candidates
+    
     def _create_placeholder_image(self, image_path: str, prompt: str):
         """创建占位图像（用于演示）"""
         # 创建一个简单的彩色图像作为占位符
@@ -0,0 +1,276 @@
+import os
+import time
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional
+from dataclasses import dataclass, field
+
+from .inference_profile import get_inference_profile
+from .memory_planner import MemoryPlanner, available_memory_mb
+
+
+@dataclass
+class DiffusionJob:
+    """调度任务"""
+    model: str  # 任务所需模型（sdxl / svd / tts）
+    fn: Callable[["WorkerSlot"], Any]  # 在槽位上执行的函数，参数为所在槽位
+    future: Future = field(default_factory=Future)
+    submitted_at: float = field(default_factory=time.perf_counter)
+
+
+class WorkerSlot:
+    """工作槽位 - 一个计算设备（或一组CPU核心）及其任务队列和常驻模型"""
+
+    def __init__(self, device: str, memory_mb: int, cpu_cores: Optional[List[int]] = None):
+        """
+        :param device: 设备标识（如 cuda:0、cpu:0，测试时可使用任意假设备名）
+        :param memory_mb: 槽位可用于模型的内存（MB）
+        :param cpu_cores: CPU 槽位绑定的核心编号
+        """
+        self.device = device
+        self.memory_mb = memory_mb
+        self.cpu_cores = cpu_cores
+        self.resident: "OrderedDict[str, Any]" = OrderedDict()  # 常驻模型，按最近使用排序
+        self.queue: deque = deque()
+        self.running: Optional[DiffusionJob] = None
+        self.used_mb = 0
+        self.stats = {"jobs": 0, "loads": 0, "evictions": 0, "busy_time": 0.0, "load_time": 0.0}
+
+    @property
+    def free_memory_mb(self) -> int:
+        return self.memory_mb - self.used_mb
+
+    @property
+    def pending(self) -> int:
+        return len(self.queue) + (1 if self.running else 0)
+
+    def get_model(self, model: str) -> Any:
+        """获取槽位上常驻的模型对象"""
+        return self.resident.get(model)
+
+
+class DeviceScheduler:
+    """设备感知的多工作槽调度器
+
+    每个计算设备（或CPU核心组）是一个工作槽，拥有独立的任务队列和工作线程。
+    提交任务时按以下优先级选择槽位：所需模型已常驻（免加载）> 排队任务少 > 剩余内存多，
+    内存放不下所需模型的槽位不参与调度。槽位内模型按 LRU 换出以腾出内存。
+    """
+
+    def __init__(self, slots: List[WorkerSlot],
+                 loader: Optional[Callable[[WorkerSlot, str], Any]] = None,
+                 unloader: Optional[Callable[[WorkerSlot, str, Any], None]] = None,
+                 model_memory: Optional[Dict[str, int]] = None,
+                 max_lookahead: int = 8):
+        """
+        :param slots: 工作槽位列表
+        :param loader: 在槽位上加载模型的函数，返回模型对象
+        :param unloader: 从槽位卸载模型的函数
+        :param model_memory: 覆盖默认的模型内存估计（MB），默认为内存规划器按当前推理配置估算的各管线峰值
+        :param max_lookahead: 取任务时为匹配常驻模型最多向后查看的任务数（限制插队，避免饿死）
+        """
+        if not slots:
+            raise ValueError("至少需要一个工作槽位")
+
+        self.slots = slots
+        self.loader = loader or (lambda slot, model: model)
+        self.unloader = unloader
+        self.model_memory = dict(MemoryPlanner().peak_mb(), **(model_memory or {}))
+        self.max_lookahead = max_lookahead
+
+        self._condition = threading.Condition()
+        self._shutdown = False
+        self._started_at = time.perf_counter()
+        self._threads = [
+            threading.Thread(target=self._worker, args=(slot,), name=f"slot-{slot.device}", daemon=True)
+            for slot in self.slots
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    @classmethod
+    def from_devices(cls, devices: List[str], memory_mb: int, **kwargs) -> "DeviceScheduler":
+        """根据设备列表创建调度器（设备名可以是假的，便于在纯CPU机器上测试）"""
+        return cls([WorkerSlot(device, memory_mb) for device in devices], **kwargs)
+
+    @classmethod
+    def detect(cls, cores_per_cpu_slot: int = 8, cpu_memory_mb: Optional[int] = None, **kwargs) -> "DeviceScheduler":
+        """探测本机设备：每块 GPU 一个槽位；没有 GPU 时按核心数划分 CPU 槽位"""
+        slots = []
+        try:
+            import torch
+            if torch.cuda.is_available():
+                for index in range(torch.cuda.device_count()):
+                    free_bytes, _ = torch.cuda.mem_get_info(index)
+                    slots.append(WorkerSlot(f"cuda:{index}", free_bytes // (1024 * 1024)))
+        except Exception as e:
+            print(f"⚠️ GPU 探测失败: {e}")
+
+        if not slots:
+            cores = sorted(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else list(range(os.cpu_count() or 1))
+            groups = [cores[i:i + cores_per_cpu_slot] for i in range(0, len(cores), cores_per_cpu_slot)]
+            memory_mb = cpu_memory_mb or available_memory_mb()
+            for index, group in enumerate(groups):
+                slots.append(WorkerSlot(f"cpu:{index}", memory_mb // len(groups), cpu_cores=group))
+
+        return cls(slots, **kwargs)
+
+    def submit(self, model: str, fn: Callable[[WorkerSlot], Any]) -> Future:
+        """提交任务，返回 Future"""
+        job = DiffusionJob(model=model, fn=fn)
+        with self._condition:
+            if self._shutdown:
+                raise RuntimeError("调度器已关闭")
+            slot = self._route(model)
+            slot.queue.append(job)
+            self._condition.notify_all()
+        return job.future
+
+    def _route(self, model: str) -> WorkerSlot:
+        """为任务选择槽位"""
+        required = self.model_memory.get(model, 0)
+        candidates = [slot for slot in self.slots if slot.memory_mb >= required]
+        if not candidates:
+            raise ValueError(f"没有内存足够运行 {model} 的槽位（需要 {required} MB）")
+
+        def score(slot: WorkerSlot):
+            # 模型已常驻或将被队列中的任务加载时无需额外加载；需要换出其他模型时代价更高
+            warm = model in slot.resident or any(job.model == model for job in slot.queue)
+            cost = slot.pending
+            if not warm:
+                cost += 1 if slot.free_memory_mb >= required else 2
+            return (cost, not warm, -slot.free_memory_mb)
+
+        return min(candidates, key=score)
+
+    def _worker(self, slot: WorkerSlot):
+        """槽位工作线程"""
+        if slot.cpu_cores and hasattr(os, "sched_setaffinity"):
+            try:
+                # Linux 下对调用线程生效，将 CPU 槽位绑定到对应核心组
+                os.sched_setaffinity(0, slot.cpu_cores)
+            except OSError as e:
+                print(f"⚠️ 绑定CPU核心失败: {e}")
+        if slot.cpu_cores:
+            try:
+                import torch
+                # 槽位内的推理线程数与核心组大小一致（OpenMP 线程数对调用线程生效）
+                torch.set_num_threads(len(slot.cpu_cores))
+            except ImportError:
+                pass
+
+        while True:
+            with self._condition:
+                while not slot.queue and not self._shutdown:
+                    self._condition.wait()
+                if not slot.queue:
+                    return
+                job = self._next_job(slot)
+                slot.running = job
+
+            if not job.future.set_running_or_notify_cancel():
+                slot.running = None
+                continue
+
+            start = time.perf_counter()
+            try:
+                self._ensure_resident(slot, job.model)
+                job.future.set_result(job.fn(slot))
+            except BaseException as e:
+                job.future.set_exception(e)
+            finally:
+                with self._condition:
+                    slot.stats["jobs"] += 1
+                    slot.stats["busy_time"] += time.perf_counter() - start
+                    slot.running = None
+
+    def _next_job(self, slot: WorkerSlot) -> DiffusionJob:
+        """取出下一个任务：在前 max_lookahead 个任务中优先选择模型已常驻的，减少换入换出"""
+        for index, job in enumerate(slot.queue):
+            if index >= self.max_lookahead:
+                break
+            if job.model in slot.resident:
+                del slot.queue[index]
+                return job
+        return slot.queue.popleft()
+
+    def _ensure_resident(self, slot: WorkerSlot, model: str):
+        """确保模型常驻槽位，内存不足时按 LRU 换出其他模型"""
+        if model in slot.resident:
+            slot.resident.move_to_end(model)
+            return
+
+        required = self.model_memory.get(model, 0)
+        while slot.resident and slot.free_memory_mb < required:
+            evicted, instance = slot.resident.popitem(last=False)
+            if self.unloader:
+                self.unloader(slot, evicted, instance)
+            slot.used_mb -= self.model_memory.get(evicted, 0)
+            slot.stats["evictions"] += 1
+
+        start = time.perf_counter()
+        slot.resident[model] = self.loader(slot, model)
+        slot.used_mb += required
+        slot.stats["loads"] += 1
+        slot.stats["load_time"] += time.perf_counter() - start
+
+    def metrics(self) -> Dict[str, Any]:
+        """各槽位的利用率、任务数和模型加载统计"""
+        elapsed = max(time.perf_counter() - self._started_at, 1e-9)
+        with self._condition:
+            slots = {
+                slot.device: {
+                    **{key: round(value, 4) if isinstance(value, float) else value for key, value in slot.stats.items()},
+                    "utilisation": round(slot.stats["busy_time"] / elapsed, 4),
+                    "queued": len(slot.queue),
+                    "resident": list(slot.resident),
+                    "free_memory_mb": slot.free_memory_mb,
+                }
+                for slot in self.slots
+            }
+        return {
+            "slots": slots,
+            "mean_utilisation": round(sum(slot["utilisation"] for slot in slots.values()) / len(slots), 4),
+        }
+
+    def shutdown(self, wait: bool = True):
+        """关闭调度器（已排队任务会执行完）"""
+        with self._condition:
+            self._shutdown = True
+            self._condition.notify_all()
+        if wait:
+            for thread in self._threads:
+                thread.join()
+
+
+
+_default_scheduler: Optional[DeviceScheduler] = None
+_default_pid: Optional[int] = None
+_default_lock = threading.Lock()
+
+
+def get_device_scheduler() -> DeviceScheduler:
+    """
+    进程内共享的调度器：视频生成的 SDXL / TTS 任务经由它排队
+
+    生成器的每条管线只有一份实例，由驻留管理器放在推理配置选定的设备上，因此这里只建该设备一个槽位，
+    内存为内存规划器的预算（至少能放下规划后最大的单条管线）；CPU 槽位绑定本进程可用的全部核心。
+    多设备分发（DeviceScheduler.detect 的多槽位）需要按槽位各放一份管线，不在此处使用。
+    实际的换入换出由驻留管理器负责，槽位的常驻记录用于让同一模型的任务相邻执行，减少换入换出。
+    工作线程不跨 fork 继承，fork 后的子进程首次使用时重新创建。
+    """
+    global _default_scheduler, _default_pid
+    with _default_lock:
+        if _default_scheduler is None or _default_pid != os.getpid():
+            profile = get_inference_profile()
+            planner = MemoryPlanner(profile)
+            model_memory = planner.peak_mb()
+            budget = planner.host_budget_mb if profile.device == "cpu" else planner.device_budget_mb
+            cpu_cores = None
+            if profile.device == "cpu":
+                cpu_cores = sorted(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else list(range(os.cpu_count() or 1))
+            slot = WorkerSlot(profile.device, max(budget, max(model_memory.values())), cpu_cores=cpu_cores)
+            _default_scheduler = DeviceScheduler([slot], model_memory=model_memory)
+            _default_pid = os.getpid()
+        return _default_scheduler
@@ -0,0 +1,26 @@
+import os
+from typing import Optional
+
+
+def env_int(name: str, default: Optional[int] = None) -> Optional[int]:
+    """读取整数环境变量；未设置或格式错误时返回默认值（格式错误会打印警告，不中断启动）"""
+    value = os.environ.get(name)
+    if not value:
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        print(f"⚠️ 环境变量 {name} 不是整数: {value}" + (f"，使用默认值 {default}" if default is not None else ""))
+        return default
+
+
+def env_float(name: str, default: Optional[float] = None) -> Optional[float]:
+    """读取浮点数环境变量；未设置或格式错误时返回默认值（格式错误会打印警告，不中断启动）"""
+    value = os.environ.get(name)
+    if not value:
+        return default
+    try:
+        return float(value)
+    except ValueError:
+        print(f"⚠️ 环境变量 {name} 不是数值: {value}" + (f"，使用默认值 {default}" if default is not None else ""))
+        return default
@@ -0,0 +1,38 @@
+import shutil
+import subprocess
+from typing import List, Optional
+
+
+def find_ffmpeg() -> Optional[str]:
+    """查找 ffmpeg 可执行文件（优先系统 PATH，其次 moviepy 依赖的 imageio-ffmpeg）"""
+    path = shutil.which("ffmpeg")
+    if path:
+        return path
+
+    try:
+        import imageio_ffmpeg
+        return imageio_ffmpeg.get_ffmpeg_exe()
+    except Exception:
+        return None
+
+
+def run_ffmpeg(args: List[str], timeout: Optional[float] = None) -> bool:
+    """运行 ffmpeg 命令，成功返回 True"""
+    ffmpeg = find_ffmpeg()
+    if not ffmpeg:
+        print("⚠️ 未找到 ffmpeg")
+        return False
+
+    try:
+        result = subprocess.run(
+            [ffmpeg, "-hide_banner", "-loglevel", "error", "-y", *args],
+            capture_output=True, text=True, timeout=timeout
+        )
+    except Exception as e:
+        print(f"⚠️ ffmpeg 执行失败: {e}")
+        return False
+
+    if result.returncode != 0:
+        print(f"⚠️ ffmpeg 执行失败: {result.stderr.strip()}")
+        return False
+    return True
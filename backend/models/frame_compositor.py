@@ -0,0 +1,179 @@
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from dataclasses import dataclass
+from PIL import Image, ImageDraw
+
+# 矩形区域 (left, top, right, bottom)，右、下边界不包含
+Rect = Tuple[int, int, int, int]
+
+
+@dataclass
+class Layer:
+    """合成图层"""
+    name: str
+    rect: Rect  # 图层在画面中占据的区域
+    key: Any  # 图层内容标识，变化即视为该区域损坏
+    draw: Callable[[Image.Image, Tuple[int, int]], None]  # 在画布上绘制，参数为画布左上角在画面中的坐标
+
+
+def image_layer(name: str, image: Image.Image, position: Tuple[int, int], key: Any = None) -> Layer:
+    """创建图像图层（RGBA图像按自身透明度合成）"""
+    x, y = position
+    mask = image if image.mode == 'RGBA' else None
+
+    def draw(canvas: Image.Image, offset: Tuple[int, int]):
+        canvas.paste(image, (x - offset[0], y - offset[1]), mask)
+
+    return Layer(
+        name=name,
+        rect=(x, y, x + image.width, y + image.height),
+        key=(id(image), position) if key is None else (key, position),
+        draw=draw
+    )
+
+
+def text_box_layer(name: str, text: str, box: Rect, text_position: Tuple[int, int], font,
+                   box_fill=(0, 0, 0), text_fill=(255, 255, 255)) -> Layer:
+    """创建带背景框的文字图层（字幕条、角色名标签）"""
+    text_bbox = ImageDraw.Draw(Image.new('RGB', (1, 1))).textbbox(text_position, text, font=font)
+    # 矩形边框包含右、下边界像素，因此各加1
+    rect = (
+        min(box[0], text_bbox[0]),
+        min(box[1], text_bbox[1]),
+        max(box[2] + 1, text_bbox[2]),
+        max(box[3] + 1, text_bbox[3])
+    )
+
+    def draw(canvas: Image.Image, offset: Tuple[int, int]):
+        ox, oy = offset
+        canvas_draw = ImageDraw.Draw(canvas)
+        canvas_draw.rectangle([box[0] - ox, box[1] - oy, box[2] - ox, box[3] - oy], fill=box_fill)
+        canvas_draw.text((text_position[0] - ox, text_position[1] - oy), text, fill=text_fill, font=font)
+
+    return Layer(name=name, rect=rect, key=(text, box, text_position), draw=draw)
+
+
+class FrameCompositor:
+    """增量帧合成器 - 只重绘发生变化的矩形区域
+
+    合成器保留上一帧的画面缓冲区，并记录每个图层的区域与内容标识。
+    渲染新一帧时，只有内容或位置发生变化的图层会产生损坏区域（新旧区域的并集），
+    随后从背景裁剪这些区域、按层级重新叠加所有相交图层，再贴回缓冲区。
+    """
+
+    def __init__(self, resolution: Tuple[int, int], full_redraw_ratio: float = 0.6):
+        """
+        :param resolution: 画面分辨率
+        :param full_redraw_ratio: 损坏面积超过画面该比例时直接整帧重绘
+        """
+        self.resolution = resolution
+        self.full_redraw_ratio = full_redraw_ratio
+        self.background: Optional[Image.Image] = None
+        self.frame: Optional[Image.Image] = None
+        self._layers: Dict[str, Layer] = {}
+        self._full_damage = True
+        self.stats = {"frames": 0, "full_redraws": 0, "partial_redraws": 0, "unchanged": 0, "redrawn_pixels": 0}
+
+    def set_background(self, background: Image.Image):
+        """设置背景（整帧视为损坏）"""
+        if background.size != self.resolution:
+            background = background.resize(self.resolution)
+        self.background = background.convert('RGB')
+        self._full_damage = True
+
+    def render(self, layers: List[Layer]) -> List[Rect]:
+        """合成一帧，返回本帧重绘的区域列表（为空表示与上一帧完全相同）"""
+        if self.background is None:
+            raise ValueError("合成前需要先设置背景")
+
+        full_rect = (0, 0, self.resolution[0], self.resolution[1])
+        if self._full_damage or self.frame is None:
+            dirty = [full_rect]
+        else:
+            dirty = self._collect_damage(layers)
+            dirty = [rect for rect in (self._clip(r) for r in self._merge_rects(dirty)) if rect]
+            damaged_area = sum(self._area(rect) for rect in dirty)
+            if damaged_area > self.full_redraw_ratio * self._area(full_rect):
+                dirty = [full_rect]
+
+        if dirty == [full_rect]:
+            self.frame = self.background.copy()
+            for layer in layers:
+                layer.draw(self.frame, (0, 0))
+            self.stats["full_redraws"] += 1
+        elif dirty:
+            for rect in dirty:
+                region = self.background.crop(rect)
+                for layer in layers:
+                    if self._intersects(layer.rect, rect):
+                        layer.draw(region, (rect[0], rect[1]))
+                self.frame.paste(region, (rect[0], rect[1]))
+            self.stats["partial_redraws"] += 1
+        else:
+            self.stats["unchanged"] += 1
+
+        self.stats["frames"] += 1
+        self.stats["redrawn_pixels"] += sum(self._area(rect) for rect in dirty)
+        self._layers = {layer.name: layer for layer in layers}
+        self._full_damage = False
+        return dirty
+
+    def _collect_damage(self, layers: List[Layer]) -> List[Rect]:
+        """对比上一帧图层，收集损坏区域"""
+        damage = []
+        current = {layer.name: layer for layer in layers}
+
+        for name, layer in current.items():
+            previous = self._layers.get(name)
+            if previous is None:
+                damage.append(layer.rect)
+            elif previous.key != layer.key or previous.rect != layer.rect:
+                damage.extend([previous.rect, layer.rect])
+
+        # 消失的图层需要用背景覆盖
+        for name, previous in self._layers.items():
+            if name not in current:
+                damage.append(previous.rect)
+
+        return damage
+
+    def _merge_rects(self, rects: List[Rect]) -> List[Rect]:
+        """合并相互重叠的矩形，避免重复重绘"""
+        merged = [rect for rect in rects if self._area(rect) > 0]
+        changed = True
+        while changed:
+            changed = False
+            result = []
+            while merged:
+                current = merged.pop()
+                i = 0
+                while i < len(merged):
+                    if self._intersects(current, merged[i]):
+                        other = merged.pop(i)
+                        current = (
+                            min(current[0], other[0]), min(current[1], other[1]),
+                            max(current[2], other[2]), max(current[3], other[3])
+                        )
+                        changed = True
+                    else:
+                        i += 1
+                result.append(current)
+            merged = result
+        return merged
+
+    def _clip(self, rect: Rect) -> Optional[Rect]:
+        """将矩形裁剪到画面范围内"""
+        left = max(0, rect[0])
+        top = max(0, rect[1])
+        right = min(self.resolution[0], rect[2])
+        bottom = min(self.resolution[1], rect[3])
+        if right <= left or bottom <= top:
+            return None
+        return (left, top, right, bottom)
+
+    @staticmethod
+    def _intersects(a: Rect, b: Rect) -> bool:
+        return a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]
+
+    @staticmethod
+    def _area(rect: Rect) -> int:
+        return max(0, rect[2] - rect[0]) * max(0, rect[3] - rect[1])
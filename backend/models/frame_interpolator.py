@@ -0,0 +1,161 @@
+from typing import Iterable, Iterator, List, Optional, Union
+from PIL import Image
+import numpy as np
+
+Frame = Union[np.ndarray, Image.Image]
+
+# 质量/速度档位：blend 为逐像素线性混合；flow 为基于 Farneback 光流的运动补偿插帧
+QUALITY_PRESETS = {
+    "fast": {"method": "blend"},
+    "balanced": {"method": "flow", "flow_scale": 0.5, "levels": 3, "winsize": 15, "iterations": 3},
+    "quality": {"method": "flow", "flow_scale": 1.0, "levels": 5, "winsize": 21, "iterations": 5},
+}
+
+
+class _StreamState:
+    """流式插帧的状态：上一源帧与输出进度"""
+
+    def __init__(self, ratio: float):
+        self.ratio = ratio
+        self.previous: Optional[np.ndarray] = None
+        self.source_index = -1
+        self.output_index = 0
+        self.as_pil = False
+
+
+class FrameInterpolator:
+    """CPU 插帧器 - 将任意帧率的片段流式上采样到目标帧率
+
+    输入帧逐帧到达，内部只保留上一源帧。每对相邻帧只计算一次光流，
+    该区间内的所有中间帧都复用这份光流，分别从前后两帧反向采样后按时间加权混合。
+    """
+
+    def __init__(self, target_fps: float = 24, quality: str = "balanced"):
+        """
+        :param target_fps: 目标帧率
+        :param quality: 质量档位（fast / balanced / quality）
+        """
+        if quality not in QUALITY_PRESETS:
+            raise ValueError(f"不支持的插帧质量档位: {quality}")
+
+        self.target_fps = target_fps
+        self.quality = quality
+        self.preset = dict(QUALITY_PRESETS[quality])
+        self._grid_cache = {}
+
+        if self.preset["method"] == "flow":
+            try:
+                import cv2  # noqa: F401
+            except ImportError:
+                print("⚠️ OpenCV未安装，插帧回退为线性混合")
+                self.preset = dict(QUALITY_PRESETS["fast"])
+
+    def interpolate_stream(self, frames: Iterable[Frame], source_fps: float) -> Iterator[Frame]:
+        """
+        流式插帧
+
+        :param frames: 源帧序列（PIL 图像或 HxWx3 uint8 数组）
+        :param source_fps: 源帧率
+        :return: 目标帧率的帧序列，类型与输入一致
+        """
+        state = _StreamState(self.target_fps / source_fps)
+        for frame in frames:
+            yield from self._push(state, frame)
+        yield from self._finish(state)
+
+    def interpolate_chunks(self, chunks: Iterable[List[Frame]], source_fps: float) -> Iterator[List[Frame]]:
+        """对分块产出的片段插帧，每个输入块到达后立即产出该块可以确定的输出帧"""
+        state = _StreamState(self.target_fps / source_fps)
+        for chunk in chunks:
+            output = [result for frame in chunk for result in self._push(state, frame)]
+            if output:
+                yield output
+        tail = list(self._finish(state))
+        if tail:
+            yield tail
+
+    def interpolate(self, frames: List[Frame], source_fps: float) -> List[Frame]:
+        """对完整片段插帧"""
+        return list(self.interpolate_stream(frames, source_fps))
+
+    def _push(self, state: _StreamState, frame: Frame) -> Iterator[Frame]:
+        """接收一个源帧，产出时间落在 [上一源帧, 当前源帧) 区间内的输出帧"""
+        state.as_pil = isinstance(frame, Image.Image)
+        current = np.asarray(frame.convert('RGB')) if state.as_pil else np.asarray(frame)
+        state.source_index += 1
+
+        if state.previous is not None:
+            flow = None
+            while state.output_index / state.ratio < state.source_index:
+                alpha = state.output_index / state.ratio - (state.source_index - 1)
+                if alpha <= 0.0:
+                    result = state.previous
+                else:
+                    if flow is None and self.preset["method"] == "flow":
+                        flow = self._compute_flow(state.previous, current)
+                    result = self._synthesize(state.previous, current, alpha, flow)
+                yield Image.fromarray(result) if state.as_pil else result
+                state.output_index += 1
+
+        state.previous = current
+
+    def _finish(self, state: _StreamState) -> Iterator[Frame]:
+        """最后一个源帧保持到片段结束"""
+        if state.previous is None:
+            return
+        while state.output_index / state.ratio < state.source_index + 1:
+            yield Image.fromarray(state.previous) if state.as_pil else state.previous
+            state.output_index += 1
+
+    def _compute_flow(self, previous: np.ndarray, current: np.ndarray) -> np.ndarray:
+        """计算前一帧到当前帧的稠密光流（可在降采样分辨率上计算后放大）"""
+        import cv2
+
+        scale = self.preset["flow_scale"]
+        prev_gray = cv2.cvtColor(previous, cv2.COLOR_RGB2GRAY)
+        curr_gray = cv2.cvtColor(current, cv2.COLOR_RGB2GRAY)
+        if scale != 1.0:
+            size = (max(1, int(prev_gray.shape[1] * scale)), max(1, int(prev_gray.shape[0] * scale)))
+            prev_gray = cv2.resize(prev_gray, size, interpolation=cv2.INTER_AREA)
+            curr_gray = cv2.resize(curr_gray, size, interpolation=cv2.INTER_AREA)
+
+        flow = cv2.calcOpticalFlowFarneback(
+            prev_gray, curr_gray, None,
+            pyr_scale=0.5, levels=self.preset["levels"], winsize=self.preset["winsize"],
+            iterations=self.preset["iterations"], poly_n=5, poly_sigma=1.1, flags=0
+        )
+
+        if scale != 1.0:
+            flow = cv2.resize(flow, (previous.shape[1], previous.shape[0]), interpolation=cv2.INTER_LINEAR) / scale
+        return flow
+
+    def _synthesize(self, previous: np.ndarray, current: np.ndarray, alpha: float,
+                    flow: Optional[np.ndarray]) -> np.ndarray:
+        """合成 alpha 时刻的中间帧"""
+        if flow is None:
+            blended = previous.astype(np.float32) * (1.0 - alpha) + current.astype(np.float32) * alpha
+            return np.clip(blended + 0.5, 0, 255).astype(np.uint8)
+
+        import cv2
+
+        grid_x, grid_y = self._grid(flow.shape[:2])
+
+        # 假设运动在区间内近似线性：t 时刻像素来自前一帧的 x - alpha*F，来自后一帧的 x + (1-alpha)*F
+        warped_previous = cv2.remap(
+            previous, grid_x - alpha * flow[..., 0], grid_y - alpha * flow[..., 1],
+            interpolation=cv2.INTER_LINEAR, borderMode=cv2.BORDER_REPLICATE
+        )
+        warped_current = cv2.remap(
+            current, grid_x + (1.0 - alpha) * flow[..., 0], grid_y + (1.0 - alpha) * flow[..., 1],
+            interpolation=cv2.INTER_LINEAR, borderMode=cv2.BORDER_REPLICATE
+        )
+        return cv2.addWeighted(warped_previous, 1.0 - alpha, warped_current, alpha, 0.0)
+
+    def _grid(self, shape: tuple):
+        """像素坐标网格（按分辨率缓存）"""
+        grid = self._grid_cache.get(shape)
+        if grid is None:
+            height, width = shape
+            grid = np.meshgrid(np.arange(width, dtype=np.float32), np.arange(height, dtype=np.float32))
+            self._grid_cache = {shape: grid}
+        return grid
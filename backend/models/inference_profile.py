@@ -0,0 +1,162 @@
+import os
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+from .env_config import env_int
+
+# 部署环境变量：选择推理配置档位与线程数
+PROFILE_ENV = "AI_VIDEO_PROFILE"
+NUM_THREADS_ENV = "AI_VIDEO_NUM_THREADS"
+INTEROP_THREADS_ENV = "AI_VIDEO_INTEROP_THREADS"
+
+
+@dataclass(frozen=True)
+class InferenceProfile:
+    """推理配置 - 决定模型加载精度、运行设备和 CPU 运行时参数"""
+    name: str
+    device: str  # cuda / cpu
+    dtype: str  # float16 / bfloat16 / float32
+    variant: Optional[str] = None  # 权重变体（fp16 权重只在 GPU 上使用）
+    num_threads: Optional[int] = None  # 算子内线程数（仅 CPU）
+    interop_threads: Optional[int] = None  # 算子间线程数（仅 CPU）
+    channels_last: bool = False  # UNet / VAE 使用 channels_last 内存布局
+    sdpa: bool = True  # 使用 PyTorch scaled_dot_product_attention 注意力
+
+    @property
+    def torch_dtype(self):
+        import torch
+        return getattr(torch, self.dtype)
+
+    def pretrained_kwargs(self) -> Dict[str, Any]:
+        """diffusers 管线 from_pretrained 的精度参数"""
+        kwargs = {"torch_dtype": self.torch_dtype}
+        if self.variant:
+            kwargs["variant"] = self.variant
+        return kwargs
+
+    def apply_runtime(self):
+        """设置进程级 CPU 线程参数（算子间线程数只能在首次并行计算前设置一次）"""
+        if self.device != "cpu":
+            return
+
+        import torch
+        if self.num_threads:
+            torch.set_num_threads(self.num_threads)
+        if self.interop_threads and torch.get_num_interop_threads() != self.interop_threads:
+            try:
+                torch.set_num_interop_threads(self.interop_threads)
+            except RuntimeError as e:
+                print(f"⚠️ 算子间线程数设置失败（需在首次推理前设置）: {e}")
+
+    def prepare_pipeline(self, pipe, move: bool = True):
+        """将 diffusers 管线移动到目标设备，并应用内存布局与注意力实现
+
+        :param move: 为 False 时不移动设备（由 CPU offload 在推理时按需搬运）
+        """
+        if move:
+            pipe = pipe.to(self.device)
+
+        if self.channels_last:
+            import torch
+            for name in ("unet", "vae"):
+                module = getattr(pipe, name, None)
+                if module is not None:
+                    module.to(memory_format=torch.channels_last)
+
+        if self.sdpa:
+            unet = getattr(pipe, "unet", None)
+            if unet is not None and hasattr(unet, "set_attn_processor"):
+                try:
+                    from diffusers.models.attention_processor import AttnProcessor2_0
+                    unet.set_attn_processor(AttnProcessor2_0())
+                except Exception as e:
+                    print(f"⚠️ SDPA 注意力设置失败，保留默认实现: {e}")
+
+        return pipe
+
+    def prepare_module(self, module, device: Optional[str] = None):
+        """将 transformers 模型移动到目标设备并切换到推理模式
+
+        语音模型在 CPU 上保持 float32：SpeechT5 声码器在 bfloat16 下有明显音质损失。
+        """
+        device = device or self.device
+        module = module.to(device)
+        if str(device).startswith("cpu"):
+            module = module.float()
+        module.eval()
+        return module
+
+    def to_device(self, tensor):
+        """将输入张量移动到目标设备"""
+        return tensor.to(self.device)
+
+    @contextmanager
+    def inference(self):
+        """推理上下文：禁用梯度与版本计数"""
+        import torch
+        with torch.inference_mode():
+            yield
+
+
+def _cpu_supports_bf16() -> bool:
+    """CPU 是否有原生 bfloat16 指令（AVX512-BF16 / AMX），否则 bfloat16 反而比 float32 慢"""
+    try:
+        with open("/proc/cpuinfo", "r", encoding="utf-8") as f:
+            flags = f.read()
+    except OSError:
+        return False
+    return "avx512_bf16" in flags or "amx_bf16" in flags
+
+
+def _cpu_threads() -> int:
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def _build_profile(name: str) -> InferenceProfile:
+    if name == "auto":
+        try:
+            import torch
+            name = "cuda" if torch.cuda.is_available() else "cpu"
+        except ImportError:
+            name = "cpu"
+
+    if name == "cuda":
+        return InferenceProfile(name="cuda", device="cuda", dtype="float16", variant="fp16")
+
+    if name in ("cpu", "cpu_bf16", "cpu_fp32"):
+        if name == "cpu":
+            dtype = "bfloat16" if _cpu_supports_bf16() else "float32"
+        else:
+            dtype = "bfloat16" if name == "cpu_bf16" else "float32"
+        return InferenceProfile(
+            name=name,
+            device="cpu",
+            dtype=dtype,
+            num_threads=env_int(NUM_THREADS_ENV) or _cpu_threads(),
+            interop_threads=env_int(INTEROP_THREADS_ENV) or 1,
+            channels_last=True,
+        )
+
+    raise ValueError(f"不支持的推理配置: {name}（可选 auto / cuda / cpu / cpu_bf16 / cpu_fp32）")
+
+
+_profiles: Dict[str, InferenceProfile] = {}
+
+
+def get_inference_profile(name: Optional[str] = None) -> InferenceProfile:
+    """
+    获取推理配置（同一进程内按名称缓存），首次获取时应用 CPU 线程设置
+
+    :param name: 配置名称，默认读取环境变量 AI_VIDEO_PROFILE，未设置时为 auto
+    """
+    name = (name or os.environ.get(PROFILE_ENV) or "auto").lower()
+    profile = _profiles.get(name)
+    if profile is None:
+        profile = _build_profile(name)
+        profile.apply_runtime()
+        _profiles[name] = profile
+        print(f"⚙️ 推理配置: {profile.name} ({profile.device}, {profile.dtype})")
+    return profile
@@ -0,0 +1,247 @@
+import os
+import json
+import time
+import uuid
+import weakref
+import threading
+from dataclasses import dataclass, field, asdict
+from typing import Any, Dict, List, Optional, Tuple
+from PIL import Image
+
+# 设置后覆盖默认资产目录
+ASSET_DIR_ENV = "AI_VIDEO_ASSET_DIR"
+DEFAULT_ASSET_DIR = "data/assets/backgrounds"
+
+# 变体默认重绘强度：只运行约 1/3 的去噪步数，保留构图，改变光照 / 天气 / 视角等
+DEFAULT_VARIATION_STRENGTH = 0.35
+
+
+@dataclass
+class LatentAsset:
+    """带潜变量的生成资产"""
+    id: str
+    key: str  # 查找键（通常为场景地点）
+    description: str
+    prompt: str
+    image_path: str
+    latent_path: Optional[str] = None  # 最终去噪潜变量，None 表示管线不支持导出
+    parent_id: Optional[str] = None  # 变体的来源资产
+    quality: Optional[str] = None  # 生成时的质量档位
+    metadata: Dict[str, Any] = field(default_factory=dict)
+    created_at: float = field(default_factory=time.time)
+
+
+class LatentAssetStore:
+    """潜变量资产库 - 生成的背景图像与其最终潜变量一起保存
+
+    后续同一地点的不同时间 / 天气 / 视角只需从缓存潜变量出发做低强度 img2img，
+    花费完整文生图的一小部分去噪步数。
+    """
+
+    INDEX_FILE = "index.json"
+
+    def __init__(self, store_dir: str = DEFAULT_ASSET_DIR):
+        """
+        :param store_dir: 资产目录（图像、潜变量与索引）
+        """
+        self.store_dir = store_dir
+        self._lock = threading.Lock()
+        os.makedirs(self.store_dir, exist_ok=True)
+        self._assets: Dict[str, LatentAsset] = self._load_index()
+
+    def add(self, image: Image.Image, latents, key: str, description: str, prompt: str,
+            parent_id: Optional[str] = None, quality: Optional[str] = None,
+            metadata: Optional[Dict[str, Any]] = None) -> LatentAsset:
+        """保存图像与潜变量，返回资产"""
+        asset_id = uuid.uuid4().hex
+        image_path = os.path.join(self.store_dir, f"{asset_id}.png")
+        image.save(image_path)
+
+        latent_path = None
+        if latents is not None:
+            import torch
+            latent_path = os.path.join(self.store_dir, f"{asset_id}.latent.pt")
+            torch.save(latents.detach().cpu().clone(), latent_path)
+
+        asset = LatentAsset(
+            id=asset_id,
+            key=key,
+            description=description,
+            prompt=prompt,
+            image_path=image_path,
+            latent_path=latent_path,
+            parent_id=parent_id,
+            quality=quality,
+            metadata=metadata or {},
+        )
+        with self._lock:
+            self._assets[asset_id] = asset
+            self._save_index()
+        return asset
+
+    def get(self, asset_id: str) -> Optional[LatentAsset]:
+        return self._assets.get(asset_id)
+
+    def find(self, key: str, description: Optional[str] = None, quality: Optional[str] = None) -> Optional[LatentAsset]:
+        """
+        查找最新的同键资产
+
+        :param key: 查找键
+        :param description: 指定时要求描述一致（可直接复用），否则只返回带潜变量的基础资产（可派生变体）
+        :param quality: 指定时要求质量档位一致
+        """
+        candidates = [
+            asset for asset in self._assets.values()
+            if asset.key == key and (quality is None or asset.quality == quality)
+        ]
+        if description is not None:
+            candidates = [asset for asset in candidates if asset.description == description]
+        else:
+            candidates = [asset for asset in candidates if asset.parent_id is None and asset.latent_path]
+        candidates = [asset for asset in candidates if os.path.exists(asset.image_path)]
+        return max(candidates, key=lambda asset: asset.created_at) if candidates else None
+
+    def variants(self, asset_id: str) -> List[LatentAsset]:
+        """列出由某资产派生的变体"""
+        return [asset for asset in self._assets.values() if asset.parent_id == asset_id]
+
+    def load_latents(self, asset: LatentAsset, device=None):
+        """读取资产潜变量"""
+        if not asset.latent_path or not os.path.exists(asset.latent_path):
+            return None
+        import torch
+        return torch.load(asset.latent_path, map_location=device or "cpu", weights_only=True)
+
+    def _load_index(self) -> Dict[str, LatentAsset]:
+        path = os.path.join(self.store_dir, self.INDEX_FILE)
+        if os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    return {asset_id: LatentAsset(**data) for asset_id, data in json.load(f).items()}
+            except Exception as e:
+                print(f"⚠️ 资产索引读取失败，重建索引: {e}")
+        return {}
+
+    def _save_index(self):
+        path = os.path.join(self.store_dir, self.INDEX_FILE)
+        temp_path = f"{path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({asset_id: asdict(asset) for asset_id, asset in self._assets.items()}, f, ensure_ascii=False)
+        os.replace(temp_path, path)
+
+
+_default_store: Optional[LatentAssetStore] = None
+
+
+def get_latent_asset_store() -> LatentAssetStore:
+    """进程内共享的资产库（各生成器写同一索引，避免相互覆盖）"""
+    global _default_store
+    if _default_store is None:
+        _default_store = LatentAssetStore(os.environ.get(ASSET_DIR_ENV) or DEFAULT_ASSET_DIR)
+    return _default_store
+
+
+def generate_asset(store: LatentAssetStore, pipe, key: str, description: str, prompt: str, tier,
+                   profile, prompt_cache, width: int, height: int,
+                   negative_prompt: Optional[str] = None, batcher=None) -> LatentAsset:
+    """
+    文生图并将图像与最终潜变量存入资产库
+
+    :param batcher: SDXL 微批处理器，指定时与其他并发请求合批生成
+    """
+    from .quality_tiers import pipeline_lock, scheduled_pipeline
+
+    if batcher is not None:
+        image, latents = batcher.generate_with_latents(prompt, width, height, tier, negative_prompt)
+    else:
+        with pipeline_lock(pipe):
+            scheduled = scheduled_pipeline(pipe, tier.scheduler)
+            with profile.inference():
+                images, latents = generate_with_latents(
+                    scheduled,
+                    **prompt_cache.prompt_kwargs(scheduled, prompt, negative_prompt),
+                    num_inference_steps=tier.image_steps,
+                    guidance_scale=tier.guidance_scale,
+                    width=width,
+                    height=height,
+                )
+        image = images[0]
+    return store.add(image, latents, key, description, prompt, quality=tier.name,
+                     metadata={"steps": tier.image_steps})
+
+
+def generate_variation(store: LatentAssetStore, pipe, base: LatentAsset, prompt: str, description: str, tier,
+                       profile, prompt_cache, strength: float = DEFAULT_VARIATION_STRENGTH,
+                       negative_prompt: Optional[str] = None) -> LatentAsset:
+    """
+    从基础资产的缓存潜变量出发做低强度 img2img，生成时间 / 天气 / 视角变体
+
+    潜变量直接作为 img2img 的输入（跳过 VAE 编码），只运行 strength × 档位步数 的去噪步。
+    img2img 管线与文生图管线共享 UNet，运行期间持有基础管线的锁，与微批处理器的批次互斥。
+    """
+    from .quality_tiers import pipeline_lock, scheduled_pipeline
+
+    if not 0.0 < strength <= 1.0:
+        raise ValueError(f"重绘强度需在 (0, 1] 之间: {strength}")
+
+    img2img = img2img_pipeline(pipe)
+    latents = store.load_latents(base, getattr(img2img, "_execution_device", None))
+    if latents is None:
+        raise ValueError(f"资产 {base.id} 没有缓存潜变量，无法生成变体")
+
+    with pipeline_lock(pipe):
+        scheduled = scheduled_pipeline(img2img, tier.scheduler)
+        with profile.inference():
+            images, variant_latents = generate_with_latents(
+                scheduled,
+                **prompt_cache.prompt_kwargs(scheduled, prompt, negative_prompt),
+                image=latents,
+                strength=strength,
+                num_inference_steps=tier.image_steps,
+                guidance_scale=tier.guidance_scale,
+            )
+    return store.add(images[0], variant_latents, base.key, description, prompt, parent_id=base.id, quality=tier.name,
+                     metadata={"steps": max(1, int(tier.image_steps * strength)), "strength": strength})
+
+
+def generate_with_latents(pipe, **kwargs) -> Tuple[List[Image.Image], Any]:
+    """
+    运行文生图 / 图生图管线，同时取出最后一步去噪后的潜变量（解码前、已按 VAE 缩放系数缩放）
+
+    :return: (图像列表, 批量潜变量)，管线不支持步进回调时潜变量为 None
+    """
+    captured = {}
+
+    def capture(pipeline, step, timestep, callback_kwargs):
+        captured["latents"] = callback_kwargs["latents"]
+        return callback_kwargs
+
+    if _supports_step_callback(pipe):
+        kwargs = dict(kwargs, callback_on_step_end=capture, callback_on_step_end_tensor_inputs=["latents"])
+
+    result = pipe(**kwargs)
+    return result.images, captured.get("latents")
+
+
+_img2img_pipelines: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+
+
+def img2img_pipeline(pipe):
+    """由文生图管线构建共享权重的 SDXL 图生图管线（按管线缓存，需要 diffusers >= 0.28）"""
+    img2img = _img2img_pipelines.get(pipe)
+    if img2img is None:
+        from diffusers import StableDiffusionXLImg2ImgPipeline
+
+        # 调度器带步进状态，按原始配置新建一份，不与文生图管线共享实例
+        scheduler = pipe.scheduler
+        img2img = StableDiffusionXLImg2ImgPipeline.from_pipe(pipe, scheduler=type(scheduler).from_config(scheduler.config))
+        _img2img_pipelines[pipe] = img2img
+    return img2img
+
+
+def _supports_step_callback(pipe) -> bool:
+    import inspect
+    try:
+        return "callback_on_step_end" in inspect.signature(pipe.__call__).parameters
+    except (TypeError, ValueError):
+        return False
@@ -0,0 +1,317 @@
+import os
+from dataclasses import dataclass, field, asdict
+from typing import Any, Dict, List, Optional, Tuple
+
+from .env_config import env_int
+from .inference_profile import InferenceProfile, get_inference_profile
+
+# 内存预算环境变量（MB），未设置时按本机可用内存探测
+VRAM_BUDGET_ENV = "AI_VIDEO_VRAM_BUDGET_MB"
+RAM_BUDGET_ENV = "AI_VIDEO_RAM_BUDGET_MB"
+
+# 各管线内存估计（MB，半精度权重；float32 时翻倍）
+# activation_mb / decode_mb 为参考分辨率下单次推理的峰值，按像素数缩放；SVD 的 decode_mb 为每帧开销
+PIPELINE_FOOTPRINTS = {
+    "sdxl": {
+        "components": {"unet": 4900, "text_encoder_2": 1330, "text_encoder": 240, "vae": 160},
+        "reference_resolution": (1024, 1024),
+        "activation_mb": 3000,
+        "decode_mb": 2500,
+    },
+    "svd": {
+        "components": {"unet": 2900, "image_encoder": 1200, "vae": 190},
+        "reference_resolution": (1024, 576),
+        "activation_mb": 4000,
+        "decode_mb": 450,
+    },
+    "tts": {
+        # SpeechT5 始终以 float32 运行
+        "components": {"model": 580, "vocoder": 55},
+        "full_precision": True,
+        "activation_mb": 300,
+    },
+}
+
+# 每条管线逐级加大的节省内存手段，按速度损失从小到大排列
+PLAN_STEPS = {
+    "sdxl": [
+        {},
+        {"vae_slicing": True, "vae_tiling": True},
+        {"vae_slicing": True, "vae_tiling": True, "attention_slicing": True},
+        {"vae_slicing": True, "vae_tiling": True, "attention_slicing": True, "offload": "model"},
+        {"vae_slicing": True, "vae_tiling": True, "attention_slicing": True, "offload": "sequential"},
+    ],
+    "svd": [
+        {"decode_chunk_size": 8},
+        {"decode_chunk_size": 4},
+        {"decode_chunk_size": 2},
+        {"decode_chunk_size": 2, "offload": "model"},
+        {"decode_chunk_size": 1, "offload": "model"},
+        {"decode_chunk_size": 1, "offload": "sequential"},
+    ],
+    "tts": [
+        {},
+        {"device": "cpu"},
+    ],
+}
+
+# 顺序 offload 时设备上同时驻留的最大子模块估计（MB）
+SEQUENTIAL_RESIDENT_MB = 300
+# 注意力切片与 VAE 分块的节省比例
+ATTENTION_SLICING_FACTOR = 0.6
+VAE_TILING_FACTOR = 0.3
+
+
+@dataclass
+class PipelinePlan:
+    """单条管线的内存方案"""
+    pipeline: str
+    device: str  # 推理设备
+    offload: str = "none"  # none / model / sequential
+    attention_slicing: bool = False
+    vae_slicing: bool = False
+    vae_tiling: bool = False
+    decode_chunk_size: Optional[int] = None  # 仅 SVD
+    resident_mb: int = 0  # 两次推理之间常驻设备的内存
+    working_mb: int = 0  # 推理时额外的设备峰值内存
+    host_mb: int = 0  # 占用的主机内存
+    step: int = 0  # 在 PLAN_STEPS 中的级别
+
+    def apply(self, pipe, profile: InferenceProfile):
+        """按方案放置 diffusers 管线，并启用切片 / 分块 / offload"""
+        if self.offload == "none":
+            pipe = profile.prepare_pipeline(pipe)
+        else:
+            pipe = profile.prepare_pipeline(pipe, move=False)
+            if self.offload == "sequential":
+                pipe.enable_sequential_cpu_offload(device=profile.device)
+            else:
+                pipe.enable_model_cpu_offload(device=profile.device)
+
+        if self.attention_slicing and hasattr(pipe, "enable_attention_slicing"):
+            pipe.enable_attention_slicing()
+
+        vae = getattr(pipe, "vae", None)
+        if self.vae_slicing and hasattr(vae, "enable_slicing"):
+            vae.enable_slicing()
+        if self.vae_tiling and hasattr(vae, "enable_tiling"):
+            vae.enable_tiling()
+
+        return pipe
+
+    def describe(self) -> str:
+        options = [f"offload={self.offload}"] if self.offload != "none" else []
+        options += [name for name in ("attention_slicing", "vae_slicing", "vae_tiling") if getattr(self, name)]
+        if self.decode_chunk_size is not None:
+            options.append(f"decode_chunk_size={self.decode_chunk_size}")
+        return (f"{self.pipeline}@{self.device} [{', '.join(options) or '全部常驻'}] "
+                f"设备常驻 {self.resident_mb} MB + 峰值 {self.working_mb} MB, 主机 {self.host_mb} MB")
+
+
+@dataclass
+class MemoryPlan:
+    """多条管线的整体内存方案"""
+    device: str
+    device_budget_mb: int
+    host_budget_mb: int
+    pipelines: Dict[str, PipelinePlan] = field(default_factory=dict)
+    swapped: bool = False  # 管线按需换入换出（由驻留管理器保证同一时刻只需一条管线常驻）
+
+    @property
+    def device_peak_mb(self) -> int:
+        """所有管线常驻内存之和加上最大单次推理峰值（管线依次运行，峰值不叠加）；换入换出时为单条管线的最大峰值"""
+        if not self.pipelines:
+            return 0
+        plans = self.pipelines.values()
+        if self.swapped:
+            return max(plan.resident_mb + plan.working_mb for plan in plans)
+        return sum(plan.resident_mb for plan in plans) + max(plan.working_mb for plan in plans)
+
+    @property
+    def host_peak_mb(self) -> int:
+        return sum(plan.host_mb for plan in self.pipelines.values())
+
+    @property
+    def fits(self) -> bool:
+        if self.device == "cpu":
+            return self.device_peak_mb <= self.host_budget_mb
+        return self.device_peak_mb <= self.device_budget_mb and self.host_peak_mb <= self.host_budget_mb
+
+    def get(self, pipeline: str) -> Optional[PipelinePlan]:
+        return self.pipelines.get(pipeline)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "device": self.device,
+            "device_budget_mb": self.device_budget_mb,
+            "host_budget_mb": self.host_budget_mb,
+            "device_peak_mb": self.device_peak_mb,
+            "host_peak_mb": self.host_peak_mb,
+            "fits": self.fits,
+            "swapped": self.swapped,
+            "pipelines": {name: asdict(plan) for name, plan in self.pipelines.items()},
+        }
+
+    def report(self):
+        """打印选定的内存方案"""
+        if self.device == "cpu":
+            budget = f"内存预算 {self.host_budget_mb} MB，预计峰值 {self.device_peak_mb} MB"
+        else:
+            budget = (f"显存预算 {self.device_budget_mb} MB，预计峰值 {self.device_peak_mb} MB；"
+                      f"内存预算 {self.host_budget_mb} MB，预计占用 {self.host_peak_mb} MB")
+        print(f"🧮 内存方案（{budget}{'，管线按需换入换出' if self.swapped else ''}）")
+        for plan in self.pipelines.values():
+            print(f"   - {plan.describe()}")
+        if not self.fits:
+            print("⚠️ 已启用全部节省手段仍可能超出预算，模型仍会按最省内存的方案加载")
+
+
+class MemoryPlanner:
+    """内存规划器 - 根据显存 / 内存预算为每条管线选择 offload、切片、分块与 SVD 解码块大小
+
+    所有管线先以最快的方案估算；超出预算时，每次把能最多降低整体峰值的那条管线升一级
+    （VAE 分块 → 注意力切片 → 整模型 offload → 逐层 offload），直到放得下或无法再降。
+    """
+
+    def __init__(self, profile: Optional[InferenceProfile] = None,
+                 device_budget_mb: Optional[int] = None, host_budget_mb: Optional[int] = None):
+        """
+        :param profile: 推理配置（决定设备与精度）
+        :param device_budget_mb: 显存预算，默认读取 AI_VIDEO_VRAM_BUDGET_MB，否则为当前可用显存的 90%
+        :param host_budget_mb: 内存预算，默认读取 AI_VIDEO_RAM_BUDGET_MB，否则为当前可用内存的 80%
+        """
+        self.profile = profile or get_inference_profile()
+        self.device_budget_mb = device_budget_mb or env_int(VRAM_BUDGET_ENV) or self._detect_device_budget()
+        self.host_budget_mb = host_budget_mb or env_int(RAM_BUDGET_ENV) or int(available_memory_mb() * 0.8)
+
+    def plan(self, pipelines: List[str], resolutions: Optional[Dict[str, Tuple[int, int]]] = None) -> MemoryPlan:
+        """
+        为一组同时加载的管线制定方案
+
+        :param pipelines: 管线名称（sdxl / svd / tts）
+        :param resolutions: 各管线的生成分辨率，默认使用参考分辨率
+        """
+        resolutions = resolutions or {}
+        memory_plan = MemoryPlan(self.profile.device, self.device_budget_mb, self.host_budget_mb)
+        for name in pipelines:
+            memory_plan.pipelines[name] = self._estimate(name, 0, resolutions.get(name))
+
+        while not memory_plan.fits:
+            best = None
+            for plan in memory_plan.pipelines.values():
+                step = self._next_step(plan.pipeline, plan.step)
+                if step is None:
+                    continue
+                candidate = MemoryPlan(memory_plan.device, self.device_budget_mb, self.host_budget_mb,
+                                       dict(memory_plan.pipelines))
+                candidate.pipelines[plan.pipeline] = self._estimate(plan.pipeline, step, resolutions.get(plan.pipeline))
+                saving = memory_plan.device_peak_mb - candidate.device_peak_mb
+                if best is None or saving > best[0]:
+                    best = (saving, candidate)
+            if best is None:
+                break
+            memory_plan = best[1]
+
+        return memory_plan
+
+    def plan_each(self, pipelines: List[str], resolutions: Optional[Dict[str, Tuple[int, int]]] = None) -> MemoryPlan:
+        """为按需换入换出的管线分别制定方案（每条管线只需单独放得下，尽量少降级）"""
+        resolutions = resolutions or {}
+        memory_plan = MemoryPlan(self.profile.device, self.device_budget_mb, self.host_budget_mb, swapped=True)
+        for name in pipelines:
+            memory_plan.pipelines[name] = self.plan([name], {name: resolutions[name]} if name in resolutions else None).get(name)
+        return memory_plan
+
+    def peak_mb(self, pipelines: Optional[List[str]] = None,
+                resolutions: Optional[Dict[str, Tuple[int, int]]] = None) -> Dict[str, int]:
+        """各管线按 plan_each 选定的方案单独运行时的设备峰值（MB，常驻 + 推理峰值），供设备调度器估算槽位占用"""
+        memory_plan = self.plan_each(pipelines or list(PIPELINE_FOOTPRINTS), resolutions)
+        return {name: plan.resident_mb + plan.working_mb for name, plan in memory_plan.pipelines.items()}
+
+    def _next_step(self, pipeline: str, step: int) -> Optional[int]:
+        """下一个在当前设备上有意义的级别（CPU 推理时 offload 和 TTS 移回 CPU 都没有意义）"""
+        for next_step in range(step + 1, len(PLAN_STEPS[pipeline])):
+            options = PLAN_STEPS[pipeline][next_step]
+            if self.profile.device == "cpu" and ("offload" in options or "device" in options):
+                continue
+            return next_step
+        return None
+
+    def _estimate(self, pipeline: str, step: int, resolution: Optional[Tuple[int, int]]) -> PipelinePlan:
+        """估算某条管线在指定级别下的内存占用"""
+        footprint = PIPELINE_FOOTPRINTS[pipeline]
+        options = PLAN_STEPS[pipeline][step]
+
+        if footprint.get("full_precision") or self.profile.dtype == "float32":
+            precision = 2.0
+        else:
+            precision = 1.0
+        components = {name: size * precision for name, size in footprint["components"].items()}
+        weights = sum(components.values())
+
+        reference = footprint.get("reference_resolution")
+        scale = (resolution[0] * resolution[1]) / (reference[0] * reference[1]) if resolution and reference else 1.0
+        activation = footprint["activation_mb"] * scale * precision
+        if options.get("attention_slicing"):
+            activation *= ATTENTION_SLICING_FACTOR
+
+        decode = footprint.get("decode_mb", 0) * scale * precision
+        decode_chunk_size = options.get("decode_chunk_size")
+        if decode_chunk_size:
+            decode *= decode_chunk_size
+        if options.get("vae_tiling"):
+            decode *= VAE_TILING_FACTOR
+
+        device = options.get("device", self.profile.device)
+        offload = options.get("offload", "none")
+        working = activation + decode
+        if device == "cpu" and self.profile.device != "cpu":
+            # 放回 CPU 推理：不占显存，全部在主机内存
+            resident, working, host = 0, 0, weights + activation
+        elif offload == "model":
+            resident, working, host = 0, working + max(components.values()), weights
+        elif offload == "sequential":
+            resident, working, host = 0, working + SEQUENTIAL_RESIDENT_MB, weights
+        else:
+            resident, host = weights, 0
+
+        return PipelinePlan(
+            pipeline=pipeline,
+            device=device,
+            offload=offload,
+            attention_slicing=options.get("attention_slicing", False),
+            vae_slicing=options.get("vae_slicing", False),
+            vae_tiling=options.get("vae_tiling", False),
+            decode_chunk_size=decode_chunk_size,
+            resident_mb=int(resident),
+            working_mb=int(working),
+            host_mb=int(host),
+            step=step,
+        )
+
+    def _detect_device_budget(self) -> int:
+        if self.profile.device == "cpu":
+            return 0
+        try:
+            import torch
+            free_bytes, _ = torch.cuda.mem_get_info()
+            return int(free_bytes / (1024 * 1024) * 0.9)
+        except Exception as e:
+            print(f"⚠️ 显存探测失败: {e}")
+            return 0
+
+
+def available_memory_mb() -> int:
+    """当前可用内存（MB）：优先读取 /proc/meminfo 的 MemAvailable，否则为物理内存总量"""
+    try:
+        with open("/proc/meminfo", "r", encoding="utf-8") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) // 1024
+    except OSError:
+        pass
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES") // (1024 * 1024)
+    except (ValueError, OSError, AttributeError):
+        return 16 * 1024
+
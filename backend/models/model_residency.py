@@ -0,0 +1,349 @@
+import gc
+import time
+import threading
+from contextlib import contextmanager
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from .env_config import env_int
+from .inference_profile import InferenceProfile, get_inference_profile
+
+# 常驻推理设备的模型内存预算（MB），未设置时使用内存规划器的显存预算（CPU 推理时为内存预算）
+RESIDENCY_BUDGET_ENV = "AI_VIDEO_RESIDENCY_BUDGET_MB"
+
+
+@dataclass
+class ResidentModel:
+    """受驻留管理的模型"""
+    name: str
+    loader: Optional[Callable[[], Any]]  # 从快照库重新加载并放置到推理设备，None 表示不能换出到磁盘
+    size_mb: int  # 常驻推理设备时占用的内存
+    mover: Optional[Callable[[Any, str], Any]] = None  # 在推理设备与 CPU 之间移动，None 表示不能停放到 CPU
+    model: Any = None
+    location: str = "disk"  # device（常驻推理设备）/ cpu（停放在主机内存）/ disk（已释放，按需重新加载）
+    last_used: float = 0.0
+    pins: int = 0  # 正在使用的次数，大于 0 时不会被换出
+    swaps_in: int = 0
+    swaps_out: int = 0
+    swap_in_seconds: float = 0.0
+    swap_out_seconds: float = 0.0
+    max_swap_in_seconds: float = 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "location": self.location,
+            "size_mb": self.size_mb,
+            "pinned": self.pins > 0,
+            "idle_seconds": round(time.time() - self.last_used, 1) if self.last_used else None,
+            "swaps_in": self.swaps_in,
+            "swaps_out": self.swaps_out,
+            "swap_in_seconds": round(self.swap_in_seconds, 3),
+            "swap_out_seconds": round(self.swap_out_seconds, 3),
+            "avg_swap_in_seconds": round(self.swap_in_seconds / self.swaps_in, 3) if self.swaps_in else None,
+            "max_swap_in_seconds": round(self.max_swap_in_seconds, 3),
+        }
+
+
+class ModelResidencyManager:
+    """模型驻留管理器 - 在内存预算内按 LRU 把空闲模型换出到 CPU 或磁盘，使用时按需换入
+
+    SDXL、SVD、SpeechT5 通常不能同时常驻：换入某个模型放不下时，按最近使用顺序换出未在使用的模型；
+    GPU 推理时优先停放到主机内存（换入只需一次拷贝），主机内存也放不下时释放，之后从快照库重新加载。
+    CPU 推理时没有停放层，换出即释放。可在当前阶段运行时预取下一阶段需要的模型。
+    """
+
+    def __init__(self, profile: Optional[InferenceProfile] = None,
+                 budget_mb: Optional[int] = None, park_budget_mb: Optional[int] = None):
+        """
+        :param profile: 推理配置（决定推理设备）
+        :param budget_mb: 推理设备上的模型内存预算，默认读取环境变量 AI_VIDEO_RESIDENCY_BUDGET_MB，
+                          否则为内存规划器的显存预算（CPU 推理时为内存预算）
+        :param park_budget_mb: 停放在主机内存的模型内存预算，默认为内存规划器的内存预算（CPU 推理时为 0）
+        """
+        self.profile = profile or get_inference_profile()
+        self.device = self.profile.device
+        if budget_mb is None or (park_budget_mb is None and self.device != "cpu"):
+            from .memory_planner import MemoryPlanner
+            planner = MemoryPlanner(self.profile)
+            if budget_mb is None:
+                budget_mb = env_int(RESIDENCY_BUDGET_ENV) or (
+                    planner.host_budget_mb if self.device == "cpu" else planner.device_budget_mb
+                )
+            if park_budget_mb is None:
+                park_budget_mb = planner.host_budget_mb
+        self.budget_mb = budget_mb
+        self.park_budget_mb = 0 if self.device == "cpu" else (park_budget_mb or 0)
+
+        self.models: Dict[str, ResidentModel] = {}
+        self._lock = threading.RLock()  # 保护登记表与引用计数
+        self._swap_lock = threading.Lock()  # 换入换出串行执行（共享同一条总线 / 磁盘）
+        self._prefetcher = ThreadPoolExecutor(max_workers=1, thread_name_prefix="model-prefetch")
+
+    # ------------------------------------------------------------------
+    # 登记
+    # ------------------------------------------------------------------
+
+    def register(self, name: str, loader: Optional[Callable[[], Any]], size_mb: Optional[int] = None,
+                 mover: Optional[Callable[[Any, str], Any]] = None, model: Any = None):
+        """
+        登记模型（model 不为 None 时视为已加载并常驻推理设备）
+
+        :param size_mb: 常驻推理设备时的内存，默认按已加载模型的参数实测
+        """
+        if size_mb is None:
+            size_mb = module_size_mb(model) if model is not None else 0
+        entry = ResidentModel(name, loader, int(size_mb), mover, model,
+                              "device" if model is not None else "disk", time.time() if model is not None else 0.0)
+        with self._lock:
+            self.models[name] = entry
+
+    def put(self, name: str, model: Any):
+        """直接放入已加载的模型（无加载器、不可停放，因此不会被换出）；None 表示移除"""
+        if model is None:
+            self.remove(name)
+        else:
+            self.register(name, None, model=model)
+
+    def remove(self, name: str):
+        with self._lock:
+            self.models.pop(name, None)
+
+    def available(self, name: str) -> bool:
+        """模型已登记（常驻、停放或可重新加载）"""
+        return name in self.models
+
+    def loaded_models(self) -> Dict[str, Any]:
+        """当前在内存中（常驻或停放）的模型，不触发换入"""
+        with self._lock:
+            return {name: entry.model for name, entry in self.models.items() if entry.model is not None}
+
+    # ------------------------------------------------------------------
+    # 使用与预取
+    # ------------------------------------------------------------------
+
+    def get(self, name: str) -> Any:
+        """返回常驻推理设备的模型，不在设备上时先换入；未登记或加载失败时返回 None"""
+        return self._ensure(name, count=True)
+
+    def _ensure(self, name: str, count: bool) -> Any:
+        entry = self.models.get(name)
+        if entry is None:
+            return None
+        with self._lock:
+            if entry.location == "device":
+                entry.last_used = time.time()
+                return entry.model
+
+        with self._swap_lock:
+            if entry.location != "device" and not self._swap_in(entry, count):
+                return None
+            entry.last_used = time.time()
+            return entry.model
+
+    @contextmanager
+    def use(self, name: str):
+        """在使用期间固定模型（不会被其他请求换出），未登记时得到 None"""
+        entry = self.models.get(name)
+        if entry is None:
+            yield None
+            return
+        with self._lock:
+            entry.pins += 1
+        try:
+            yield self.get(name)
+        finally:
+            with self._lock:
+                entry.pins -= 1
+                entry.last_used = time.time()
+
+    def prefetch(self, name: str) -> Optional[Future]:
+        """在后台换入模型（例如渲染帧时预取语音合成模型），模型已常驻或未登记时返回 None"""
+        entry = self.models.get(name)
+        if entry is None or entry.location == "device":
+            return None
+        return self._prefetcher.submit(self.get, name)
+
+    def preload(self, names: Iterable[str]) -> List[str]:
+        """
+        依次加载放得下的模型（不换出其他模型），加载失败的模型取消登记
+
+        :return: 已加载的模型
+        """
+        loaded = []
+        for name in names:
+            entry = self.models.get(name)
+            if entry is None:
+                continue
+            if entry.location != "device" and self._device_used_mb() + entry.size_mb > self.budget_mb:
+                print(f"💤 {name} 暂不加载（预算 {self.budget_mb} MB 已占用 {self._device_used_mb()} MB），使用时再换入")
+                continue
+            if self._ensure(name, count=False) is None:
+                self.remove(name)
+                continue
+            loaded.append(name)
+        return loaded
+
+    def evict(self, name: str, to: str = "cpu") -> bool:
+        """手动换出模型（to 为 cpu 或 disk），正在使用的模型不能换出"""
+        entry = self.models.get(name)
+        if entry is None or entry.location == "disk" or entry.pins > 0:
+            return False
+        with self._swap_lock:
+            return self._swap_out(entry, park=(to == "cpu"))
+
+    # ------------------------------------------------------------------
+    # 指标
+    # ------------------------------------------------------------------
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries = list(self.models.values())
+            swaps_in = sum(entry.swaps_in for entry in entries)
+            swap_in_seconds = sum(entry.swap_in_seconds for entry in entries)
+            return {
+                "device": self.device,
+                "budget_mb": self.budget_mb,
+                "park_budget_mb": self.park_budget_mb,
+                "device_used_mb": self._device_used_mb(),
+                "parked_mb": self._parked_mb(),
+                "swaps_in": swaps_in,
+                "swaps_out": sum(entry.swaps_out for entry in entries),
+                "swap_in_seconds": round(swap_in_seconds, 3),
+                "avg_swap_in_seconds": round(swap_in_seconds / swaps_in, 3) if swaps_in else None,
+                "models": {entry.name: entry.to_dict() for entry in entries},
+            }
+
+    # ------------------------------------------------------------------
+    # 换入换出（调用方持有 _swap_lock）
+    # ------------------------------------------------------------------
+
+    def _swap_in(self, entry: ResidentModel, count: bool = True) -> bool:
+        self._make_room(entry.size_mb, exclude=entry.name)
+
+        start = time.perf_counter()
+        source = entry.location
+        try:
+            if source == "cpu":
+                entry.model = entry.mover(entry.model, self.device)
+            else:
+                print(f"🔄 正在加载 {entry.name}...")
+                entry.model = entry.loader()
+        except Exception as e:
+            print(f"⚠️ {entry.name} 换入失败: {e}")
+            if source == "disk":
+                entry.model = None
+            return False
+        seconds = time.perf_counter() - start
+
+        with self._lock:
+            entry.location = "device"
+            if count:
+                # 启动时的预加载不计为换入
+                entry.swaps_in += 1
+                entry.swap_in_seconds += seconds
+                entry.max_swap_in_seconds = max(entry.max_swap_in_seconds, seconds)
+        print(f"📥 {entry.name} 已换入（来自 {source}，{seconds:.2f}s，设备占用 {self._device_used_mb()}/{self.budget_mb} MB）")
+        return True
+
+    def _make_room(self, needed_mb: int, exclude: str):
+        """按 LRU 换出未在使用的模型，直到放得下"""
+        skipped = {exclude}
+        while self._device_used_mb() + needed_mb > self.budget_mb:
+            victim = self._lru("device", skipped)
+            if victim is None:
+                print(f"⚠️ 无可换出的空闲模型，超出驻留预算加载 {exclude}")
+                return
+            if not self._swap_out(victim, park=True, protect={exclude}):
+                skipped.add(victim.name)
+
+    def _swap_out(self, entry: ResidentModel, park: bool, protect: Optional[set] = None) -> bool:
+        """
+        停放到 CPU（可移动且主机内存放得下时），否则释放到磁盘
+
+        :param protect: 正在换入的模型：不为腾出停放空间而释放，其停放内存视为即将空出
+        """
+        protect = protect or set()
+        start = time.perf_counter()
+        source = entry.location
+        if park and source == "device" and entry.mover is not None and self.device != "cpu":
+            while self._parked_mb(protect) + entry.size_mb > self.park_budget_mb:
+                victim = self._lru("cpu", {entry.name} | protect)
+                if victim is None:
+                    park = False
+                    break
+                self._swap_out(victim, park=False)
+        else:
+            park = False
+
+        if park:
+            entry.model = entry.mover(entry.model, "cpu")
+            location = "cpu"
+        elif entry.loader is not None:
+            entry.model = None
+            location = "disk"
+        else:
+            # 无法重新加载的模型只能留在原处
+            return False
+
+        with self._lock:
+            entry.location = location
+            entry.swaps_out += 1
+            entry.swap_out_seconds += time.perf_counter() - start
+        if location == "disk":
+            gc.collect()
+        self._release_device_cache()
+        print(f"📤 {entry.name} 已换出到 {location}（{source} → {location}）")
+        return True
+
+    def _lru(self, location: str, exclude: set) -> Optional[ResidentModel]:
+        with self._lock:
+            candidates = [
+                entry for entry in self.models.values()
+                if entry.location == location and entry.pins == 0 and entry.name not in exclude and entry.size_mb > 0
+            ]
+            return min(candidates, key=lambda entry: entry.last_used, default=None)
+
+    def _device_used_mb(self) -> int:
+        return sum(entry.size_mb for entry in self.models.values() if entry.location == "device")
+
+    def _parked_mb(self, exclude: Optional[set] = None) -> int:
+        exclude = exclude or set()
+        return sum(entry.size_mb for entry in self.models.values()
+                   if entry.location == "cpu" and entry.name not in exclude)
+
+    def _release_device_cache(self):
+        if self.device == "cpu":
+            return
+        try:
+            import torch
+            torch.cuda.empty_cache()
+        except Exception:
+            pass
+
+
+def module_size_mb(model) -> int:
+    """diffusers 管线各组件或 torch 模块的参数与缓冲区大小（MB）"""
+    try:
+        import torch
+    except ImportError:
+        return 0
+
+    components = getattr(model, "components", None)
+    if isinstance(components, dict):
+        modules = [component for component in components.values() if isinstance(component, torch.nn.Module)]
+    elif isinstance(model, torch.nn.Module):
+        modules = [model]
+    else:
+        return 0
+
+    total = 0
+    for module in modules:
+        for tensor in list(module.parameters()) + list(module.buffers()):
+            total += tensor.numel() * tensor.element_size()
+    return int(total / (1024 * 1024))
+
+
+def move_model(model, device: str):
+    """在设备间移动管线或模块（diffusers 管线与 transformers 模型都支持 .to）"""
+    return model.to(device)
@@ -0,0 +1,332 @@
+import os
+import json
+import time
+import inspect
+import importlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field, asdict
+from typing import Any, Dict, List, Optional, Tuple
+
+from .env_config import env_int
+
+# 本地模型快照库目录
+MODEL_STORE_ENV = "AI_VIDEO_MODEL_STORE"
+DEFAULT_MODEL_STORE = "data/models"
+# 组件并行加载线程数
+LOAD_WORKERS_ENV = "AI_VIDEO_MODEL_LOAD_WORKERS"
+
+MANIFEST_FILE = "manifest.json"
+
+# 只物化推理需要的文件（配置、分词器、safetensors 权重）
+CONFIG_PATTERNS = ["*.json", "*.txt", "*.model", "*/*.json", "*/*.txt", "*/*.model"]
+# diffusers 管线的组件清单；只物化其中列出的组件子目录，
+# 避免拉取仓库根目录的单文件检查点（sd_xl_base_1.0.safetensors、svd_xt.safetensors 等）与 vae_1_0/ 之类的备用目录
+MODEL_INDEX_FILE = "model_index.json"
+COMPONENT_FILE_TYPES = ["*.json", "*.txt", "*.model"]
+
+
+@dataclass(frozen=True)
+class ModelSpec:
+    """快照库中的模型"""
+    name: str
+    repo_id: str
+    kind: str  # diffusers（多组件管线）/ transformers（单模型）
+    revision: Optional[str] = None  # 固定的提交，None 表示物化时取 main 的最新提交
+    variants: Tuple[Optional[str], ...] = (None, "fp16")  # 需要物化的权重变体（None 为 float32 原始权重）
+
+
+MODEL_SPECS = {
+    "sdxl": ModelSpec("sdxl", "stabilityai/stable-diffusion-xl-base-1.0", "diffusers"),
+    "svd": ModelSpec("svd", "stabilityai/stable-video-diffusion-img2vid-xt", "diffusers"),
+    "speecht5_tts": ModelSpec("speecht5_tts", "microsoft/speecht5_tts", "transformers", variants=(None,)),
+    "speecht5_hifigan": ModelSpec("speecht5_hifigan", "microsoft/speecht5_hifigan", "transformers", variants=(None,)),
+}
+
+
+@dataclass
+class LoadTiming:
+    """一次冷加载的耗时"""
+    name: str
+    source: str  # store（本地快照，离线）/ hub（Hugging Face 缓存）
+    seconds: float
+    components: Dict[str, float] = field(default_factory=dict)  # 组件 -> 加载耗时（秒）
+
+
+class ModelStore:
+    """本地模型快照库 - 每个模型物化为固定提交的本地目录并记录清单，加载时只读本地、不做 Hub 解析
+
+    目录结构: <store>/<name>/manifest.json 与 <store>/<name>/<提交前 12 位>/...
+    diffusers 管线的各组件（UNet、VAE、文本编码器等）在线程池中并行加载。
+    """
+
+    def __init__(self, store_dir: Optional[str] = None, load_workers: Optional[int] = None):
+        """
+        :param store_dir: 快照库目录，默认读取环境变量 AI_VIDEO_MODEL_STORE
+        :param load_workers: 组件并行加载线程数，默认读取环境变量 AI_VIDEO_MODEL_LOAD_WORKERS，未设置时为 4
+        """
+        self.store_dir = store_dir or os.environ.get(MODEL_STORE_ENV) or DEFAULT_MODEL_STORE
+        self.load_workers = load_workers or max(env_int(LOAD_WORKERS_ENV, 4), 1)
+        self.load_timings: List[LoadTiming] = []  # 本进程内各次加载的耗时
+        self._lock = threading.Lock()
+
+    # ------------------------------------------------------------------
+    # 物化与清单
+    # ------------------------------------------------------------------
+
+    def materialize(self, name: str, revision: Optional[str] = None) -> Dict[str, Any]:
+        """
+        从 Hugging Face Hub 下载模型到本地快照目录并写入清单（唯一需要联网的操作）
+
+        :param name: MODEL_SPECS 中的模型名称
+        :param revision: 覆盖固定的提交
+        """
+        from huggingface_hub import HfApi, hf_hub_download, snapshot_download
+
+        spec = self.spec(name)
+        info = HfApi().model_info(spec.repo_id, revision=revision or spec.revision)
+        commit = info.sha
+        repo_files = [sibling.rfilename for sibling in info.siblings or []]
+        snapshot_dir = os.path.join(self.store_dir, spec.name, commit[:12])
+
+        components = None
+        if spec.kind == "diffusers":
+            index_path = hf_hub_download(spec.repo_id, MODEL_INDEX_FILE, revision=commit)
+            with open(index_path, "r", encoding="utf-8") as f:
+                components = self._pipeline_components(json.load(f))
+
+        print(f"📥 物化模型 {spec.name}: {spec.repo_id}@{commit[:12]}")
+        snapshot_download(
+            spec.repo_id,
+            revision=commit,
+            local_dir=snapshot_dir,
+            allow_patterns=self._allow_patterns(spec, repo_files, components),
+        )
+
+        manifest = {
+            "name": spec.name,
+            "repo_id": spec.repo_id,
+            "kind": spec.kind,
+            "revision": commit,
+            "path": commit[:12],
+            "variants": list(spec.variants),
+            "files": self._list_files(snapshot_dir),
+            "materialized_at": time.time(),
+        }
+        manifest["total_bytes"] = sum(manifest["files"].values())
+        self._write_manifest(spec.name, manifest)
+        print(f"✅ 模型 {spec.name} 已物化: {manifest['total_bytes'] / 1024 ** 3:.2f} GB, {len(manifest['files'])} 个文件")
+        return manifest
+
+    def manifest(self, name: str) -> Optional[Dict[str, Any]]:
+        path = os.path.join(self.store_dir, self.spec(name).name, MANIFEST_FILE)
+        if not os.path.exists(path):
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def snapshot_path(self, name: str) -> Optional[str]:
+        """本地快照目录，未物化时返回 None"""
+        manifest = self.manifest(name)
+        if manifest is None:
+            return None
+        path = os.path.join(self.store_dir, manifest["name"], manifest["path"])
+        return path if os.path.isdir(path) else None
+
+    def verify(self, name: str) -> List[str]:
+        """按清单检查快照文件是否完整（存在且大小一致），返回问题列表"""
+        manifest = self.manifest(name)
+        if manifest is None:
+            return ["未物化"]
+        snapshot_dir = os.path.join(self.store_dir, manifest["name"], manifest["path"])
+        problems = []
+        for relpath, size in manifest["files"].items():
+            path = os.path.join(snapshot_dir, relpath)
+            if not os.path.exists(path):
+                problems.append(f"缺失: {relpath}")
+            elif os.path.getsize(path) != size:
+                problems.append(f"大小不符: {relpath}")
+        return problems
+
+    def identity(self, name_or_repo: str) -> str:
+        """模型标识：仓库 ID，已物化时附加固定提交（模型更新后依赖输出的缓存随之失效）"""
+        try:
+            spec = self.spec(name_or_repo)
+        except KeyError:
+            return name_or_repo
+        manifest = self.manifest(spec.name)
+        return f"{spec.repo_id}@{manifest['revision']}" if manifest else spec.repo_id
+
+    def spec(self, name_or_repo: str) -> ModelSpec:
+        """按名称或 Hub 仓库 ID 查找模型"""
+        if name_or_repo in MODEL_SPECS:
+            return MODEL_SPECS[name_or_repo]
+        for spec in MODEL_SPECS.values():
+            if spec.repo_id == name_or_repo:
+                return spec
+        raise KeyError(f"模型不在快照库中: {name_or_repo}（可选 {' / '.join(MODEL_SPECS)}）")
+
+    # ------------------------------------------------------------------
+    # 加载
+    # ------------------------------------------------------------------
+
+    def load_pipeline(self, name_or_repo: str, pipeline_cls, **kwargs):
+        """
+        加载 diffusers 管线：已物化时从本地快照离线并行加载各组件，否则回退到 from_pretrained
+
+        :param name_or_repo: 模型名称或 Hub 仓库 ID（不在快照库中的 ID 直接走 from_pretrained）
+        :param kwargs: torch_dtype / variant / use_safetensors 等 from_pretrained 参数
+        """
+        name, path = self._resolve(name_or_repo)
+        start = time.perf_counter()
+        if path is None:
+            pipe = pipeline_cls.from_pretrained(self._hub_id(name_or_repo), **kwargs)
+            self._record(LoadTiming(name, "hub", time.perf_counter() - start))
+            return pipe
+
+        components, component_times = self._load_components(path, pipeline_cls, kwargs)
+        pipe = pipeline_cls(**components)
+        pipe.register_to_config(_name_or_path=path)
+        self._record(LoadTiming(name, "store", time.perf_counter() - start, component_times))
+        return pipe
+
+    def load_model(self, name_or_repo: str, model_cls, **kwargs):
+        """加载 transformers 模型 / 处理器：已物化时从本地快照离线加载，否则回退到 from_pretrained"""
+        name, path = self._resolve(name_or_repo)
+        start = time.perf_counter()
+        if path is None:
+            model = model_cls.from_pretrained(self._hub_id(name_or_repo), **kwargs)
+            source = "hub"
+        else:
+            model = model_cls.from_pretrained(path, local_files_only=True, **kwargs)
+            source = "store"
+        self._record(LoadTiming(f"{name}.{model_cls.__name__}", source, time.perf_counter() - start))
+        return model
+
+    def cold_start_report(self) -> Dict[str, Any]:
+        """冷启动耗时汇总"""
+        with self._lock:
+            timings = [asdict(timing) for timing in self.load_timings]
+        return {
+            "total_seconds": round(sum(timing["seconds"] for timing in timings), 2),
+            "models": timings,
+        }
+
+    def _resolve(self, name_or_repo: str) -> Tuple[str, Optional[str]]:
+        try:
+            spec = self.spec(name_or_repo)
+        except KeyError:
+            return name_or_repo, None
+        path = self.snapshot_path(spec.name)
+        if path is None:
+            print(f"⚠️ 模型 {spec.name} 未物化到快照库，回退到 Hugging Face 缓存（运行 python check_downloads.py --materialize）")
+        return spec.name, path
+
+    def _hub_id(self, name_or_repo: str) -> str:
+        return MODEL_SPECS[name_or_repo].repo_id if name_or_repo in MODEL_SPECS else name_or_repo
+
+    def _load_components(self, path: str, pipeline_cls, kwargs: Dict[str, Any]):
+        """按 model_index.json 并行加载管线组件"""
+        import torch
+
+        with open(os.path.join(path, "model_index.json"), "r", encoding="utf-8") as f:
+            index = json.load(f)
+        accepted = inspect.signature(pipeline_cls.__init__).parameters
+
+        components: Dict[str, Any] = {}
+        jobs = {}
+        for key, value in index.items():
+            if key.startswith("_") or key not in accepted:
+                continue
+            if not isinstance(value, list):
+                components[key] = value  # 管线配置项，如 force_zeros_for_empty_prompt
+            elif value[0] is None or value[1] is None:
+                components[key] = None
+            else:
+                jobs[key] = getattr(importlib.import_module(value[0]), value[1])
+
+        def load(key: str, component_cls):
+            start = time.perf_counter()
+            options = {"local_files_only": True}
+            if issubclass(component_cls, torch.nn.Module):
+                options["torch_dtype"] = kwargs.get("torch_dtype")
+                if kwargs.get("variant"):
+                    options["variant"] = kwargs["variant"]
+                if "use_safetensors" in kwargs:
+                    options["use_safetensors"] = kwargs["use_safetensors"]
+            component = component_cls.from_pretrained(os.path.join(path, key), **options)
+            return component, time.perf_counter() - start
+
+        timings = {}
+        with ThreadPoolExecutor(max_workers=self.load_workers, thread_name_prefix="model-load") as pool:
+            futures = {key: pool.submit(load, key, component_cls) for key, component_cls in jobs.items()}
+            for key, future in futures.items():
+                components[key], timings[key] = future.result()
+        return components, timings
+
+    def _record(self, timing: LoadTiming):
+        with self._lock:
+            self.load_timings.append(timing)
+        detail = ", ".join(f"{key} {seconds:.1f}s" for key, seconds in sorted(
+            timing.components.items(), key=lambda item: -item[1]))
+        print(f"⏱️ 冷加载 {timing.name}（{timing.source}）: {timing.seconds:.1f}s" + (f"（{detail}）" if detail else ""))
+
+    @staticmethod
+    def _pipeline_components(model_index: Dict[str, Any]) -> List[str]:
+        """model_index.json 中以 [库, 类名] 声明的组件（值为 null 的可选组件不物化）"""
+        return sorted(
+            key for key, value in model_index.items()
+            if not key.startswith("_") and isinstance(value, list) and len(value) == 2 and value[0]
+        )
+
+    @staticmethod
+    def _allow_patterns(spec: ModelSpec, repo_files: List[str],
+                        components: Optional[List[str]] = None) -> List[str]:
+        """
+        :param components: diffusers 管线的组件子目录；为 None 时按单模型仓库处理（根目录与一级子目录）
+        """
+        if components is None:
+            patterns = list(CONFIG_PATTERNS)
+            prefixes = ["*", "*/*"]
+            weight_files = repo_files
+        else:
+            patterns = [MODEL_INDEX_FILE] + [f"{component}/{file_type}"
+                                             for component in components for file_type in COMPONENT_FILE_TYPES]
+            prefixes = [f"{component}/*" for component in components]
+            weight_files = [name for name in repo_files if name.split("/", 1)[0] in components]
+
+        for variant in spec.variants:
+            suffix = f".{variant}.safetensors" if variant else ".safetensors"
+            patterns += [f"{prefix}{suffix}" for prefix in prefixes]
+        if not any(name.endswith(".safetensors") for name in weight_files):
+            patterns += [f"{prefix}.bin" for prefix in prefixes]  # 没有 safetensors 权重时使用 PyTorch 权重
+        return patterns
+
+    @staticmethod
+    def _list_files(snapshot_dir: str) -> Dict[str, int]:
+        files = {}
+        for root, dirs, names in os.walk(snapshot_dir):
+            dirs[:] = [d for d in dirs if d != ".cache"]
+            for file_name in names:
+                path = os.path.join(root, file_name)
+                files[os.path.relpath(path, snapshot_dir)] = os.path.getsize(path)
+        return files
+
+    def _write_manifest(self, name: str, manifest: Dict[str, Any]):
+        path = os.path.join(self.store_dir, name, MANIFEST_FILE)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+        os.replace(temp_path, path)
+
+
+_default_store: Optional[ModelStore] = None
+
+
+def get_model_store() -> ModelStore:
+    """进程内共享的模型快照库（汇总所有生成器的冷加载耗时）"""
+    global _default_store
+    if _default_store is None:
+        _default_store = ModelStore()
+    return _default_store
@@ -0,0 +1,196 @@
+import os
+import json
+import time
+import uuid
+import zipfile
+import hashlib
+import threading
+from typing import Any, Dict, Iterator, List, Optional
+from dataclasses import dataclass
+from PIL import Image
+import numpy as np
+
+
+@dataclass
+class ClipKey:
+    """运动片段缓存键"""
+    content_hash: str  # 条件图像像素内容哈希
+    params_hash: str  # 运动参数哈希
+
+    @property
+    def exact(self) -> str:
+        return hashlib.sha256(f"{self.content_hash}:{self.params_hash}".encode()).hexdigest()[:32]
+
+
+class ClipWriter:
+    """逐块写入运动片段，提交后才对缓存可见"""
+
+    def __init__(self, cache: "MotionClipCache", key: ClipKey):
+        self.cache = cache
+        self.key = key
+        self.temp_path = os.path.join(cache.cache_dir, f"{key.exact}.{uuid.uuid4().hex}.tmp")
+        self._zip = zipfile.ZipFile(self.temp_path, 'w', compression=zipfile.ZIP_DEFLATED)
+        self._chunks = 0
+        self._frames = 0
+
+    def add_chunk(self, frames: List[Image.Image]):
+        """写入一个帧块（uint8 数组，npz 容器内每块一个条目）"""
+        array = np.stack([np.asarray(frame.convert('RGB')) for frame in frames])
+        with self._zip.open(f"chunk_{self._chunks:05d}.npy", 'w', force_zip64=True) as f:
+            np.lib.format.write_array(f, array, allow_pickle=False)
+        self._chunks += 1
+        self._frames += len(frames)
+
+    def commit(self):
+        """完成写入并登记到缓存"""
+        self._zip.close()
+        self.cache._register(self.key, self.temp_path, self._frames)
+
+    def abort(self):
+        """放弃写入（例如生成中途失败或调用方提前停止）"""
+        try:
+            self._zip.close()
+        finally:
+            if os.path.exists(self.temp_path):
+                os.remove(self.temp_path)
+
+
+class MotionClipCache:
+    """SVD 运动片段缓存
+
+    以条件图像的像素内容哈希、加上帧数、步数、帧率、motion_bucket_id、
+    noise_aug_strength 和随机种子作为键。帧以 uint8 数组分块存入压缩的 npz 容器，
+    读取时逐块解压，不需要一次性载入整段片段。按总字节数做 LRU 淘汰。
+    """
+
+    INDEX_FILE = "index.json"
+
+    def __init__(self, cache_dir: str = "data/cache/motion_clips", max_bytes: int = 4 * 1024 ** 3):
+        """
+        :param cache_dir: 缓存目录
+        :param max_bytes: 缓存总容量上限（字节）
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._index: Dict[str, Dict[str, Any]] = self._load_index()
+
+    def make_key(self, image: Image.Image, num_frames: int, num_inference_steps: int, fps: int,
+                 motion_bucket_id: int, noise_aug_strength: float, seed: Optional[int],
+                 **extra: Any) -> ClipKey:
+        """根据条件图像和运动参数构建缓存键（extra 用于分块大小等影响输出的其他参数）"""
+        rgb = image.convert('RGB')
+        content = hashlib.sha256()
+        content.update(f"{rgb.width}x{rgb.height}".encode())
+        content.update(rgb.tobytes())
+
+        params = {
+            "num_frames": int(num_frames),
+            "num_inference_steps": int(num_inference_steps),
+            "fps": int(fps),
+            "motion_bucket_id": int(motion_bucket_id),
+            "noise_aug_strength": round(float(noise_aug_strength), 6),
+            "seed": seed,
+            **extra,
+        }
+        params_hash = hashlib.sha256(json.dumps(params, sort_keys=True).encode()).hexdigest()[:16]
+
+        return ClipKey(
+            content_hash=content.hexdigest(),
+            params_hash=params_hash
+        )
+
+    def get(self, key: ClipKey) -> Optional[Iterator[List[Image.Image]]]:
+        """查找缓存片段，命中时返回逐块产出帧的迭代器"""
+        with self._lock:
+            # 只按像素内容精确匹配：感知哈希会把纯色、同向渐变等不同图像判为相同
+            entry = self._index.get(key.exact)
+            if entry is None:
+                self.stats["misses"] += 1
+                return None
+
+            # 在锁内打开文件：之后即使并发淘汰删除了文件，已打开的句柄仍可读完（文件已消失时视为未命中）
+            try:
+                container = np.load(os.path.join(self.cache_dir, entry["file"]), allow_pickle=False)
+            except FileNotFoundError:
+                del self._index[key.exact]
+                self._save_index()
+                self.stats["misses"] += 1
+                return None
+
+            entry["last_access"] = time.time()
+            self.stats["hits"] += 1
+            self._save_index()
+
+        return self._read_chunks(container)
+
+    def open_writer(self, key: ClipKey) -> ClipWriter:
+        """开始写入一个新片段"""
+        return ClipWriter(self, key)
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            for entry in self._index.values():
+                path = os.path.join(self.cache_dir, entry["file"])
+                if os.path.exists(path):
+                    os.remove(path)
+            self._index = {}
+            self._save_index()
+
+    def total_bytes(self) -> int:
+        """当前缓存占用字节数"""
+        return sum(entry["bytes"] for entry in self._index.values())
+
+    @staticmethod
+    def _read_chunks(container) -> Iterator[List[Image.Image]]:
+        with container:
+            for name in sorted(container.files):
+                yield [Image.fromarray(frame) for frame in container[name]]
+
+    def _register(self, key: ClipKey, temp_path: str, num_frames: int):
+        file_name = f"{key.exact}.npz"
+        os.replace(temp_path, os.path.join(self.cache_dir, file_name))
+
+        with self._lock:
+            self._index[key.exact] = {
+                "file": file_name,
+                "frames": num_frames,
+                "bytes": os.path.getsize(os.path.join(self.cache_dir, file_name)),
+                "last_access": time.time(),
+            }
+            self._evict()
+            self._save_index()
+
+    def _evict(self):
+        """按最近访问时间淘汰，直到总容量不超过上限"""
+        total = self.total_bytes()
+        for name, entry in sorted(self._index.items(), key=lambda item: item[1]["last_access"]):
+            if total <= self.max_bytes:
+                break
+            path = os.path.join(self.cache_dir, entry["file"])
+            if os.path.exists(path):
+                os.remove(path)
+            total -= entry["bytes"]
+            del self._index[name]
+            self.stats["evictions"] += 1
+
+    def _load_index(self) -> Dict[str, Dict[str, Any]]:
+        path = os.path.join(self.cache_dir, self.INDEX_FILE)
+        if os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+            except Exception as e:
+                print(f"⚠️ 运动片段缓存索引读取失败，重建索引: {e}")
+        return {}
+
+    def _save_index(self):
+        path = os.path.join(self.cache_dir, self.INDEX_FILE)
+        temp_path = f"{path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(self._index, f)
+        os.replace(temp_path, path)
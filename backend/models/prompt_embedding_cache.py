@@ -0,0 +1,142 @@
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+# 设置后将嵌入持久化到该目录，进程重启后无需重新编码
+PROMPT_EMBED_DIR_ENV = "AI_VIDEO_PROMPT_EMBED_DIR"
+
+EMBEDDING_KEYS = ("prompt_embeds", "negative_prompt_embeds", "pooled_prompt_embeds", "negative_pooled_prompt_embeds")
+
+
+class PromptEmbeddingCache:
+    """SDXL 提示词嵌入缓存
+
+    角色与场景提示词由少量固定模板拼接而成，负面提示词是常量，
+    缓存两个文本编码器的输出（含 pooled 与负面嵌入）后，重复提示词的生成不再运行文本编码器。
+    内存中按 LRU 保留，可选持久化到磁盘。
+    """
+
+    def __init__(self, cache_dir: Optional[str] = None, max_entries: int = 256):
+        """
+        :param cache_dir: 磁盘缓存目录，None 表示只缓存在内存中
+        :param max_entries: 内存中保留的最大条目数
+        """
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "disk_hits": 0, "misses": 0}
+
+        if self.cache_dir:
+            os.makedirs(self.cache_dir, exist_ok=True)
+
+    def prompt_kwargs(self, pipe, prompt: str, negative_prompt: Optional[str] = None) -> Dict[str, Any]:
+        """
+        生成管线调用的提示词参数：能编码时返回预计算嵌入，否则原样返回文本
+
+        :param pipe: SDXL 管线
+        :param prompt: 提示词
+        :param negative_prompt: 负面提示词
+        """
+        embeddings = self.get(pipe, prompt, negative_prompt)
+        if embeddings is None:
+            kwargs = {"prompt": prompt}
+            if negative_prompt is not None:
+                kwargs["negative_prompt"] = negative_prompt
+            return kwargs
+        return dict(embeddings)
+
+    def get(self, pipe, prompt: str, negative_prompt: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """获取（必要时计算）提示词嵌入，管线不支持 encode_prompt 时返回 None"""
+        if not hasattr(pipe, "encode_prompt"):
+            return None
+
+        key = self._key(pipe, prompt, negative_prompt)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.stats["hits"] += 1
+                return entry
+
+        device = getattr(pipe, "_execution_device", None)
+        entry = self._load(key, device)
+        if entry is not None:
+            self.stats["disk_hits"] += 1
+        else:
+            entry = self._encode(pipe, prompt, negative_prompt, device)
+            self.stats["misses"] += 1
+            self._save(key, entry)
+
+        with self._lock:
+            self._entries[key] = entry
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def clear(self):
+        """清空内存缓存（磁盘缓存保留）"""
+        with self._lock:
+            self._entries.clear()
+
+    @staticmethod
+    def _key(pipe, prompt: str, negative_prompt: Optional[str]) -> str:
+        """按模型、精度和提示词文本构建缓存键"""
+        model_id = getattr(pipe, "name_or_path", None) or type(pipe).__name__
+        dtype = getattr(pipe, "dtype", "")
+        text = f"{model_id}\x00{dtype}\x00{prompt}\x00{negative_prompt if negative_prompt is not None else ''}"
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()[:32]
+
+    @staticmethod
+    def _encode(pipe, prompt: str, negative_prompt: Optional[str], device) -> Dict[str, Any]:
+        """运行两个文本编码器（始终计算负面嵌入，guidance_scale <= 1 时管线会忽略它们）"""
+        import torch
+
+        with torch.inference_mode():
+            outputs = pipe.encode_prompt(
+                prompt=prompt,
+                device=device,
+                num_images_per_prompt=1,
+                do_classifier_free_guidance=True,
+                negative_prompt=negative_prompt,
+            )
+        return dict(zip(EMBEDDING_KEYS, outputs))
+
+    def _path(self, key: str) -> Optional[str]:
+        return os.path.join(self.cache_dir, f"{key}.pt") if self.cache_dir else None
+
+    def _load(self, key: str, device) -> Optional[Dict[str, Any]]:
+        path = self._path(key)
+        if not path or not os.path.exists(path):
+            return None
+        try:
+            import torch
+            return torch.load(path, map_location=device or "cpu", weights_only=True)
+        except Exception as e:
+            print(f"⚠️ 提示词嵌入缓存读取失败，重新编码: {e}")
+            return None
+
+    def _save(self, key: str, entry: Dict[str, Any]):
+        path = self._path(key)
+        if not path:
+            return
+        try:
+            import torch
+            temp_path = f"{path}.tmp"
+            torch.save({name: tensor.cpu() for name, tensor in entry.items() if tensor is not None}, temp_path)
+            os.replace(temp_path, path)
+        except Exception as e:
+            print(f"⚠️ 提示词嵌入缓存写入失败: {e}")
+
+
+_default_cache: Optional[PromptEmbeddingCache] = None
+
+
+def get_prompt_embedding_cache() -> PromptEmbeddingCache:
+    """进程内共享的提示词嵌入缓存（各生成器使用同一 SDXL 模型时共享嵌入）"""
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = PromptEmbeddingCache(os.environ.get(PROMPT_EMBED_DIR_ENV) or None)
+    return _default_cache
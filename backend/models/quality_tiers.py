@@ -0,0 +1,121 @@
+import os
+import weakref
+import threading
+from dataclasses import dataclass, asdict
+from typing import Any, Dict, Optional, Tuple
+
+# 部署默认质量档位（请求未指定时使用）
+QUALITY_ENV = "AI_VIDEO_QUALITY"
+DEFAULT_QUALITY = "standard"
+
+# 采样调度器：名称 -> (diffusers 调度器类名, from_config 覆盖参数)，default 为管线自带调度器
+# lcm 需要 LCM 蒸馏权重或 LCM-LoRA，普通 SDXL 权重下请使用 dpmpp_2m_karras
+SCHEDULERS = {
+    "default": None,
+    "dpmpp_2m_karras": ("DPMSolverMultistepScheduler", {"algorithm_type": "dpmsolver++", "use_karras_sigmas": True}),
+    "euler_a": ("EulerAncestralDiscreteScheduler", {}),
+    "lcm": ("LCMScheduler", {}),
+}
+
+
+@dataclass(frozen=True)
+class QualityTier:
+    """质量档位 - 统一决定各生成器的采样器、步数、分辨率和帧率"""
+    name: str
+    scheduler: str  # SCHEDULERS 中的名称
+    image_steps: int  # SDXL 角色 / 场景图像步数
+    guidance_scale: float
+    image_scale: float  # SDXL 输出尺寸相对各生成器基准尺寸的缩放
+    svd_steps: int  # SVD 运动片段步数
+    max_video_height: Optional[int]  # 合成视频高度上限（按比例缩小），None 表示不限制
+    max_fps: Optional[int]  # 合成视频 / SVD 交付帧率上限
+    interpolation_quality: str  # SVD 插帧档位
+
+    def image_size(self, width: int, height: int) -> Tuple[int, int]:
+        """按档位缩放图像尺寸（取 64 的倍数，且不小于 512）"""
+        def scale(value: int) -> int:
+            return max(512, int(round(value * self.image_scale / 64)) * 64)
+        return scale(width), scale(height)
+
+    def video_resolution(self, resolution: Tuple[int, int]) -> Tuple[int, int]:
+        """按高度上限等比缩小视频分辨率（取偶数，满足编码器要求）"""
+        width, height = resolution
+        if not self.max_video_height or height <= self.max_video_height:
+            return resolution
+        ratio = self.max_video_height / height
+        return int(width * ratio) // 2 * 2, self.max_video_height
+
+    def video_fps(self, fps: int) -> int:
+        return min(fps, self.max_fps) if self.max_fps else fps
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+QUALITY_TIERS = {
+    "draft": QualityTier(
+        name="draft", scheduler="dpmpp_2m_karras", image_steps=8, guidance_scale=5.0, image_scale=0.75,
+        svd_steps=10, max_video_height=540, max_fps=12, interpolation_quality="fast",
+    ),
+    "standard": QualityTier(
+        name="standard", scheduler="dpmpp_2m_karras", image_steps=20, guidance_scale=7.0, image_scale=1.0,
+        svd_steps=20, max_video_height=1080, max_fps=24, interpolation_quality="balanced",
+    ),
+    "high": QualityTier(
+        name="high", scheduler="default", image_steps=50, guidance_scale=7.5, image_scale=1.0,
+        svd_steps=50, max_video_height=None, max_fps=None, interpolation_quality="quality",
+    ),
+}
+
+
+def get_quality_tier(name: Optional[str] = None) -> QualityTier:
+    """
+    获取质量档位
+
+    :param name: 档位名称（draft / standard / high），默认读取环境变量 AI_VIDEO_QUALITY，未设置时为 standard
+    """
+    name = (name or os.environ.get(QUALITY_ENV) or DEFAULT_QUALITY).lower()
+    if name not in QUALITY_TIERS:
+        raise ValueError(f"不支持的质量档位: {name}（可选 {' / '.join(QUALITY_TIERS)}）")
+    return QUALITY_TIERS[name]
+
+
+# 每条管线按采样器派生的管线视图（与基础管线共享权重，只替换调度器；基础管线保持加载时的调度器）
+_scheduled_pipelines: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+# 每条管线的互斥锁（共享 UNet，且调度器带步进状态）
+_pipeline_locks: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+_pipeline_locks_guard = threading.Lock()
+
+
+def pipeline_lock(pipe) -> threading.RLock:
+    """
+    管线互斥锁：从取得采样器视图到去噪结束都应持有，避免并发请求交错修改共享 UNet 与调度器的时间步、步进索引
+
+    共享 UNet 的派生管线（如 img2img、采样器视图）使用基础管线的锁。
+    """
+    with _pipeline_locks_guard:
+        lock = _pipeline_locks.get(pipe)
+        if lock is None:
+            lock = _pipeline_locks[pipe] = threading.RLock()
+        return lock
+
+
+def scheduled_pipeline(pipe, name: str):
+    """
+    获取使用指定采样器的管线（不修改传入管线的 scheduler，需要 diffusers >= 0.28）
+
+    default 或管线没有调度器时返回原管线；其他采样器由 from_pipe 构建共享权重的视图并按管线缓存。
+    调用方应持有 pipeline_lock(pipe)。
+    """
+    if name == "default" or pipe is None or not hasattr(pipe, "scheduler"):
+        return pipe
+
+    views = _scheduled_pipelines.setdefault(pipe, {})
+    view = views.get(name)
+    if view is None:
+        import diffusers
+
+        class_name, overrides = SCHEDULERS[name]
+        scheduler = getattr(diffusers, class_name).from_config(pipe.scheduler.config, **overrides)
+        view = views[name] = type(pipe).from_pipe(pipe, scheduler=scheduler)
+    return view
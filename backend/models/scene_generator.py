@@ -1,11 +1,25 @@
 import os
-from typing import Dict, Any
+import uuid
+import shutil
+from typing import Dict, Any, Optional
 from dataclasses import dataclass
 from PIL import Image
 
 # 添加 Stable Diffusion 依赖
 from diffusers import StableDiffusionXLPipeline
-import torch
+
+from .inference_profile import get_inference_profile
+from .memory_planner import MemoryPlanner
+from .quality_tiers import get_quality_tier
+from .prompt_embedding_cache import get_prompt_embedding_cache
+from .warmup import sdxl_warmup
+from .model_store import get_model_store
+from .sdxl_batcher import SDXLMicroBatcher
+from .latent_asset_store import (
+    DEFAULT_VARIATION_STRENGTH, get_latent_asset_store, generate_asset, generate_variation
+)
+
+SCENE_NEGATIVE_PROMPT = "low quality, blurry, sketch, cartoon, worst quality"
 
 @dataclass
 class Scene:
@@ -26,39 +40,56 @@ class SceneGenerator:
         self.output_dir = "data/scenes"
         os.makedirs(self.output_dir, exist_ok=True)
         
-        # 加载 Stable Diffusion XL 模型
+        self.profile = get_inference_profile()
+        self.prompt_cache = get_prompt_embedding_cache()
+        self.asset_store = get_latent_asset_store()
+        
+        # 加载 Stable Diffusion XL 模型（精度与设备由推理配置决定，放置方式由内存预算决定）
         try:
-            self.pipe = StableDiffusionXLPipeline.from_pretrained(
-                model_id, 
-                torch_dtype=torch.float16,
-                variant="fp16",
-                use_safetensors=True
-            )
+            memory_plan = MemoryPlanner(self.profile).plan(["sdxl"], {"sdxl": (1024, 768)})
+            memory_plan.report()
             
-            # 如果有 GPU，移动模型到 GPU
-            if torch.cuda.is_available():
-                self.pipe = self.pipe.to("cuda")
+            self.pipe = get_model_store().load_pipeline(
+                model_id, StableDiffusionXLPipeline,
+                use_safetensors=True,
+                **self.profile.pretrained_kwargs()
+            )
+            self.pipe = memory_plan.get("sdxl").apply(self.pipe, self.profile)
         except Exception as e:
             print(f"模型加载失败: {e}")
             self.pipe = None
+        
+        # 并发请求合批生成（同尺寸、同档位的请求合成一次管线调用）
+        self.batcher = SDXLMicroBatcher(self.pipe, self.profile, self.prompt_cache) if self.pipe else None
+    
+    def warmup_targets(self) -> Dict[str, Any]:
+        """已加载管线的预热任务"""
+        if not self.pipe:
+            return {}
+        tier = get_quality_tier()
+        return {"scene.sdxl": sdxl_warmup(self.pipe, self.profile, self.prompt_cache, tier.image_size(1024, 768),
+                                          tier, SCENE_NEGATIVE_PROMPT)}
     
-    def generate_scene(self, scene_description: str) -> Scene:
+    def generate_scene(self, scene_description: str, quality: Optional[str] = None) -> Scene:
         """
         使用 Stable Diffusion XL 生成场景图像
         
         :param scene_description: 场景描述
+        :param quality: 质量档位（draft / standard / high），默认使用部署配置
         :return: Scene 对象
         """
-        # 生成唯一场景ID（使用时间戳）
-        import time
-        scene_id = str(int(time.time() * 1000))
+        tier = get_quality_tier(quality)
+        
+        # 生成唯一场景ID（并发请求下时间戳会重复）
+        scene_id = str(uuid.uuid4())
         image_path = os.path.join(self.output_dir, f"{scene_id}.png")
         
-        # 生成图像
-        generated_image = self._generate_image(scene_description)
+        # 生成图像（连同最终潜变量存入资产库，供后续变体使用）
+        width, height = tier.image_size(1024, 768)
+        asset = self._generate_asset(scene_description, width, height, tier)
         
-        if generated_image:
-            generated_image.save(image_path)
+        if asset:
+            shutil.copyfile(asset.image_path, image_path)
         else:
             # 如果生成失败，回退到占位图像
             self._create_placeholder_image(image_path, scene_description)
@@ -69,42 +100,76 @@ class SceneGenerator:
             background_path=image_path,
             metadata={
                 "type": "ai_generated", 
-                "model": "Stable Diffusion XL"
+                "model": "Stable Diffusion XL",
+                "quality": tier.name,
+                "asset_id": asset.id if asset else None,
+                "has_latents": bool(asset and asset.latent_path)
             }
         )
     
-    def _generate_image(self, description: str, width: int = 1024, height: int = 768) -> Image.Image:
+    def generate_variation(self, asset_id: str, variation: str, strength: float = DEFAULT_VARIATION_STRENGTH,
+                           quality: Optional[str] = None) -> Scene:
         """
-        使用 Stable Diffusion XL 生成图像
+        从已生成场景的缓存潜变量派生时间 / 天气 / 视角变体（低强度 img2img，只运行部分去噪步数）
         
-        :param description: 图像描述
-        :param width: 图像宽度
-        :param height: 图像高度
-        :return: 生成的图像
+        :param asset_id: 场景资产 ID（generate_scene 返回的 metadata["asset_id"]）
+        :param variation: 变体描述，如 "夜晚"、"下雨"、"低角度仰拍"
+        :param strength: 重绘强度 (0, 1]
+        :param quality: 质量档位，默认使用部署配置
+        :return: Scene 对象
         """
+        if not self.pipe:
+            raise RuntimeError("模型未初始化，无法生成变体")
+        base = self.asset_store.get(asset_id)
+        if base is None:
+            raise KeyError(f"场景资产不存在: {asset_id}")
+        
+        tier = get_quality_tier(quality)
+        asset = generate_variation(
+            self.asset_store, self.pipe, base, f"{base.prompt}, {variation}", f"{base.description}，{variation}",
+            tier, self.profile, self.prompt_cache, strength=strength, negative_prompt=SCENE_NEGATIVE_PROMPT,
+        )
+        
+        scene_id = str(uuid.uuid4())
+        image_path = os.path.join(self.output_dir, f"{scene_id}.png")
+        shutil.copyfile(asset.image_path, image_path)
+        
+        return Scene(
+            id=scene_id,
+            description=asset.description,
+            background_path=image_path,
+            metadata={
+                "type": "ai_variation",
+                "model": "Stable Diffusion XL",
+                "quality": tier.name,
+                "asset_id": asset.id,
+                "parent_asset_id": base.id,
+                "variation": variation,
+                "strength": strength,
+                "steps": asset.metadata.get("steps")
+            }
+        )
+    
+    def _generate_asset(self, description: str, width: int, height: int, tier):
+        """生成场景图像并存入资产库，失败时返回 None"""
         if not self.pipe:
             print("模型未初始化，无法生成图像")
             return None
         
         try:
-            # 生成高质量图像的提示词
-            prompt = f"High-quality, detailed scene: {description}. Photorealistic, cinematic lighting."
-            
-            # 生成图像
-            image = self.pipe(
-                prompt=prompt, 
-                negative_prompt="low quality, blurry, sketch, cartoon, worst quality",
-                height=height, 
-                width=width,
-                num_inference_steps=50,  # 推理步数
-                guidance_scale=7.5  # 引导尺度
-            ).images[0]
-            
-            return image
+            return generate_asset(
+                self.asset_store, self.pipe, description, description, self._scene_prompt(description),
+                tier, self.profile, self.prompt_cache, width, height, negative_prompt=SCENE_NEGATIVE_PROMPT,
+                batcher=self.batcher,
+            )
         except Exception as e:
             print(f"图像生成失败: {e}")
             return None
     
+    @staticmethod
+    def _scene_prompt(description: str) -> str:
+        return f"High-quality, detailed scene: {description}. Photorealistic, cinematic lighting."
+    
     def _create_placeholder_image(self, image_path: str, description: str):
         """创建占位图像（保留原有实现）"""
         width, height = 1024, 768
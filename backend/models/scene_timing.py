@@ -0,0 +1,86 @@
+import re
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from .env_config import env_float
+from .speech_synthesizer import LINE_PAUSE, SEGMENT_PAUSE, split_text
+
+# 场景首句台词前的留白、末句台词后的留白与相邻台词之间的停顿（秒）
+SCENE_LEAD_IN_ENV = "AI_VIDEO_SCENE_LEAD_IN"
+SCENE_TAIL_ENV = "AI_VIDEO_SCENE_TAIL"
+LINE_PAUSE_ENV = "AI_VIDEO_LINE_PAUSE"
+DEFAULT_SCENE_LEAD_IN = 0.5
+DEFAULT_SCENE_TAIL = 0.8
+
+# 未合成语音时的语速估算：汉字等 CJK 字符按字计，其他语言按词计
+CJK_CHARS_PER_SECOND = 4.5
+WORDS_PER_SECOND = 2.5
+
+_CJK_PATTERN = re.compile(r"[぀-ヿ㐀-䶿一-鿿가-힯]")
+_WORD_PATTERN = re.compile(r"[A-Za-z0-9]+(?:'[A-Za-z]+)?")
+
+
+def estimate_speech_duration(text: str) -> float:
+    """按字数估算台词朗读时长（秒），含句内分段之间的停顿"""
+    cjk = len(_CJK_PATTERN.findall(text))
+    words = len(_WORD_PATTERN.findall(text))
+    if not cjk and not words:
+        return 0.0
+    segments = len(split_text(text))
+    return cjk / CJK_CHARS_PER_SECOND + words / WORDS_PER_SECOND + max(segments - 1, 0) * SEGMENT_PAUSE
+
+
+@dataclass
+class ScenePauses:
+    """场景时间轴中的留白与停顿（秒）"""
+    lead_in: float = DEFAULT_SCENE_LEAD_IN
+    tail: float = DEFAULT_SCENE_TAIL
+    line_pause: float = LINE_PAUSE
+
+    @classmethod
+    def from_env(cls) -> "ScenePauses":
+        """读取环境变量 AI_VIDEO_SCENE_LEAD_IN / AI_VIDEO_SCENE_TAIL / AI_VIDEO_LINE_PAUSE，未设置时使用默认值"""
+        return cls(
+            lead_in=env_float(SCENE_LEAD_IN_ENV, DEFAULT_SCENE_LEAD_IN),
+            tail=env_float(SCENE_TAIL_ENV, DEFAULT_SCENE_TAIL),
+            line_pause=env_float(LINE_PAUSE_ENV, LINE_PAUSE),
+        )
+
+
+def time_scenes(scenes: List[Dict[str, Any]], fps: int, speech_durations: Optional[Dict[int, float]] = None,
+                pauses: Optional[ScenePauses] = None) -> float:
+    """
+    由台词语音长度推导场景时间轴
+
+    有台词的场景时长 = 首句前留白 + 各句时长 + 句间停顿 + 末句后留白，并向上取整到整帧；
+    每句台词写入场景内相对的 start / end（秒），场景写入 start（在整段视频中的起始时间）。
+    没有台词的场景保留原有时长。
+
+    :param speech_durations: 台词序号（dialogue["index"]）-> 合成语音时长；缺失的台词按字数估算
+    :return: 视频总时长（秒）
+    """
+    speech_durations = speech_durations or {}
+    pauses = pauses or ScenePauses.from_env()
+
+    offset = 0.0
+    for scene in scenes:
+        dialogues = scene.get("dialogues") or []
+        if dialogues:
+            cursor = pauses.lead_in
+            for dialogue in dialogues:
+                length = speech_durations.get(dialogue.get("index"))
+                if length is None:
+                    length = estimate_speech_duration(dialogue.get("content", ""))
+                dialogue["start"] = cursor
+                dialogue["end"] = cursor + length
+                cursor = dialogue["end"] + pauses.line_pause
+            duration = cursor - pauses.line_pause + pauses.tail
+        else:
+            duration = scene["duration"]
+
+        scene["duration"] = max(int(np.ceil(duration * fps - 1e-6)), 1) / fps
+        scene["start"] = offset
+        offset += scene["duration"]
+    return offset
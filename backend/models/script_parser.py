@@ -1,8 +1,10 @@
 import re
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from dataclasses import dataclass
 import json
 
+from .animation_timeline import EASINGS, PROPERTIES
+
 @dataclass
 class Character:
     name: str
@@ -19,6 +21,7 @@ class Scene:
     time: str = ""
     characters: List[str] = None
     actions: List[str] = None
+    animation: Optional[List[Dict[str, Any]]] = None  # 角色动画关键帧轨道（AnimationTimeline.from_spec 格式）
 
 @dataclass
 class Dialogue:
@@ -40,7 +43,13 @@ class ScriptParser:
     def __init__(self):
         self.character_pattern = r"角色[：:]\s*(.+)"
         self.scene_pattern = r"场景[：:]\s*(.+)"
+        # 动画行跟在场景行之后，内容为单条轨道或轨道列表的 JSON，归属最近的场景
+        self.animation_pattern = r"^\s*动画[：:]\s*(.+)"
         self.dialogue_pattern = r"([^：:]+)[：:]\s*(.+)"
+        # 场景描述中表示时间 / 天气的片段，拆分后同一地点的场景可复用背景
+        self.time_keywords = ["清晨", "早晨", "早上", "上午", "中午", "午后", "下午", "傍晚", "黄昏", "晚上", "夜晚",
+                              "深夜", "午夜", "白天", "黎明", "日落", "雨天", "下雨", "雨夜", "雪天", "下雪", "阴天",
+                              "晴天", "雾天", "大雾"]
     
     def parse_script(self, script_text: str) -> Script:
         """解析剧本文本"""
@@ -76,7 +85,7 @@ class ScriptParser:
     def _extract_title(self, lines: List[str]) -> str:
         """提取标题"""
         for line in lines:
-            if line.strip() and not line.startswith(('场景', '角色', '：', ':')):
+            if line.strip() and not line.startswith(('场景', '角色', '动画', '：', ':')):
                 return line.strip()
         return "未命名剧本"
     
@@ -137,13 +146,22 @@ class ScriptParser:
         scene_id = 1
         
         for line in lines:
+            animation_match = re.search(self.animation_pattern, line)
+            if animation_match:
+                tracks = self._parse_animation(animation_match.group(1))
+                if tracks and scenes:
+                    scenes[-1].animation = (scenes[-1].animation or []) + tracks
+                continue
+            
             match = re.search(self.scene_pattern, line)
             if match:
                 scene_desc = match.group(1).strip()
+                location, scene_time = self._split_scene_time(scene_desc)
                 scene = Scene(
                     id=f"scene_{scene_id}",
                     description=scene_desc,
-                    location=scene_desc,
+                    location=location,
+                    time=scene_time,
                     characters=[],
                     actions=[]
                 )
@@ -152,13 +170,65 @@ class ScriptParser:
         
         return scenes
     
+    def _parse_animation(self, spec: str) -> List[Dict[str, Any]]:
+        """解析动画行的 JSON（单条轨道或轨道列表），格式无效时忽略该行"""
+        try:
+            tracks = json.loads(spec)
+        except json.JSONDecodeError as e:
+            print(f"⚠️ 动画描述不是有效的 JSON，已忽略: {e}")
+            return []
+        if isinstance(tracks, dict):
+            tracks = [tracks]
+        if not isinstance(tracks, list):
+            print("⚠️ 动画描述需为包含 keyframes 的轨道或轨道列表，已忽略")
+            return []
+        
+        valid = []
+        for track in tracks:
+            problem = self._animation_track_problem(track)
+            if problem:
+                print(f"⚠️ 动画轨道无效（{problem}），已忽略: {track}")
+            else:
+                valid.append(track)
+        return valid
+    
+    @staticmethod
+    def _animation_track_problem(track: Any) -> Optional[str]:
+        """检查单条动画轨道，返回问题描述；有效时返回 None"""
+        if not isinstance(track, dict):
+            return "轨道需为对象"
+        if track.get("property") not in PROPERTIES:
+            return f"不支持的动画属性: {track.get('property')}"
+        keyframes = track.get("keyframes")
+        if not isinstance(keyframes, list) or not keyframes:
+            return "缺少 keyframes"
+        for keyframe in keyframes:
+            if not isinstance(keyframe, dict):
+                return "关键帧需为对象"
+            for key in ("time", "value"):
+                value = keyframe.get(key)
+                if isinstance(value, bool) or not isinstance(value, (int, float)):
+                    return f"关键帧缺少数值 {key}"
+            if keyframe.get("easing", "linear") not in EASINGS:
+                return f"不支持的缓动曲线: {keyframe.get('easing')}"
+        return None
+    
+    def _split_scene_time(self, scene_desc: str) -> tuple:
+        """将场景描述拆分为地点与时间/天气，如 "咖啡厅，夜晚" -> ("咖啡厅", "夜晚")"""
+        parts = [part for part in re.split(r"[，,、\s]+", scene_desc) if part]
+        time_parts = [part for part in parts if any(keyword in part for keyword in self.time_keywords)]
+        location_parts = [part for part in parts if part not in time_parts]
+        if not location_parts:
+            return scene_desc, ""
+        return "，".join(location_parts), "，".join(time_parts)
+    
     def _extract_dialogues(self, lines: List[str]) -> List[Dialogue]:
         """提取对话信息"""
         dialogues = []
         
         for line in lines:
             match = re.search(self.dialogue_pattern, line)
-            if match and not line.startswith(('场景', '角色')):
+            if match and not line.strip().startswith(('场景', '角色', '动画')):
                 character = match.group(1).strip()
                 content = match.group(2).strip()
                 
@@ -211,7 +281,8 @@ class ScriptParser:
                     "location": scene.location,
                     "time": scene.time,
                     "characters": scene.characters,
-                    "actions": scene.actions
+                    "actions": scene.actions,
+                    "animation": scene.animation
                 }
                 for scene in script.scenes
             ],
@@ -0,0 +1,195 @@
+import time
+import threading
+from collections import deque
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from .env_config import env_float, env_int
+
+# 攒批窗口（毫秒）与最大批大小
+BATCH_WINDOW_ENV = "AI_VIDEO_SDXL_BATCH_WINDOW_MS"
+MAX_BATCH_ENV = "AI_VIDEO_SDXL_MAX_BATCH"
+DEFAULT_BATCH_WINDOW_MS = 20
+DEFAULT_MAX_BATCH = 4
+
+
+@dataclass(frozen=True)
+class BatchKey:
+    """可合批的条件：尺寸、步数、引导尺度、采样器和每请求出图数都相同"""
+    width: int
+    height: int
+    num_inference_steps: int
+    guidance_scale: float
+    scheduler: str
+    num_images: int = 1
+
+
+@dataclass
+class ImageRequest:
+    """单个出图请求"""
+    key: BatchKey
+    prompt: str
+    negative_prompt: Optional[str]
+    future: Future
+    submitted_at: float = field(default_factory=time.perf_counter)
+
+
+class SDXLMicroBatcher:
+    """SDXL 动态微批处理 - 将并发到达的兼容请求合成一次批量管线调用，再把结果分发回各请求
+
+    首个请求最多等待一个攒批窗口；上一批运行期间到达的请求已超过窗口，下一批立即开始，
+    因此低负载时单请求延迟只增加不超过一个窗口，高负载时批大小自然增长。
+    """
+
+    def __init__(self, pipe, profile, prompt_cache, max_batch_size: Optional[int] = None,
+                 window_ms: Optional[float] = None):
+        """
+        :param pipe: SDXL 管线
+        :param profile: 推理配置
+        :param prompt_cache: 提示词嵌入缓存
+        :param max_batch_size: 最大批大小（按图像数），默认读取环境变量 AI_VIDEO_SDXL_MAX_BATCH，未设置时为 4
+        :param window_ms: 攒批窗口（毫秒），默认读取环境变量 AI_VIDEO_SDXL_BATCH_WINDOW_MS，未设置时为 20
+        """
+        self.pipe = pipe
+        self.profile = profile
+        self.prompt_cache = prompt_cache
+        self.max_batch_size = max_batch_size or env_int(MAX_BATCH_ENV, DEFAULT_MAX_BATCH)
+        self.window_s = (window_ms if window_ms is not None
+                         else env_float(BATCH_WINDOW_ENV, DEFAULT_BATCH_WINDOW_MS)) / 1000
+
+        self._queue: Deque[ImageRequest] = deque()
+        self._condition = threading.Condition()
+        self._worker: Optional[threading.Thread] = None
+        self._stopped = False
+        self.stats = {"requests": 0, "batches": 0, "max_batch": 0}
+
+    def submit(self, prompt: str, width: int, height: int, tier,
+               negative_prompt: Optional[str] = None, num_images: int = 1) -> Future:
+        """
+        提交出图请求
+
+        :param tier: 质量档位（决定步数、引导尺度与采样器）
+        :param num_images: 同一提示词生成的图像数（共享一次提示词编码）
+        :return: Future，结果为 [(图像, 最终潜变量), ...]，管线不支持步进回调时潜变量为 None
+        """
+        key = BatchKey(width, height, tier.image_steps, tier.guidance_scale, tier.scheduler, num_images)
+        request = ImageRequest(key, prompt, negative_prompt, Future())
+        with self._condition:
+            if self._stopped:
+                raise RuntimeError("批处理器已关闭")
+            self._queue.append(request)
+            self.stats["requests"] += 1
+            self._ensure_worker()
+            self._condition.notify()
+        return request.future
+
+    def generate(self, prompt: str, width: int, height: int, tier, negative_prompt: Optional[str] = None):
+        """同步出图，返回图像"""
+        return self.submit(prompt, width, height, tier, negative_prompt).result()[0][0]
+
+    def generate_with_latents(self, prompt: str, width: int, height: int, tier,
+                              negative_prompt: Optional[str] = None) -> Tuple[Any, Any]:
+        """同步出图，返回 (图像, 最终潜变量)"""
+        return self.submit(prompt, width, height, tier, negative_prompt).result()[0]
+
+    def generate_candidates(self, prompt: str, width: int, height: int, tier, num_images: int,
+                            negative_prompt: Optional[str] = None) -> List[Any]:
+        """同步为同一提示词生成多张候选图像"""
+        return [image for image, _ in self.submit(prompt, width, height, tier, negative_prompt, num_images).result()]
+
+    def shutdown(self):
+        with self._condition:
+            self._stopped = True
+            self._condition.notify_all()
+        if self._worker is not None:
+            self._worker.join()
+
+    def _ensure_worker(self):
+        if self._worker is None or not self._worker.is_alive():
+            self._worker = threading.Thread(target=self._run, name="sdxl-batcher", daemon=True)
+            self._worker.start()
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            self._run_batch(batch)
+
+    def _next_batch(self) -> Optional[List[ImageRequest]]:
+        """取出队首请求，在攒批窗口内收集与其兼容的请求"""
+        with self._condition:
+            while not self._queue and not self._stopped:
+                self._condition.wait()
+            if not self._queue:
+                return None
+
+            first = self._queue[0]
+            deadline = first.submitted_at + self.window_s
+            # 批大小按图像数计算，单个请求的出图数超过上限时单独运行
+            max_requests = max(1, self.max_batch_size // first.key.num_images)
+            while True:
+                compatible = [request for request in self._queue if request.key == first.key]
+                remaining = deadline - time.perf_counter()
+                if len(compatible) >= max_requests or remaining <= 0 or self._stopped:
+                    break
+                self._condition.wait(remaining)
+
+            batch = compatible[:max_requests]
+            for request in batch:
+                self._queue.remove(request)
+            self.stats["batches"] += 1
+            self.stats["max_batch"] = max(self.stats["max_batch"], len(batch) * first.key.num_images)
+            return batch
+
+    def _run_batch(self, batch: List[ImageRequest]):
+        from .quality_tiers import pipeline_lock, scheduled_pipeline
+        from .latent_asset_store import generate_with_latents
+
+        key = batch[0].key
+        try:
+            # 与同一管线上的 img2img 变体、预热互斥（共享 UNet 与调度器）
+            with pipeline_lock(self.pipe):
+                pipe = scheduled_pipeline(self.pipe, key.scheduler)
+                with self.profile.inference():
+                    images, latents = generate_with_latents(
+                        pipe,
+                        **self._prompt_kwargs(batch),
+                        num_images_per_prompt=key.num_images,
+                        num_inference_steps=key.num_inference_steps,
+                        guidance_scale=key.guidance_scale,
+                        width=key.width,
+                        height=key.height,
+                    )
+        except Exception as e:
+            for request in batch:
+                request.future.set_exception(e)
+            return
+
+        # 管线输出按提示词分组：[p0 的 n 张, p1 的 n 张, ...]
+        count = key.num_images
+        for index, request in enumerate(batch):
+            request.future.set_result([
+                (images[i], latents[i:i + 1] if latents is not None else None)
+                for i in range(index * count, (index + 1) * count)
+            ])
+
+    def _prompt_kwargs(self, batch: List[ImageRequest]) -> Dict[str, Any]:
+        """合并各请求的提示词嵌入（沿批维度拼接）；管线不支持预编码时传入文本列表"""
+        per_request = [
+            self.prompt_cache.prompt_kwargs(self.pipe, request.prompt, request.negative_prompt)
+            for request in batch
+        ]
+        if "prompt" in per_request[0]:
+            kwargs = {"prompt": [request.prompt for request in batch]}
+            if any(request.negative_prompt is not None for request in batch):
+                kwargs["negative_prompt"] = [request.negative_prompt or "" for request in batch]
+            return kwargs
+
+        import torch
+        return {
+            name: torch.cat([kwargs[name] for kwargs in per_request], dim=0)
+            for name in per_request[0]
+            if per_request[0][name] is not None
+        }
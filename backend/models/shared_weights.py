@@ -0,0 +1,187 @@
+import os
+import json
+import mmap
+import struct
+from typing import Any, Dict, Iterable, List, Optional
+
+# safetensors 头部中的数据类型名 -> torch 数据类型名
+SAFETENSORS_DTYPES = {
+    "F64": "float64",
+    "F32": "float32",
+    "F16": "float16",
+    "BF16": "bfloat16",
+    "I64": "int64",
+    "I32": "int32",
+    "I16": "int16",
+    "I8": "int8",
+    "U8": "uint8",
+    "BOOL": "bool",
+}
+
+# 预分叉模式下由父进程设置为自身 PID，工作进程据此汇总多进程内存报告
+PREFORK_PARENT_ENV = "AI_VIDEO_PREFORK_PARENT"
+
+# smaps_rollup 中参与内存报告的字段
+SMAPS_FIELDS = ("Rss", "Pss", "Shared_Clean", "Shared_Dirty", "Private_Clean", "Private_Dirty", "Anonymous")
+
+
+def mmap_safetensors(path: str) -> Dict[str, Any]:
+    """
+    以零拷贝方式映射 safetensors 文件中的全部张量
+
+    映射为私有可写（MAP_PRIVATE）：页面来自页缓存，在所有映射同一文件的进程间共享，
+    只有被写入的页才会复制。
+    """
+    import torch
+
+    with open(path, "rb") as f:
+        header_size = struct.unpack("<Q", f.read(8))[0]
+        header = json.loads(f.read(header_size))
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+
+    data_start = 8 + header_size
+    tensors = {}
+    for name, info in header.items():
+        if name == "__metadata__" or info["dtype"] not in SAFETENSORS_DTYPES:
+            continue
+        dtype = getattr(torch, SAFETENSORS_DTYPES[info["dtype"]])
+        begin, end = info["data_offsets"]
+        if end == begin:
+            tensors[name] = torch.empty(info["shape"], dtype=dtype)
+            continue
+        count = (end - begin) // torch.empty((), dtype=dtype).element_size()
+        tensors[name] = torch.frombuffer(buffer, dtype=dtype, count=count, offset=data_start + begin).view(info["shape"])
+    return tensors
+
+
+def remap_module(module, files: Iterable[str]) -> int:
+    """
+    将模块中与权重文件一致（名称、形状、精度、内存布局相同）的 CPU 参数替换为文件映射
+
+    加载时转换过精度或布局的参数保持不变（仍可在 fork 后写时复制共享）。
+    :return: 换成文件映射的字节数
+    """
+    state = module.state_dict(keep_vars=True)
+    remapped = set()
+    total = 0
+    for path in files:
+        try:
+            tensors = mmap_safetensors(path)
+        except Exception as e:
+            print(f"⚠️ 权重文件映射失败: {path}: {e}")
+            continue
+        for name, tensor in tensors.items():
+            target = state.get(name)
+            if (
+                target is None
+                or id(target) in remapped
+                or target.device.type != "cpu"
+                or target.dtype != tensor.dtype
+                or target.shape != tensor.shape
+                or target.stride() != tensor.stride()
+            ):
+                continue
+            target.data = tensor
+            remapped.add(id(target))
+            total += tensor.numel() * tensor.element_size()
+    return total
+
+
+def resolve_model_dir(name_or_path: Optional[str]) -> Optional[str]:
+    """模型 ID 或本地路径 -> 本地快照目录（只查本地缓存，不访问网络）"""
+    if not name_or_path:
+        return None
+    if os.path.isdir(name_or_path):
+        return name_or_path
+    try:
+        from huggingface_hub import snapshot_download
+        return snapshot_download(name_or_path, local_files_only=True)
+    except Exception:
+        return None
+
+
+def _safetensors_files(directory: str) -> List[str]:
+    if not os.path.isdir(directory):
+        return []
+    return sorted(
+        os.path.join(directory, name) for name in os.listdir(directory) if name.endswith(".safetensors")
+    )
+
+
+def share_pipeline_weights(model) -> int:
+    """
+    将 diffusers 管线各组件或 transformers 模型的权重换成 safetensors 文件映射
+
+    :return: 换成文件映射的字节数
+    """
+    import torch
+
+    components = getattr(model, "components", None)
+    if isinstance(components, dict):
+        model_dir = resolve_model_dir(getattr(model.config, "_name_or_path", None))
+        if model_dir is None:
+            return 0
+        return sum(
+            remap_module(component, _safetensors_files(os.path.join(model_dir, name)))
+            for name, component in components.items()
+            if isinstance(component, torch.nn.Module)
+        )
+
+    if isinstance(model, torch.nn.Module):
+        model_dir = resolve_model_dir(getattr(getattr(model, "config", None), "_name_or_path", None))
+        return remap_module(model, _safetensors_files(model_dir)) if model_dir else 0
+    return 0
+
+
+def process_memory(pid: int) -> Dict[str, float]:
+    """读取进程的 smaps_rollup（MB），Pss 为按共享进程数均摊后的实际占用"""
+    values = {}
+    with open(f"/proc/{pid}/smaps_rollup", "r", encoding="utf-8") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 2 and parts[0].rstrip(":") in SMAPS_FIELDS:
+                values[parts[0].rstrip(":")] = int(parts[1]) / 1024
+    return values
+
+
+def child_pids(pid: int) -> List[int]:
+    """直接子进程 PID"""
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children", "r", encoding="utf-8") as f:
+            return [int(child) for child in f.read().split()]
+    except OSError:
+        return []
+
+
+def memory_report(pids: Iterable[int]) -> Dict[str, Any]:
+    """
+    多进程内存报告：RSS 之和是不共享时的占用，PSS 之和是实际物理内存占用，两者之差即共享节省的内存
+    """
+    processes = {}
+    for pid in pids:
+        try:
+            processes[pid] = process_memory(pid)
+        except OSError:
+            continue
+
+    rss = sum(values.get("Rss", 0.0) for values in processes.values())
+    pss = sum(values.get("Pss", 0.0) for values in processes.values())
+    shared = sum(values.get("Shared_Clean", 0.0) + values.get("Shared_Dirty", 0.0) for values in processes.values())
+    return {
+        "processes": {str(pid): {key: round(value, 1) for key, value in values.items()} for pid, values in processes.items()},
+        "total_rss_mb": round(rss, 1),
+        "total_pss_mb": round(pss, 1),
+        "shared_mb": round(shared, 1),
+        "saved_mb": round(rss - pss, 1),
+        "sharing_ratio": round(rss / pss, 2) if pss else None,
+    }
+
+
+def print_memory_report(report: Dict[str, Any]):
+    print("🧠 多进程内存报告 (MB):")
+    for pid, values in report["processes"].items():
+        print(f"   PID {pid}: RSS {values.get('Rss', 0):.0f}, PSS {values.get('Pss', 0):.0f}, "
+              f"共享 {values.get('Shared_Clean', 0) + values.get('Shared_Dirty', 0):.0f}, "
+              f"私有 {values.get('Private_Clean', 0) + values.get('Private_Dirty', 0):.0f}")
+    print(f"   RSS 合计 {report['total_rss_mb']:.0f}，PSS 合计（实际占用）{report['total_pss_mb']:.0f}，"
+          f"共享节省 {report['saved_mb']:.0f}（{report['sharing_ratio']}x）")
@@ -0,0 +1,278 @@
+import re
+import zlib
+import struct
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .env_config import env_int
+
+# 单段最大字符数：SpeechT5 的注意力开销随长度平方增长，长句在标点处切分后分段合成
+MAX_SEGMENT_CHARS_ENV = "AI_VIDEO_TTS_MAX_CHARS"
+DEFAULT_MAX_SEGMENT_CHARS = 100
+# 每批合成的最大段数
+TTS_BATCH_ENV = "AI_VIDEO_TTS_BATCH"
+DEFAULT_TTS_BATCH = 8
+# 同一批内最长段与最短段的长度比上限（超过时另起一批，减少填充浪费）
+MAX_BATCH_LENGTH_RATIO = 2.0
+
+SAMPLE_RATE = 16000
+# 句内分段之间与相邻台词之间的停顿（秒）
+SEGMENT_PAUSE = 0.12
+LINE_PAUSE = 0.3
+
+# 句末标点与句内停顿标点
+SENTENCE_PUNCTUATION = "。！？!?；;…"
+CLAUSE_PUNCTUATION = "，,、：:"
+
+
+@dataclass
+class SpeechClip:
+    """单句台词的合成语音"""
+    index: int  # 台词序号
+    speaker: str
+    text: str
+    audio: np.ndarray  # float32 单声道波形
+    sample_rate: int = SAMPLE_RATE
+    start: float = 0.0  # 在对白音轨中的起始时间（秒）
+
+    @property
+    def duration(self) -> float:
+        return len(self.audio) / self.sample_rate
+
+    @property
+    def end(self) -> float:
+        return self.start + self.duration
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "index": self.index,
+            "speaker": self.speaker,
+            "text": self.text,
+            "start": round(self.start, 3),
+            "duration": round(self.duration, 3),
+        }
+
+
+def split_text(text: str, max_chars: int = DEFAULT_MAX_SEGMENT_CHARS, merge: bool = True) -> List[str]:
+    """
+    在标点处把台词切成不超过 max_chars 的分段
+
+    先按句末标点分句，过长的句子再按逗号等句内标点切分，仍然过长时按长度硬切；
+    merge 为 True 时相邻的短句在不超过上限时合并，减少分段数（流式合成时不合并，首句尽早出声）。
+    """
+    text = " ".join(text.split())
+    if not text:
+        return []
+
+    pieces = []
+    for sentence in _split_keep(text, SENTENCE_PUNCTUATION):
+        if len(sentence) <= max_chars:
+            pieces.append(sentence)
+            continue
+        for clause in _split_keep(sentence, CLAUSE_PUNCTUATION):
+            pieces.extend(clause[i:i + max_chars] for i in range(0, len(clause), max_chars))
+    if not merge:
+        return pieces
+
+    segments = []
+    for piece in pieces:
+        if segments and len(segments[-1]) + len(piece) + 1 <= max_chars:
+            segments[-1] = f"{segments[-1]} {piece}"
+        else:
+            segments.append(piece)
+    return segments
+
+
+def _split_keep(text: str, punctuation: str) -> List[str]:
+    """按标点切分并保留标点"""
+    parts = re.split(f"(?<=[{re.escape(punctuation)}])", text)
+    return [part.strip() for part in parts if part.strip()]
+
+
+def seeded_speaker_embedding(speaker: str, dim: int = 512):
+    """按角色名生成确定性的说话人嵌入（同一角色在每次生成中音色一致）"""
+    import torch
+
+    generator = torch.Generator().manual_seed(zlib.crc32(speaker.encode("utf-8")))
+    return torch.randn(dim, generator=generator) * 0.1
+
+
+class SpeechSynthesizer:
+    """逐句批量语音合成 - 台词在标点处分段，长度相近的分段一起送入 SpeechT5 与 HiFi-GAN 声码器
+
+    每句台词使用各自的说话人嵌入；输出按台词顺序排列、带起止时间的语音片段列表。
+    提供缓存时先按台词查找，只合成未命中的台词。
+    """
+
+    def __init__(self, processor, model, vocoder, profile, sample_rate: int = SAMPLE_RATE,
+                 max_chars: Optional[int] = None, max_batch: Optional[int] = None,
+                 cache=None, model_id: str = "microsoft/speecht5_tts", vocoder_id: str = "microsoft/speecht5_hifigan"):
+        """
+        :param max_chars: 单段最大字符数，默认读取环境变量 AI_VIDEO_TTS_MAX_CHARS，未设置时为 100
+        :param max_batch: 每批最大段数，默认读取环境变量 AI_VIDEO_TTS_BATCH，未设置时为 8
+        :param cache: 语音片段缓存（TTSClipCache），None 表示不缓存
+        :param model_id: 声学模型标识（参与缓存键）
+        :param vocoder_id: 声码器标识（参与缓存键）
+        """
+        self.processor = processor
+        self.model = model
+        self.vocoder = vocoder
+        self.profile = profile
+        self.sample_rate = sample_rate
+        self.max_chars = max_chars or env_int(MAX_SEGMENT_CHARS_ENV, DEFAULT_MAX_SEGMENT_CHARS)
+        self.max_batch = max_batch or env_int(TTS_BATCH_ENV, DEFAULT_TTS_BATCH)
+        self.cache = cache
+        self.model_id = model_id
+        self.vocoder_id = vocoder_id
+        self.stats = {"lines": 0, "cache_hits": 0, "segments": 0, "batches": 0}
+
+    def synthesize(self, lines: Sequence[Tuple[str, str]], speaker_embeddings: Sequence[Any],
+                   line_pause: float = LINE_PAUSE) -> List[SpeechClip]:
+        """
+        合成多句台词
+
+        :param lines: (说话人, 台词) 列表
+        :param speaker_embeddings: 与 lines 一一对应的说话人嵌入
+        :param line_pause: 相邻台词之间的停顿（秒）
+        :return: 语音片段列表（空台词跳过），start 为依次排列时的起始时间
+        """
+        waveforms: Dict[int, np.ndarray] = {}
+        keys: Dict[int, str] = {}
+        duplicates: Dict[int, int] = {}  # 同一次调用中重复的台词 -> 首次出现的序号
+        segments = []  # (台词序号, 段序号, 文本)
+        for index, (_, text) in enumerate(lines):
+            if self.cache is not None and text.strip():
+                keys[index] = self.cache_key(text, speaker_embeddings[index])
+                first = next((i for i, key in keys.items() if key == keys[index] and i != index), None)
+                if first is not None:
+                    duplicates[index] = first
+                    continue
+                cached = self.cache.get(keys[index])
+                if cached is not None:
+                    waveforms[index] = cached
+                    self.stats["cache_hits"] += 1
+                    continue
+            for position, segment in enumerate(split_text(text, self.max_chars)):
+                segments.append((index, position, segment))
+
+        audio = self._synthesize_segments(segments, speaker_embeddings) if segments else {}
+
+        pause = np.zeros(int(SEGMENT_PAUSE * self.sample_rate), dtype=np.float32)
+        for index in sorted({index for index, _, _ in segments}):
+            parts = [audio[(i, position)] for i, position, _ in segments if i == index]
+            joined = [parts[0]]
+            for part in parts[1:]:
+                joined.extend((pause, part))
+            waveforms[index] = np.concatenate(joined)
+            if index in keys:
+                self.cache.put(keys[index], waveforms[index], self.sample_rate)
+        for index, first in duplicates.items():
+            if first in waveforms:
+                waveforms[index] = waveforms[first]
+
+        clips = []
+        start = 0.0
+        for index, (speaker, text) in enumerate(lines):
+            if index not in waveforms:
+                continue
+            clip = SpeechClip(index, speaker, text, waveforms[index], self.sample_rate, start)
+            clips.append(clip)
+            start = clip.end + line_pause
+
+        self.stats["lines"] += len(clips)
+        return clips
+
+    def stream(self, text: str, speaker_embedding, pause: float = SEGMENT_PAUSE) -> Iterator[np.ndarray]:
+        """
+        逐句合成并依次产出波形，每句合成完立即产出（首句出声时间只取决于首句长度）
+
+        :param text: 台词文本
+        :param speaker_embedding: 说话人嵌入
+        :param pause: 句间停顿（秒），附在后一句波形之前
+        """
+        silence = np.zeros(int(pause * self.sample_rate), dtype=np.float32)
+        for position, sentence in enumerate(split_text(text, self.max_chars, merge=False)):
+            # 单句台词合成结果与整句缓存一致，与 synthesize 共用缓存键
+            key = self.cache_key(sentence, speaker_embedding) if self.cache is not None else None
+            audio = self.cache.get(key) if key else None
+            if audio is not None:
+                self.stats["cache_hits"] += 1
+            else:
+                audio = self._synthesize_segments([(0, 0, sentence)], [speaker_embedding])[(0, 0)]
+                if key:
+                    self.cache.put(key, audio, self.sample_rate)
+            yield np.concatenate([silence, audio]) if position else audio
+
+    def cache_key(self, text: str, speaker_embedding) -> str:
+        """台词在语音片段缓存中的键（需配置缓存）"""
+        return self.cache.make_key(
+            text, speaker_embedding, self.model_id, self.vocoder_id, self.sample_rate,
+            max_chars=self.max_chars, segment_pause=SEGMENT_PAUSE,
+        )
+
+    def _synthesize_segments(self, segments: List[Tuple[int, int, str]],
+                             speaker_embeddings: Sequence[Any]) -> Dict[Tuple[int, int], np.ndarray]:
+        """按长度排序分段，长度相近的分段组成一批合成"""
+        import torch
+
+        ordered = sorted(segments, key=lambda segment: len(segment[2]))
+        batches, batch = [], []
+        for segment in ordered:
+            if batch and (len(batch) >= self.max_batch
+                          or len(segment[2]) > MAX_BATCH_LENGTH_RATIO * max(len(batch[0][2]), 1)):
+                batches.append(batch)
+                batch = []
+            batch.append(segment)
+        if batch:
+            batches.append(batch)
+
+        device = self.model.device
+        results = {}
+        for batch in batches:
+            inputs = self.processor(text=[text for _, _, text in batch], padding=True, return_tensors="pt")
+            embeddings = torch.stack([
+                torch.as_tensor(speaker_embeddings[index]).reshape(-1).float() for index, _, _ in batch
+            ]).to(device)
+            with self.profile.inference():
+                waveforms, lengths = self.model.generate_speech(
+                    inputs["input_ids"].to(device),
+                    embeddings,
+                    attention_mask=inputs["attention_mask"].to(device),
+                    vocoder=self.vocoder,
+                    return_output_lengths=True,
+                )
+            waveforms = waveforms.float().cpu().numpy().reshape(len(batch), -1)
+            for row, (index, position, _) in enumerate(batch):
+                results[(index, position)] = waveforms[row, :int(lengths[row])].astype(np.float32)
+
+        self.stats["segments"] += len(segments)
+        self.stats["batches"] += len(batches)
+        return results
+
+
+def render_clips(clips: List[SpeechClip], sample_rate: int = SAMPLE_RATE) -> np.ndarray:
+    """按起始时间把语音片段放到一条单声道音轨上"""
+    if not clips:
+        return np.zeros(0, dtype=np.float32)
+    total = max(int(round(clip.start * sample_rate)) + len(clip.audio) for clip in clips)
+    track = np.zeros(total, dtype=np.float32)
+    for clip in clips:
+        offset = int(round(clip.start * sample_rate))
+        track[offset:offset + len(clip.audio)] += clip.audio
+    return track
+
+
+def wav_stream_header(sample_rate: int = SAMPLE_RATE, channels: int = 1) -> bytes:
+    """流式 WAV 文件头（16 位 PCM），总长度未知时 RIFF 与 data 块长度填最大值，播放器读到流结束为止"""
+    unknown = 0xFFFFFFFF
+    byte_rate = sample_rate * channels * 2
+    return (b"RIFF" + struct.pack("<I", unknown) + b"WAVE"
+            + b"fmt " + struct.pack("<IHHIIHH", 16, 1, channels, sample_rate, byte_rate, channels * 2, 16)
+            + b"data" + struct.pack("<I", unknown))
+
+
+def pcm16_bytes(audio: np.ndarray) -> bytes:
+    """float32 波形 -> 16 位小端 PCM 字节"""
+    return (np.clip(audio, -1.0, 1.0) * 32767).astype("<i2").tobytes()
@@ -0,0 +1,88 @@
+import os
+from typing import Dict, List, Optional
+from dataclasses import dataclass
+
+from .ffmpeg_utils import run_ffmpeg
+
+
+@dataclass
+class SubtitleCue:
+    """字幕条目"""
+    start: float  # 开始时间（秒）
+    end: float  # 结束时间（秒）
+    text: str
+
+
+def _format_timestamp(seconds: float, separator: str) -> str:
+    """格式化时间戳 HH:MM:SS,mmm（SRT）或 HH:MM:SS.mmm（WebVTT）"""
+    milliseconds = int(round(max(seconds, 0.0) * 1000))
+    hours, milliseconds = divmod(milliseconds, 3600 * 1000)
+    minutes, milliseconds = divmod(milliseconds, 60 * 1000)
+    secs, milliseconds = divmod(milliseconds, 1000)
+    return f"{hours:02d}:{minutes:02d}:{secs:02d}{separator}{milliseconds:03d}"
+
+
+def format_srt(cues: List[SubtitleCue]) -> str:
+    """生成 SRT 字幕文本"""
+    blocks = []
+    for index, cue in enumerate(cues, start=1):
+        blocks.append(
+            f"{index}\n"
+            f"{_format_timestamp(cue.start, ',')} --> {_format_timestamp(cue.end, ',')}\n"
+            f"{cue.text}\n"
+        )
+    return "\n".join(blocks)
+
+
+def format_webvtt(cues: List[SubtitleCue]) -> str:
+    """生成 WebVTT 字幕文本"""
+    blocks = ["WEBVTT\n"]
+    for cue in cues:
+        blocks.append(
+            f"{_format_timestamp(cue.start, '.')} --> {_format_timestamp(cue.end, '.')}\n"
+            f"{cue.text}\n"
+        )
+    return "\n".join(blocks)
+
+
+def write_subtitle_files(cues: List[SubtitleCue], base_path: str) -> Dict[str, str]:
+    """写出 SRT 与 WebVTT 字幕文件，返回格式到路径的映射"""
+    paths = {"srt": f"{base_path}.srt", "vtt": f"{base_path}.vtt"}
+
+    with open(paths["srt"], 'w', encoding='utf-8') as f:
+        f.write(format_srt(cues))
+    with open(paths["vtt"], 'w', encoding='utf-8') as f:
+        f.write(format_webvtt(cues))
+
+    return paths
+
+
+def mux_subtitle_track(video_path: str, subtitle_path: str, output_path: Optional[str] = None,
+                       language: str = "chi") -> Optional[str]:
+    """将字幕封装为 MP4 mov_text 轨道（只复制音视频流，不重新编码）
+
+    原视频中已有的字幕轨道会被替换，因此修改字幕时间或翻译字幕后重新调用即可。
+
+    :param video_path: 输入视频路径
+    :param subtitle_path: SRT/WebVTT 字幕路径
+    :param output_path: 输出路径，为空时原地替换
+    :param language: 字幕语言代码（ISO 639-2）
+    :return: 输出视频路径，失败返回 None
+    """
+    target = output_path or video_path
+    temp_path = f"{os.path.splitext(target)[0]}.subs_tmp.mp4"
+
+    success = run_ffmpeg([
+        "-i", video_path, "-i", subtitle_path,
+        "-map", "0:v", "-map", "0:a?", "-map", "1:0",
+        "-c:v", "copy", "-c:a", "copy", "-c:s", "mov_text",
+        "-metadata:s:s:0", f"language={language}",
+        temp_path
+    ])
+    if not success:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        return None
+
+    os.replace(temp_path, target)
+    return target
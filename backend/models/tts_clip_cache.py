@@ -0,0 +1,230 @@
+import os
+import json
+import time
+import hashlib
+import threading
+import unicodedata
+from contextlib import contextmanager
+from typing import Any, Dict, Optional, Set
+
+import numpy as np
+
+from .env_config import env_int
+
+# 语音片段缓存目录与容量上限（MB）
+TTS_CACHE_DIR_ENV = "AI_VIDEO_TTS_CACHE_DIR"
+TTS_CACHE_MAX_MB_ENV = "AI_VIDEO_TTS_CACHE_MAX_MB"
+DEFAULT_TTS_CACHE_DIR = "data/cache/tts_clips"
+DEFAULT_TTS_CACHE_MAX_MB = 512
+
+
+def normalize_text(text: str) -> str:
+    """规范化台词文本（全角 / 半角统一、空白折叠），仅空白或全半角不同的台词命中同一缓存"""
+    return " ".join(unicodedata.normalize("NFKC", text).split())
+
+
+class TTSClipCache:
+    """语音片段缓存
+
+    以规范化文本、说话人嵌入、声学模型与声码器标识、采样率（及分段参数）的哈希作为键，
+    波形以 16 位 FLAC 存储（soundfile 不可用时为 16 位 PCM 原始数据），按总字节数做 LRU 淘汰。
+    问候语、口头禅等常用台词在多次渲染之间无需重新合成。
+
+    命中只更新内存中的访问时间，写入与淘汰时才落盘索引。多个进程（如 prefork 工作进程）共用同一目录时，
+    落盘在索引文件锁内先读回磁盘上的索引再合并，不会相互覆盖对方新写入的条目。
+    """
+
+    INDEX_FILE = "index.json"
+    LOCK_FILE = "index.lock"
+
+    def __init__(self, cache_dir: Optional[str] = None, max_bytes: Optional[int] = None):
+        """
+        :param cache_dir: 缓存目录，默认读取环境变量 AI_VIDEO_TTS_CACHE_DIR
+        :param max_bytes: 缓存总容量上限（字节），默认读取环境变量 AI_VIDEO_TTS_CACHE_MAX_MB，未设置时为 512 MB
+        """
+        self.cache_dir = cache_dir or os.environ.get(TTS_CACHE_DIR_ENV) or DEFAULT_TTS_CACHE_DIR
+        self.max_bytes = max_bytes or env_int(TTS_CACHE_MAX_MB_ENV, DEFAULT_TTS_CACHE_MAX_MB) * 1024 * 1024
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+        self._removed: Set[str] = set()  # 上次落盘后本进程删除的条目（合并时不从磁盘索引恢复）
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._index: Dict[str, Dict[str, Any]] = self._load_index()
+
+    @staticmethod
+    def make_key(text: str, speaker_embedding, model_id: str, vocoder_id: str, sample_rate: int,
+                 **extra: Any) -> str:
+        """根据台词与合成条件构建缓存键（extra 用于分段长度等影响输出的其他参数）"""
+        embedding = np.asarray(
+            speaker_embedding.detach().float().cpu() if hasattr(speaker_embedding, "detach") else speaker_embedding,
+            dtype=np.float32,
+        )
+        digest = hashlib.sha256()
+        digest.update(normalize_text(text).encode("utf-8"))
+        digest.update(embedding.tobytes())
+        digest.update(json.dumps(
+            {"model": model_id, "vocoder": vocoder_id, "sample_rate": int(sample_rate), **extra}, sort_keys=True
+        ).encode())
+        return digest.hexdigest()[:32]
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        """查找缓存波形（float32），未命中时返回 None"""
+        with self._lock:
+            entry = self._index.get(key)
+            path = os.path.join(self.cache_dir, entry["file"]) if entry else None
+            if entry is None or not os.path.exists(path):
+                if entry is not None:
+                    del self._index[key]
+                    self._removed.add(key)
+                self.stats["misses"] += 1
+                return None
+
+            entry["last_access"] = time.time()  # 只更新内存，下次写入或淘汰时随索引落盘
+            self.stats["hits"] += 1
+
+        try:
+            return self._read_audio(path)
+        except Exception as e:
+            print(f"⚠️ 语音片段缓存读取失败: {e}")
+            return None
+
+    def put(self, key: str, audio: np.ndarray, sample_rate: int):
+        """写入波形并按容量淘汰"""
+        file_name = self._write_audio(key, audio, sample_rate)
+        with self._lock:
+            self._index[key] = {
+                "file": file_name,
+                "sample_rate": int(sample_rate),
+                "samples": int(len(audio)),
+                "bytes": os.path.getsize(os.path.join(self.cache_dir, file_name)),
+                "last_access": time.time(),
+            }
+            self._removed.discard(key)
+            self._save_index()
+
+    def clear(self):
+        """清空缓存（包括其他进程写入的条目）"""
+        with self._lock, self._index_file_lock():
+            for entry in {**self._load_index(), **self._index}.values():
+                path = os.path.join(self.cache_dir, entry["file"])
+                if os.path.exists(path):
+                    os.remove(path)
+            self._index = {}
+            self._removed.clear()
+            self._write_index()
+
+    def total_bytes(self) -> int:
+        """当前缓存占用字节数"""
+        return sum(entry["bytes"] for entry in self._index.values())
+
+    def _write_audio(self, key: str, audio: np.ndarray, sample_rate: int) -> str:
+        """原子写入：先写临时文件再替换"""
+        pcm = (np.clip(audio, -1.0, 1.0) * 32767).astype(np.int16)
+        try:
+            import soundfile as sf
+            file_name = f"{key}.flac"
+            temp_path = os.path.join(self.cache_dir, f"{file_name}.{os.getpid()}.tmp")
+            sf.write(temp_path, pcm, sample_rate, format="FLAC", subtype="PCM_16")
+        except ImportError:
+            file_name = f"{key}.pcm"
+            temp_path = os.path.join(self.cache_dir, f"{file_name}.{os.getpid()}.tmp")
+            pcm.tofile(temp_path)
+        os.replace(temp_path, os.path.join(self.cache_dir, file_name))
+        return file_name
+
+    @staticmethod
+    def _read_audio(path: str) -> np.ndarray:
+        if path.endswith(".pcm"):
+            pcm = np.fromfile(path, dtype=np.int16)
+        else:
+            import soundfile as sf
+            pcm, _ = sf.read(path, dtype="int16")
+        return pcm.astype(np.float32) / 32767
+
+    def _evict(self):
+        """按最近访问时间淘汰，直到总容量不超过上限"""
+        total = self.total_bytes()
+        for name, entry in sorted(self._index.items(), key=lambda item: item[1]["last_access"]):
+            if total <= self.max_bytes:
+                break
+            path = os.path.join(self.cache_dir, entry["file"])
+            if os.path.exists(path):
+                os.remove(path)
+            total -= entry["bytes"]
+            del self._index[name]
+            self._removed.add(name)
+            self.stats["evictions"] += 1
+
+    def _load_index(self) -> Dict[str, Dict[str, Any]]:
+        path = os.path.join(self.cache_dir, self.INDEX_FILE)
+        if os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+            except Exception as e:
+                print(f"⚠️ 语音片段缓存索引读取失败，重建索引: {e}")
+        return {}
+
+    def _save_index(self):
+        """在索引文件锁内合并磁盘上的索引（其他进程的写入、较新的访问时间），淘汰后原子写回"""
+        with self._index_file_lock():
+            for key, entry in self._load_index().items():
+                if key in self._removed:
+                    continue
+                current = self._index.get(key)
+                if current is None:
+                    self._index[key] = entry
+                elif entry.get("last_access", 0) > current["last_access"]:
+                    current["last_access"] = entry["last_access"]
+            self._removed.clear()
+            self._evict()
+            self._removed.clear()
+            self._write_index()
+
+    def _write_index(self):
+        path = os.path.join(self.cache_dir, self.INDEX_FILE)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(self._index, f)
+        os.replace(temp_path, path)
+
+    @contextmanager
+    def _index_file_lock(self):
+        """跨进程的索引文件锁（POSIX 为 fcntl，Windows 为 msvcrt）"""
+        with open(os.path.join(self.cache_dir, self.LOCK_FILE), "a+b") as f:
+            _lock_file(f)
+            try:
+                yield
+            finally:
+                _unlock_file(f)
+
+
+def _lock_file(f):
+    try:
+        import fcntl
+        fcntl.flock(f, fcntl.LOCK_EX)
+    except ImportError:
+        import msvcrt
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+
+
+def _unlock_file(f):
+    try:
+        import fcntl
+        fcntl.flock(f, fcntl.LOCK_UN)
+    except ImportError:
+        import msvcrt
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+_default_cache: Optional[TTSClipCache] = None
+
+
+def get_tts_clip_cache() -> TTSClipCache:
+    """进程内共享的语音片段缓存（VideoGenerator 与 VoiceGenerator 共用）"""
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = TTSClipCache()
+    return _default_cache
@@ -1,8 +1,11 @@
 import os
+import time
 import uuid
 import json
-from typing import List, Dict, Any, Optional
-from dataclasses import dataclass
+import shutil
+from contextlib import contextmanager
+from typing import List, Dict, Any, Iterator, Optional, Tuple
+from dataclasses import dataclass, field
 from PIL import Image, ImageDraw, ImageFont
 import numpy as np
 from pathlib import Path
@@ -10,6 +13,28 @@ import torch
 from dataclasses import dataclass
 from typing import List, Optional
 
+from .frame_compositor import FrameCompositor, Layer, image_layer, text_box_layer
+from .animation_timeline import AnimationTimeline
+from .subtitle_writer import SubtitleCue, write_subtitle_files, mux_subtitle_track
+from .motion_clip_cache import MotionClipCache
+from .frame_interpolator import FrameInterpolator
+from .inference_profile import get_inference_profile
+from .memory_planner import MemoryPlanner
+from .quality_tiers import QualityTier, get_quality_tier, pipeline_lock, scheduled_pipeline
+from .prompt_embedding_cache import get_prompt_embedding_cache
+from .warmup import sdxl_warmup, svd_warmup, speecht5_warmup
+from .model_store import get_model_store
+from .model_residency import ModelResidencyManager, move_model
+from .device_scheduler import get_device_scheduler
+from .speech_synthesizer import SpeechSynthesizer, wav_stream_header, pcm16_bytes
+from .voice_bank import DEFAULT_VOICE, get_voice_bank
+from .tts_clip_cache import get_tts_clip_cache
+from .scene_timing import ScenePauses, time_scenes
+from .audio_mixer import AudioMixer, mux_audio_track
+from .latent_asset_store import (
+    LatentAsset, DEFAULT_VARIATION_STRENGTH, get_latent_asset_store, generate_asset, generate_variation
+)
+
 @dataclass
 class Video:
     id: str
@@ -17,6 +42,30 @@ class Video:
     duration: float
     metadata: Dict[str, Any]
 
+def _resident_model(name: str, doc: str) -> property:
+    """由驻留管理器管理的模型属性：读取时换入推理设备，直接赋值时放入（赋值 None 为移除）"""
+    return property(
+        lambda self: self.residency.get(name),
+        lambda self, model: self.residency.put(name, model),
+        doc=doc,
+    )
+
+@dataclass(frozen=True)
+class RenderSettings:
+    """单次生成使用的质量档位、分辨率与帧率（随调用传递，不修改生成器上的共享默认值）"""
+    tier: QualityTier
+    resolution: tuple
+    fps: int
+
+@dataclass
+class RenderState:
+    """单次生成过程中产生的中间结果与统计（每次调用一份，随调用链传递，并发生成互不覆盖）"""
+    stage_timings: Dict[str, float] = field(default_factory=dict)  # 各阶段耗时（秒）
+    speech_clips: List = field(default_factory=list)  # 逐句对白语音片段（SpeechClip）
+    compositor_stats: Dict[str, int] = field(default_factory=dict)  # 增量合成统计
+    audio_mix_stats: Dict[str, Any] = field(default_factory=dict)  # 混音统计
+    tile_variants: Dict[tuple, Image.Image] = field(default_factory=dict)  # 缩放/透明度调整后的角色图像缓存
+
 @dataclass
 class VideoFrame:
     """视频帧数据"""
@@ -29,86 +78,110 @@ class VideoFrame:
 class VideoGenerator:
     """视频生成器 - 集成AI模型生成真实视频"""
     
-    def __init__(self):
+    sd_pipeline = _resident_model("sdxl", "SDXL 管线")
+    svd_pipeline = _resident_model("svd", "SVD 管线")
+    tts_model = _resident_model("tts", "SpeechT5 声学模型")
+    tts_vocoder = _resident_model("tts_vocoder", "HiFi-GAN 声码器")
+    
+    def __init__(self, load_models: bool = True):
+        """
+        :param load_models: 是否加载AI模型；为 False 时由调用方自行注入管线（如基准测试中的桩模型）
+        """
         self.output_dir = "data/videos"
         self.temp_dir = "data/temp"
         self.fps = 24  # 帧率
         self.resolution = (1920, 1080)  # 分辨率
+        self.scene_duration = 5.0  # 默认场景时长（秒），按语音定时时只用于没有台词的场景
+        self.scene_timing = "audio"  # 场景定时: audio（由台词语音长度推导）、fixed（固定场景时长）
+        self.character_tile_size = 200  # 角色图像边长（像素）
+        self.subtitle_mode = "soft"  # 字幕模式: soft（独立字幕轨道）、burn（烧录到画面）、both（两者兼有）
+        self.quality_tier = get_quality_tier()  # 部署默认质量档位（单次生成的档位见 RenderSettings）
         
         # 创建目录
         for dir_path in [self.output_dir, self.temp_dir]:
             os.makedirs(dir_path, exist_ok=True)
         
-        # 初始化AI模型属性
-        self.sd_pipeline = None
-        self.svd_pipeline = None
+        # 初始化AI模型属性（SDXL / SVD / SpeechT5 由驻留管理器在内存预算内换入换出）
+        self.profile = get_inference_profile()
+        self.residency = ModelResidencyManager(self.profile)
         self.tts_pipeline = None
+        self.tts_processor = None
+        self.default_speaker_embedding = None
+        self.model_store = get_model_store()
+        self.prompt_cache = get_prompt_embedding_cache()
+        self.asset_store = get_latent_asset_store()  # 背景图像与潜变量资产库（同地点场景复用 / 派生变体）
+        self.tts_cache = get_tts_clip_cache()  # 语音片段缓存（常用台词跨渲染复用）
+        self.voice_bank = get_voice_bank()  # voice_model ID -> 说话人嵌入
+        self.audio_mixer = AudioMixer()  # 对白 + 背景音乐分块混音（背景音乐见 AI_VIDEO_MUSIC_BED）
+        self.memory_plan = None
         
-        # 初始化AI模型（实际使用时取消注释）
-        self._init_ai_models()
+        # 初始化AI模型
+        if load_models:
+            self._init_ai_models()
         
         print("🎬 视频生成器初始化完成")
     
     def _init_ai_models(self):
-        """初始化AI模型"""
+        """登记AI模型，预算内放得下的先加载，其余在使用时换入"""
         try:
-            import torch
             from diffusers import StableVideoDiffusionPipeline, StableDiffusionXLPipeline
             from transformers import SpeechT5Processor, SpeechT5ForTextToSpeech, SpeechT5HifiGan
             
             print("🔄 正在加载AI模型...")
             
-            # 视频生成模型
-            try:
-                self.svd_pipeline = StableVideoDiffusionPipeline.from_pretrained(
-                    "stabilityai/stable-video-diffusion-img2vid-xt",
-                    torch_dtype=torch.float16,
-                    variant="fp16"
+            # 三条管线按需换入换出，每条只需单独放得下，按内存预算选择 offload / 切片 / 分块方案
+            self.memory_plan = MemoryPlanner(self.profile).plan_each(
+                ["svd", "sdxl", "tts"], {"sdxl": (1024, 1024), "svd": (1024, 576)}
+            )
+            self.memory_plan.report()
+            svd_plan = self.memory_plan.get("svd")
+            sdxl_plan = self.memory_plan.get("sdxl")
+            tts_plan = self.memory_plan.get("tts")
+            
+            def load_svd():
+                pipe = self.model_store.load_pipeline(
+                    "svd", StableVideoDiffusionPipeline,
+                    **self.profile.pretrained_kwargs()
                 )
-                if torch.cuda.is_available():
-                    self.svd_pipeline = self.svd_pipeline.to("cuda")
-                print("✅ Stable Video Diffusion 加载成功")
-            except Exception as e:
-                print(f"⚠️ Stable Video Diffusion 加载失败: {e}")
-                self.svd_pipeline = None
+                return svd_plan.apply(pipe, self.profile)
             
-            # 图像生成模型 - 使用SDXL
-            try:
-                self.sd_pipeline = StableDiffusionXLPipeline.from_pretrained(
-                    "stabilityai/stable-diffusion-xl-base-1.0",
-                    torch_dtype=torch.float16,
-                    variant="fp16",
-                    use_safetensors=True
+            def load_sdxl():
+                pipe = self.model_store.load_pipeline(
+                    "sdxl", StableDiffusionXLPipeline,
+                    use_safetensors=True,
+                    **self.profile.pretrained_kwargs()
                 )
-                if torch.cuda.is_available():
-                    self.sd_pipeline = self.sd_pipeline.to("cuda")
-                print("✅ Stable Diffusion XL 加载成功")
-            except Exception as e:
-                print(f"⚠️ Stable Diffusion XL 加载失败: {e}")
-                self.sd_pipeline = None
+                return sdxl_plan.apply(pipe, self.profile)
             
-            # 语音合成模型 - 使用SpeechT5
-            try:
-                self.tts_processor = SpeechT5Processor.from_pretrained("microsoft/speecht5_tts")
-                self.tts_model = SpeechT5ForTextToSpeech.from_pretrained("microsoft/speecht5_tts")
-                self.tts_vocoder = SpeechT5HifiGan.from_pretrained("microsoft/speecht5_hifigan")
-                
-                if torch.cuda.is_available():
-                    self.tts_model = self.tts_model.to("cuda")
-                    self.tts_vocoder = self.tts_vocoder.to("cuda")
-                
-                # 创建默认说话人嵌入 - 使用随机初始化而不是全零
-                self.default_speaker_embedding = torch.randn(512) * 0.1
-                if torch.cuda.is_available():
-                    self.default_speaker_embedding = self.default_speaker_embedding.to("cuda")
-                
-                print("✅ SpeechT5 TTS 加载成功")
-            except Exception as e:
-                print(f"⚠️ SpeechT5 TTS 加载失败: {e}")
-                self.tts_processor = None
+            def load_tts_model():
+                model = self.model_store.load_model("speecht5_tts", SpeechT5ForTextToSpeech)
+                return self.profile.prepare_module(model, tts_plan.device)
+            
+            def load_tts_vocoder():
+                vocoder = self.model_store.load_model("speecht5_hifigan", SpeechT5HifiGan)
+                return self.profile.prepare_module(vocoder, tts_plan.device)
+            
+            # 声码器的内存计入 tts 的估计
+            self.residency.register("svd", load_svd, svd_plan.resident_mb, self._model_mover(svd_plan))
+            self.residency.register("sdxl", load_sdxl, sdxl_plan.resident_mb, self._model_mover(sdxl_plan))
+            self.residency.register("tts", load_tts_model, tts_plan.resident_mb, self._model_mover(tts_plan))
+            self.residency.register("tts_vocoder", load_tts_vocoder, 0, self._model_mover(tts_plan))
+            
+            # 按生成流程中的使用顺序预加载
+            loaded = self.residency.preload(["tts", "tts_vocoder", "sdxl", "svd"])
+            print(f"✅ 已加载: {', '.join(loaded) or '无'}")
+            
+            # 语音合成的分词器与说话人嵌入不受驻留管理
+            if self.residency.available("tts") and self.residency.available("tts_vocoder"):
+                try:
+                    self.tts_processor = self.model_store.load_model("speecht5_tts", SpeechT5Processor)
+                    # 默认说话人嵌入取自声音库（合成时移到模型所在设备）
+                    self.default_speaker_embedding = self.voice_bank.resolve(DEFAULT_VOICE)
+                except Exception as e:
+                    print(f"⚠️ SpeechT5 分词器加载失败: {e}")
+            if self.tts_processor is None:
                 self.tts_model = None
                 self.tts_vocoder = None
-                self.default_speaker_embedding = None
             
             print("✅ AI模型初始化完成")
             
@@ -121,50 +194,119 @@ class VideoGenerator:
             self.tts_vocoder = None
             self.default_speaker_embedding = None
     
-    def generate_video(self, script, characters: List, actions: List) -> Video:
-        """生成完整视频"""
+    def _model_mover(self, plan):
+        """可整体移动的管线（无 offload、在推理设备上运行）换出时停放到 CPU，否则直接释放"""
+        if self.profile.device == "cpu" or plan.device == "cpu" or plan.offload != "none":
+            return None
+        return move_model
+    
+    def warmup_targets(self) -> Dict[str, Any]:
+        """已加载管线的预热任务（按当前质量档位与分辨率，预热期间经驻留管理器固定对应模型）"""
+        targets = {}
+        loaded = self.residency.loaded_models()
+        if "sdxl" in loaded:
+            size = self.quality_tier.image_size(1024, 1024)
+            targets["video.sdxl"] = sdxl_warmup("sdxl", self.profile, self.prompt_cache, size, self.quality_tier,
+                                                residency=self.residency)
+        if "svd" in loaded:
+            svd_plan = self.memory_plan.get("svd") if self.memory_plan else None
+            chunk = svd_plan.decode_chunk_size if svd_plan and svd_plan.decode_chunk_size else 2
+            targets["video.svd"] = svd_warmup("svd", self.profile, (1024, 576), chunk, residency=self.residency)
+        if "tts" in loaded and "tts_vocoder" in loaded and self.tts_processor and self.default_speaker_embedding is not None:
+            targets["video.tts"] = speecht5_warmup(
+                self.tts_processor, "tts", "tts_vocoder", self.default_speaker_embedding, self.profile,
+                residency=self.residency
+            )
+        return targets
+    
+    def generate_video(self, script, characters: List, actions: List, quality: Optional[str] = None) -> Video:
+        """
+        生成完整视频
+        
+        :param quality: 质量档位（draft / standard / high），决定采样器、步数、分辨率和帧率，默认使用部署配置
+        """
+        return self._generate_video(script, characters, actions, self.render_settings(quality))
+    
+    def render_settings(self, quality: Optional[str] = None) -> RenderSettings:
+        """按档位限制分辨率与帧率（并发生成各自持有一份，生成器上的默认值保持不变）"""
+        tier = get_quality_tier(quality)
+        return RenderSettings(tier, tier.video_resolution(self.resolution), tier.video_fps(self.fps))
+    
+    def _generate_video(self, script, characters: List, actions: List, settings: RenderSettings) -> Video:
         try:
             video_id = str(uuid.uuid4())
             print(f"🎬 开始生成视频: {video_id}")
             
+            state = RenderState()
+            
             # 1. 解析剧本结构
-            scenes = self._parse_script_to_scenes(script)
+            with self._timed_stage(state, "parse_script"):
+                scenes = self._parse_script_to_scenes(script)
+            
+            # 模型任务经设备调度器排队：并发生成时同一模型的任务相邻执行，减少换入换出
+            scheduler = get_device_scheduler()
             
-            # 2. 生成场景背景
-            scene_backgrounds = self._generate_scene_backgrounds(scenes)
+            # 2. 逐句合成对白
+            state.speech_clips = scheduler.submit("tts", lambda slot: self._speech_stage(script, characters, state)).result()
             
-            # 3. 生成角色图像
-            character_images = self._generate_character_images(characters)
+            # 3. 由语音长度推导场景与台词时间轴（帧数只覆盖实际内容）
+            with self._timed_stage(state, "scene_timing"):
+                self._time_scenes(scenes, settings.fps, state.speech_clips)
             
-            # 4. 生成视频帧序列
-            frames = self._generate_video_frames(scenes, scene_backgrounds, character_images, actions)
+            # 4-5. 生成场景背景与角色图像
+            scene_backgrounds, character_images = scheduler.submit(
+                "sdxl", lambda slot: self._image_stages(scenes, characters, settings, state)
+            ).result()
             
-            # 5. 合成最终视频
-            video_path = self._compose_final_video(frames, video_id)
+            # 6. 生成视频帧序列
+            with self._timed_stage(state, "video_frames"):
+                frames = self._generate_video_frames(scenes, scene_backgrounds, character_images, actions, settings, state)
             
-            # 6. 生成音频
-            audio_path = self._generate_audio(script, video_id)
+            # 7. 合成最终视频
+            with self._timed_stage(state, "compose_video"):
+                video_path = self._compose_final_video(frames, video_id, settings)
             
-            # 7. 合并音视频
-            final_video_path = self._merge_audio_video(video_path, audio_path, video_id)
+            # 8. 生成字幕文件
+            with self._timed_stage(state, "subtitles"):
+                subtitle_paths = self._generate_subtitles(scenes, video_id, settings.fps)
             
-            # 8. 清理临时文件
-            self._cleanup_temp_files(frames, scene_backgrounds, character_images)
+            # 9. 按时间轴混音（对白 + 背景音乐）
+            with self._timed_stage(state, "audio"):
+                audio_path = self._generate_audio(script, video_id, self._calculate_duration(frames, settings.fps), state)
+            
+            # 10. 合并音视频（并封装字幕轨道）
+            with self._timed_stage(state, "merge_audio_video"):
+                final_video_path = self._merge_audio_video(
+                    video_path, audio_path, video_id, subtitle_paths.get("srt")
+                )
+            
+            # 11. 清理临时文件
+            with self._timed_stage(state, "cleanup"):
+                self._cleanup_temp_files(frames, scene_backgrounds, character_images, audio_path)
             
             print(f"✅ 视频生成完成: {final_video_path}")
             
             return Video(
                 id=video_id,
                 file_path=final_video_path,
-                duration=self._calculate_duration(frames),
+                duration=self._calculate_duration(frames, settings.fps),
                 metadata={
                     "status": "completed",
                     "script": script.title if hasattr(script, 'title') else "unknown",
                     "scenes": len(scenes),
                     "characters": len(characters),
                     "frames": len(frames),
-                    "resolution": self.resolution,
-                    "fps": self.fps
+                    "resolution": settings.resolution,
+                    "fps": settings.fps,
+                    "quality": settings.tier.name,
+                    "subtitle_mode": self.subtitle_mode,
+                    "subtitles": subtitle_paths,
+                    "stage_timings": dict(state.stage_timings),
+                    "compositor": dict(state.compositor_stats),
+                    "memory_plan": self.memory_plan.to_dict() if self.memory_plan else None,
+                    "residency": self.residency.stats(),
+                    "dialogue_clips": [clip.to_dict() for clip in state.speech_clips],
+                    "audio_mix": dict(state.audio_mix_stats)
                 }
             )
             
@@ -172,6 +314,33 @@ class VideoGenerator:
             print(f"❌ 视频生成失败: {e}")
             return self._create_fallback_video(script, characters)
     
+    def _speech_stage(self, script, characters: List, state: RenderState) -> List:
+        """合成对白（使用期间固定 TTS 模型，后台换入 SDXL）"""
+        with self._timed_stage(state, "speech"), self.residency.use("tts"), self.residency.use("tts_vocoder"):
+            # 先固定 TTS 再预取：预取换入 SDXL 时不能把即将使用的 TTS 模型换出
+            self.residency.prefetch("sdxl")
+            return self._synthesize_speech(script, characters)
+    
+    def _image_stages(self, scenes: List[Dict[str, Any]], characters: List, settings: RenderSettings,
+                      state: RenderState) -> Tuple[Dict[str, str], Dict[str, str]]:
+        """生成场景背景与角色图像（使用期间固定 SDXL，不被并发任务换出）"""
+        with self.residency.use("sdxl"):
+            with self._timed_stage(state, "scene_backgrounds"):
+                scene_backgrounds = self._generate_scene_backgrounds(scenes, settings)
+            with self._timed_stage(state, "character_images"):
+                character_images = self._generate_character_images(characters, settings.tier)
+        return scene_backgrounds, character_images
+    
+    @staticmethod
+    @contextmanager
+    def _timed_stage(state: RenderState, stage: str):
+        """记录单个生成阶段的耗时"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            state.stage_timings[stage] = time.perf_counter() - start
+    
     def _parse_script_to_scenes(self, script) -> List[Dict[str, Any]]:
         """解析剧本为场景列表"""
         scenes = []
@@ -181,23 +350,70 @@ class VideoGenerator:
                 scenes.append({
                     "id": scene.id,
                     "description": scene.description,
-                    "duration": 5.0,  # 默认5秒
+                    "location": getattr(scene, 'location', '') or scene.description,
+                    "time": getattr(scene, 'time', ''),
+                    "duration": self.scene_duration,
                     "characters": scene.characters or [],
-                    "actions": scene.actions or []
+                    "actions": scene.actions or [],
+                    "animation": getattr(scene, 'animation', None),
+                    "dialogues": []
                 })
         else:
             # 如果没有场景信息，创建一个默认场景
             scenes.append({
                 "id": "scene_001",
                 "description": "默认场景",
+                "location": "默认场景",
+                "time": "",
                 "duration": 10.0,
                 "characters": [],
-                "actions": []
+                "actions": [],
+                "dialogues": []
             })
         
+        self._assign_dialogues_to_scenes(script, scenes)
+        
         return scenes
     
-    def _generate_scene_backgrounds(self, scenes: List[Dict[str, Any]]) -> Dict[str, str]:
+    def _assign_dialogues_to_scenes(self, script, scenes: List[Dict[str, Any]]):
+        """将剧本对话按顺序平均分配到各场景（剧本解析结果中对话不区分场景）"""
+        dialogues = getattr(script, 'dialogues', None) or []
+        if not dialogues or not scenes:
+            return
+        
+        per_scene = int(np.ceil(len(dialogues) / len(scenes)))
+        for index, dialogue in enumerate(dialogues):
+            scenes[index // per_scene]["dialogues"].append({
+                "index": index,
+                "character": getattr(dialogue, 'character', '角色'),
+                "content": getattr(dialogue, 'content', ''),
+                "emotion": getattr(dialogue, 'emotion', '')
+            })
+    
+    def _time_scenes(self, scenes: List[Dict[str, Any]], fps: int, speech_clips: List):
+        """按台词语音长度（未合成时按字数估算）设定场景时长与台词窗口，并把语音片段放到对应位置"""
+        if self.scene_timing != "audio":
+            return
+        
+        clips = {clip.index: clip for clip in speech_clips}
+        pauses = ScenePauses.from_env()
+        total = time_scenes(scenes, fps, {index: clip.duration for index, clip in clips.items()}, pauses)
+        
+        placed = set()
+        for scene in scenes:
+            for dialogue in scene["dialogues"]:
+                clip = clips.get(dialogue["index"])
+                if clip is not None:
+                    clip.start = scene["start"] + dialogue["start"]
+                    placed.add(clip.index)
+        for clip in speech_clips:
+            # 剧本没有对白时合成的旁白从片头留白后开始
+            if clip.index not in placed:
+                clip.start = pauses.lead_in
+        
+        print(f"⏱️ 场景时间轴: {len(scenes)} 个场景，共 {total:.2f}秒")
+    
+    def _generate_scene_backgrounds(self, scenes: List[Dict[str, Any]], settings: RenderSettings) -> Dict[str, str]:
         """生成场景背景图像"""
         backgrounds = {}
         
@@ -206,47 +422,48 @@ class VideoGenerator:
             description = scene["description"]
             
             if self.sd_pipeline:
-                # 使用AI模型生成背景
-                background_path = self._generate_ai_background(description, scene_id)
+                # 使用AI模型生成背景（同一地点复用已有资产或从其潜变量派生变体）
+                background_path = self._generate_ai_background(description, scene_id, settings, scene.get("location"))
             else:
                 # 生成占位背景
-                background_path = self._generate_placeholder_background(description, scene_id)
+                background_path = self._generate_placeholder_background(description, scene_id, settings.resolution)
             
             backgrounds[scene_id] = background_path
         
         return backgrounds
     
-    def _generate_ai_background(self, description: str, scene_id: str) -> str:
-        """使用AI模型生成背景"""
+    def _generate_ai_background(self, description: str, scene_id: str, settings: RenderSettings,
+                                location: Optional[str] = None) -> str:
+        """
+        使用AI模型生成背景
+
+        背景与其最终潜变量存入资产库：描述相同的场景直接复用图像；同一地点不同时间 / 天气的场景
+        从该地点基础资产的潜变量做低强度 img2img，只花费一小部分去噪步数。
+        """
         try:
             # 检查SD模型是否可用
             if not self.sd_pipeline:
                 raise Exception("SD模型未加载")
-                
-            prompt = f"cinematic scene: {description}, high quality, detailed, professional photography"
-            
-            # 生成图像
-            result = self.sd_pipeline(
-                prompt=prompt,
-                num_inference_steps=30,
-                guidance_scale=7.5,
-            )
             
-            # 检查结果并获取图像
-            image = None
-            if hasattr(result, 'images') and result.images and len(result.images) > 0:
-                image = result.images[0]
-            elif hasattr(result, 'image'):
-                image = result.image
+            tier = settings.tier
+            key = location or description
+            asset = self.asset_store.find(key, description, quality=tier.name)
+            if asset is not None:
+                print(f"♻️ 复用背景资产: {asset.id}")
             else:
-                raise Exception(f"无效的生成结果格式: {type(result)}")
-            
-            # 检查图像类型
-            if not hasattr(image, 'save'):
-                raise Exception(f"生成的图像类型无效: {type(image)}")
+                base = self.asset_store.find(key, quality=tier.name)
+                if base is not None:
+                    asset = self._generate_background_variant(base, self._background_prompt(description), description, tier)
+                else:
+                    width, height = tier.image_size(1024, 1024)
+                    asset = generate_asset(
+                        self.asset_store, self.sd_pipeline, key, description, self._background_prompt(description),
+                        tier, self.profile, self.prompt_cache, width, height,
+                    )
             
             # 调整图像大小
-            image = image.resize(self.resolution)
+            with Image.open(asset.image_path) as stored:
+                image = stored.convert("RGB").resize(settings.resolution)
             
             # 保存图像
             background_path = os.path.join(self.temp_dir, f"background_{scene_id}.png")
@@ -257,11 +474,55 @@ class VideoGenerator:
             
         except Exception as e:
             print(f"⚠️ AI背景生成失败，使用占位图: {str(e)}")
-            return self._generate_placeholder_background(description, scene_id)
+            return self._generate_placeholder_background(description, scene_id, settings.resolution)
     
-    def _generate_placeholder_background(self, description: str, scene_id: str) -> str:
+    @staticmethod
+    def _background_prompt(description: str) -> str:
+        return f"cinematic scene: {description}, high quality, detailed, professional photography"
+    
+    def _generate_background_variant(self, base: LatentAsset, prompt: str, description: str, tier: QualityTier,
+                                     strength: float = DEFAULT_VARIATION_STRENGTH) -> LatentAsset:
+        """从基础背景资产派生变体，潜变量不可用时退回完整文生图"""
+        try:
+            asset = generate_variation(
+                self.asset_store, self.sd_pipeline, base, prompt, description, tier,
+                self.profile, self.prompt_cache, strength=strength,
+            )
+            print(f"🌗 背景变体生成成功: {base.id} -> {asset.id}（强度 {strength}）")
+            return asset
+        except Exception as e:
+            print(f"⚠️ 背景变体生成失败，改为完整生成: {e}")
+            width, height = tier.image_size(1024, 1024)
+            return generate_asset(
+                self.asset_store, self.sd_pipeline, base.key, description, prompt,
+                tier, self.profile, self.prompt_cache, width, height,
+            )
+    
+    def generate_background_variation(self, asset_id: str, variation: str,
+                                      strength: float = DEFAULT_VARIATION_STRENGTH,
+                                      quality: Optional[str] = None) -> LatentAsset:
+        """
+        为已缓存的背景资产生成时间 / 天气 / 视角变体
+        
+        :param asset_id: 基础资产 ID
+        :param variation: 变体描述，如 "夜晚"、"下雨"、"俯视角度"
+        :param strength: 重绘强度，越小越接近原图、耗费步数越少
+        :param quality: 质量档位，默认使用 self.quality_tier
+        """
+        if not self.sd_pipeline:
+            raise RuntimeError("SD模型未加载")
+        base = self.asset_store.get(asset_id)
+        if base is None:
+            raise KeyError(f"背景资产不存在: {asset_id}")
+        tier = get_quality_tier(quality) if quality else self.quality_tier
+        return generate_variation(
+            self.asset_store, self.sd_pipeline, base, f"{base.prompt}, {variation}", f"{base.description}，{variation}",
+            tier, self.profile, self.prompt_cache, strength=strength,
+        )
+    
+    def _generate_placeholder_background(self, description: str, scene_id: str, resolution: tuple) -> str:
         """生成占位背景图像"""
-        width, height = self.resolution
+        width, height = resolution
         
         # 根据场景描述选择颜色
         colors = {
@@ -304,7 +565,7 @@ class VideoGenerator:
         
         return background_path
     
-    def _generate_character_images(self, characters: List) -> Dict[str, str]:
+    def _generate_character_images(self, characters: List, tier: QualityTier) -> Dict[str, str]:
         """生成角色图像"""
         character_images = {}
         
@@ -313,7 +574,7 @@ class VideoGenerator:
             
             if self.sd_pipeline:
                 # 使用AI模型生成角色
-                image_path = self._generate_ai_character(character, char_id)
+                image_path = self._generate_ai_character(character, char_id, tier)
             else:
                 # 生成占位角色图像
                 image_path = self._generate_placeholder_character(character, char_id)
@@ -322,7 +583,7 @@ class VideoGenerator:
         
         return character_images
     
-    def _generate_ai_character(self, character, char_id: str) -> str:
+    def _generate_ai_character(self, character, char_id: str, tier: QualityTier) -> str:
         """使用AI模型生成角色图像"""
         try:
             # 检查SD模型是否可用
@@ -333,11 +594,18 @@ class VideoGenerator:
             prompt = f"portrait of {description}, high quality, detailed face, professional photography"
             
             # 生成图像
-            result = self.sd_pipeline(
-                prompt=prompt,
-                num_inference_steps=30,
-                guidance_scale=7.5,
-            )
+            width, height = tier.image_size(1024, 1024)
+            base = self.sd_pipeline
+            with pipeline_lock(base):
+                pipe = scheduled_pipeline(base, tier.scheduler)
+                with self.profile.inference():
+                    result = pipe(
+                        **self.prompt_cache.prompt_kwargs(pipe, prompt),
+                        num_inference_steps=tier.image_steps,
+                        guidance_scale=tier.guidance_scale,
+                        width=width,
+                        height=height,
+                    )
             
             # 检查结果并获取图像
             image = None
@@ -410,26 +678,45 @@ class VideoGenerator:
         return image_path
     
     def _generate_video_frames(self, scenes: List[Dict], backgrounds: Dict[str, str], 
-                              characters: Dict[str, str], actions: List) -> List[VideoFrame]:
+                              characters: Dict[str, str], actions: List, settings: RenderSettings,
+                              state: RenderState) -> List[VideoFrame]:
         """生成视频帧序列"""
         frames = []
         frame_number = 0
+        previous_frame_path = None
+        
+        # 增量合成器：帧间只重绘发生变化的区域
+        compositor = FrameCompositor(settings.resolution)
+        character_tiles = self._load_character_tiles(characters)
         
         for scene in scenes:
             scene_id = scene["id"]
             background_path = backgrounds[scene_id]
-            duration = scene["duration"]
+            
+            # 每个场景只加载一次背景
+            compositor.set_background(Image.open(background_path).convert('RGB'))
             
             # 计算该场景的帧数
-            scene_frames = int(duration * self.fps)
+            scene_frames = self._scene_frames(scene, settings.fps)
+            if self.subtitle_mode in ("burn", "both"):
+                subtitle_schedule = self._schedule_scene_dialogues(scene, scene_frames, settings.fps)
+            else:
+                subtitle_schedule = [None] * scene_frames
+            
+            # 一次性计算整个场景所有角色的动画变换
+            transforms = self._build_scene_timeline(scene, character_tiles, settings.resolution).evaluate(
+                scene_frames, settings.fps)
+            tile_rects = transforms.tile_rects(self.character_tile_size)
             
             for i in range(scene_frames):
-                timestamp = frame_number / self.fps
+                timestamp = frame_number / settings.fps
                 
                 # 生成帧图像
                 frame_path = self._generate_frame_image(
-                    background_path, characters, scene, actions, frame_number
+                    compositor, character_tiles, subtitle_schedule[i], frame_number, settings.resolution, previous_frame_path,
+                    tile_rects[:, i], transforms.opacity[:, i], state.tile_variants
                 )
+                previous_frame_path = frame_path
                 
                 frame = VideoFrame(
                     frame_number=frame_number,
@@ -442,92 +729,223 @@ class VideoGenerator:
                 frames.append(frame)
                 frame_number += 1
         
+        state.compositor_stats = dict(compositor.stats)
         return frames
     
-    def _generate_frame_image(self, background_path: str, characters: Dict[str, str], 
-                             scene: Dict, actions: List, frame_number: int) -> str:
-        """生成单帧图像"""
-        # 加载背景
-        background = Image.open(background_path).resize(self.resolution)
+    def _load_character_tiles(self, characters: Dict[str, str]) -> Dict[str, Image.Image]:
+        """加载并缩放角色图像（每次生成只加载一次）"""
+        tiles = {}
+        tile_size = (self.character_tile_size, self.character_tile_size)
+        for char_id, char_image_path in characters.items():
+            if not os.path.exists(char_image_path):
+                continue
+            try:
+                tiles[char_id] = Image.open(char_image_path).resize(tile_size)
+            except Exception as e:
+                print(f"⚠️ 角色图像加载失败: {e}")
+        return tiles
+    
+    def _build_scene_timeline(self, scene: Dict, character_tiles: Dict[str, Image.Image],
+                              resolution: tuple) -> AnimationTimeline:
+        """构建场景动画时间线（未配置动画的角色保持静止布局）"""
+        char_positions = self._calculate_character_positions(len(character_tiles), resolution)
+        return AnimationTimeline.from_spec(
+            list(character_tiles), char_positions, self.character_tile_size, scene.get('animation')
+        )
+    
+    @staticmethod
+    def _character_tile_variant(variants: Dict[tuple, Image.Image], char_id: str, tile: Image.Image,
+                                size: int, opacity: float) -> Image.Image:
+        """获取缩放、透明度调整后的角色图像（按量化参数缓存在本次生成的 variants 中）"""
+        alpha = int(round(opacity * 255))
+        if size == tile.width and alpha == 255:
+            return tile
         
-        # 合成角色到背景上
-        composite_image = background.copy()
-        draw = ImageDraw.Draw(composite_image)
+        key = (char_id, size, alpha)
+        variant = variants.get(key)
+        if variant is None:
+            variant = tile.resize((size, size)) if size != tile.width else tile.copy()
+            if alpha < 255:
+                variant = variant.convert('RGBA')
+                variant.putalpha(variant.getchannel('A').point(lambda value: value * alpha // 255))
+            variants[key] = variant
+        return variant
+    
+    @staticmethod
+    def _scene_frames(scene: Dict, fps: int) -> int:
+        return int(round(scene["duration"] * fps))
+    
+    def _schedule_scene_dialogues(self, scene: Dict, scene_frames: int, fps: int) -> List[Optional[Dict[str, Any]]]:
+        """按帧分配场景台词：台词带语音窗口（start / end）时只在窗口内显示，否则在场景时长内平均分布"""
+        dialogues = scene.get('dialogues') or []
+        if not dialogues or scene_frames <= 0:
+            return [None] * scene_frames
         
-        # 简单的角色布局（实际应用中需要更复杂的布局算法）
-        char_positions = self._calculate_character_positions(len(characters), self.resolution)
+        if all('start' in dialogue for dialogue in dialogues):
+            schedule = [None] * scene_frames
+            for dialogue in dialogues:
+                first = min(int(round(dialogue['start'] * fps)), scene_frames)
+                last = min(int(round(dialogue['end'] * fps)), scene_frames)
+                schedule[first:last] = [dialogue] * (last - first)
+            return schedule
         
-        # 合成角色图像
-        for i, (char_id, char_image_path) in enumerate(characters.items()):
-            if i < len(char_positions) and os.path.exists(char_image_path):
-                try:
-                    # 加载角色图像
-                    char_image = Image.open(char_image_path).resize((200, 200))
-                    
-                    # 计算位置
-                    x, y = char_positions[i]
-                    
-                    # 合成到背景上
-                    composite_image.paste(char_image, (x, y), char_image if char_image.mode == 'RGBA' else None)
-                    
-                    # 添加角色名称标签
-                    char_name = char_id.replace('char_', '角色')
-                    try:
-                        font = ImageFont.load_default()
-                    except:
-                        font = None
-                    
-                    # 在角色下方添加名称
-                    text_bbox = draw.textbbox((0, 0), char_name, font=font)
-                    text_width = text_bbox[2] - text_bbox[0]
-                    text_x = x + 100 - text_width // 2
-                    text_y = y + 220
-                    
-                    # 添加文字背景
-                    draw.rectangle([text_x-5, text_y-5, text_x+text_width+5, text_y+20], 
-                                 fill=(0, 0, 0, 128))
-                    draw.text((text_x, text_y), char_name, fill=(255, 255, 255), font=font)
-                    
-                except Exception as e:
-                    print(f"⚠️ 角色图像合成失败: {e}")
+        indices = np.arange(scene_frames) * len(dialogues) // scene_frames
+        return [dialogues[index] for index in indices]
+    
+    def _build_subtitle_cues(self, scenes: List[Dict], fps: int) -> List[SubtitleCue]:
+        """根据逐帧台词分配生成字幕条目（与烧录字幕使用同一时间轴）"""
+        cues = []
+        frame_offset = 0
         
-        # 添加台词字幕（如果有对话）
-        if hasattr(scene, 'dialogues') and scene.get('dialogues'):
-            dialogue = scene['dialogues'][0] if scene['dialogues'] else None
-            if dialogue:
-                try:
-                    font = ImageFont.load_default()
-                except:
-                    font = None
-                
-                # 在底部添加字幕
-                subtitle_text = f"{dialogue.get('character', '角色')}: {dialogue.get('content', '台词')}"
-                text_bbox = draw.textbbox((0, 0), subtitle_text, font=font)
-                text_width = text_bbox[2] - text_bbox[0]
-                text_x = (self.resolution[0] - text_width) // 2
-                text_y = self.resolution[1] - 80
-                
-                # 添加字幕背景
-                draw.rectangle([text_x-10, text_y-10, text_x+text_width+10, text_y+30], 
-                             fill=(0, 0, 0, 180))
-                draw.text((text_x, text_y), subtitle_text, fill=(255, 255, 255), font=font)
+        for scene in scenes:
+            scene_frames = self._scene_frames(scene, fps)
+            schedule = self._schedule_scene_dialogues(scene, scene_frames, fps)
+            
+            run_start = 0
+            for i in range(1, scene_frames + 1):
+                if i < scene_frames and schedule[i] is schedule[run_start]:
+                    continue
+                dialogue = schedule[run_start]
+                if dialogue:
+                    cues.append(SubtitleCue(
+                        start=(frame_offset + run_start) / fps,
+                        end=(frame_offset + i) / fps,
+                        text=f"{dialogue.get('character', '角色')}: {dialogue.get('content', '台词')}"
+                    ))
+                run_start = i
+            
+            frame_offset += scene_frames
+        
+        return cues
+    
+    def _generate_subtitles(self, scenes: List[Dict], video_id: str, fps: int) -> Dict[str, str]:
+        """生成 SRT/WebVTT 字幕文件"""
+        try:
+            cues = self._build_subtitle_cues(scenes, fps)
+            if not cues:
+                return {}
+            
+            paths = write_subtitle_files(cues, os.path.join(self.output_dir, video_id))
+            print(f"✅ 字幕文件生成成功: {paths['srt']}")
+            return paths
+            
+        except Exception as e:
+            print(f"⚠️ 字幕生成失败: {e}")
+            return {}
+    
+    def replace_subtitles(self, video_path: str, subtitle_path: str, output_path: Optional[str] = None) -> Optional[str]:
+        """替换视频中的字幕轨道（重新封装，无需重新渲染）"""
+        return mux_subtitle_track(video_path, subtitle_path, output_path)
+    
+    def _generate_frame_image(self, compositor: FrameCompositor, character_tiles: Dict[str, Image.Image],
+                             dialogue: Optional[Dict[str, Any]], frame_number: int, resolution: tuple,
+                             previous_frame_path: Optional[str] = None,
+                             tile_rects: Optional[np.ndarray] = None,
+                             opacities: Optional[np.ndarray] = None,
+                             tile_variants: Optional[Dict[tuple, Image.Image]] = None) -> str:
+        """生成单帧图像"""
+        layers = self._build_frame_layers(character_tiles, dialogue, resolution, tile_rects, opacities, tile_variants)
         
-        # 保存帧
+        # 只重绘变化区域
+        dirty_rects = compositor.render(layers)
+        
+        # 保存帧（画面未变化时直接复用上一帧文件，跳过PNG编码）
         frame_path = os.path.join(self.temp_dir, f"frame_{frame_number:06d}.png")
-        composite_image.save(frame_path)
+        if not dirty_rects and previous_frame_path and os.path.exists(previous_frame_path):
+            shutil.copyfile(previous_frame_path, frame_path)
+        else:
+            compositor.frame.save(frame_path)
         
         return frame_path
     
+    def _build_frame_layers(self, character_tiles: Dict[str, Image.Image],
+                            dialogue: Optional[Dict[str, Any]], resolution: tuple,
+                            tile_rects: Optional[np.ndarray] = None,
+                            opacities: Optional[np.ndarray] = None,
+                            tile_variants: Optional[Dict[tuple, Image.Image]] = None) -> List[Layer]:
+        """构建单帧的图层列表（角色图像、角色名标签、字幕条）
+
+        :param tile_rects: 本帧各角色图像区域（来自动画时间线），为空时使用静止布局
+        :param opacities: 本帧各角色不透明度
+        :param tile_variants: 本次生成的角色图像变体缓存，为空时只在本帧内缓存
+        """
+        layers = []
+        variants = tile_variants if tile_variants is not None else {}
+        font = self._get_font()
+        measure = ImageDraw.Draw(Image.new('RGB', (1, 1)))
+        
+        if tile_rects is None:
+            # 简单的角色布局（实际应用中需要更复杂的布局算法）
+            tile_size = self.character_tile_size
+            tile_rects = [
+                (x, y, x + tile_size, y + tile_size)
+                for x, y in self._calculate_character_positions(len(character_tiles), resolution)
+            ]
+        if opacities is None:
+            opacities = [1.0] * len(tile_rects)
+        
+        for i, (char_id, char_image) in enumerate(character_tiles.items()):
+            if i >= len(tile_rects):
+                break
+            left, top, right, bottom = (int(value) for value in tile_rects[i])
+            opacity = float(opacities[i])
+            if opacity <= 0.0:
+                continue
+            
+            tile = self._character_tile_variant(variants, char_id, char_image, right - left, opacity)
+            layers.append(image_layer(
+                f"character:{char_id}", tile, (left, top), key=(char_id, tile.width, int(round(opacity * 255)))
+            ))
+            
+            # 在角色下方添加名称
+            char_name = char_id.replace('char_', '角色')
+            text_bbox = measure.textbbox((0, 0), char_name, font=font)
+            text_width = text_bbox[2] - text_bbox[0]
+            text_x = (left + right) // 2 - text_width // 2
+            text_y = bottom + 20
+            layers.append(text_box_layer(
+                f"label:{char_id}", char_name,
+                (text_x - 5, text_y - 5, text_x + text_width + 5, text_y + 20),
+                (text_x, text_y), font
+            ))
+        
+        # 添加台词字幕（如果有对话）
+        if dialogue:
+            subtitle_text = f"{dialogue.get('character', '角色')}: {dialogue.get('content', '台词')}"
+            text_bbox = measure.textbbox((0, 0), subtitle_text, font=font)
+            text_width = text_bbox[2] - text_bbox[0]
+            text_x = (resolution[0] - text_width) // 2
+            text_y = resolution[1] - 80
+            layers.append(text_box_layer(
+                "subtitle", subtitle_text,
+                (text_x - 10, text_y - 10, text_x + text_width + 10, text_y + 30),
+                (text_x, text_y), font
+            ))
+        
+        return layers
+    
+    def _get_font(self):
+        """获取并缓存默认字体"""
+        if not hasattr(self, '_font'):
+            try:
+                self._font = ImageFont.load_default()
+            except Exception:
+                self._font = None
+        return self._font
+    
     def _calculate_character_positions(self, num_characters: int, resolution: tuple) -> List[tuple]:
         """计算角色位置"""
         width, height = resolution
-        
-        if num_characters == 1:
-            return [(width // 2 - 100, height // 2 - 100)]
+        half = self.character_tile_size // 2
+
+        if num_characters <= 0:
+            return []
+        elif num_characters == 1:
+            return [(width // 2 - half, height // 2 - half)]
         elif num_characters == 2:
             return [
-                (width // 3 - 100, height // 2 - 100),
-                (2 * width // 3 - 100, height // 2 - 100)
+                (width // 3 - half, height // 2 - half),
+                (2 * width // 3 - half, height // 2 - half)
             ]
         else:
             # 更多角色的网格布局
@@ -538,13 +956,13 @@ class VideoGenerator:
             for i in range(num_characters):
                 row = i // cols
                 col = i % cols
-                x = (col + 1) * width // (cols + 1) - 100
-                y = (row + 1) * height // (rows + 1) - 100
+                x = (col + 1) * width // (cols + 1) - half
+                y = (row + 1) * height // (rows + 1) - half
                 positions.append((x, y))
             
             return positions
     
-    def _compose_final_video(self, frames: List[VideoFrame], video_id: str) -> str:
+    def _compose_final_video(self, frames: List[VideoFrame], video_id: str, settings: RenderSettings) -> str:
         """合成最终视频"""
         try:
             import cv2
@@ -556,7 +974,7 @@ class VideoGenerator:
             # 创建视频写入器
             video_path = os.path.join(self.output_dir, f"{video_id}_temp.mp4")
             fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-            out = cv2.VideoWriter(video_path, fourcc, self.fps, (width, height))
+            out = cv2.VideoWriter(video_path, fourcc, settings.fps, (width, height))
             
             # 写入帧
             for frame in frames:
@@ -568,12 +986,12 @@ class VideoGenerator:
             
         except ImportError:
             print("⚠️ OpenCV未安装，使用模拟视频")
-            return self._create_simulation_video(frames, video_id)
+            return self._create_simulation_video(frames, video_id, settings)
         except Exception as e:
             print(f"⚠️ 视频合成失败: {e}")
-            return self._create_simulation_video(frames, video_id)
+            return self._create_simulation_video(frames, video_id, settings)
     
-    def _create_simulation_video(self, frames: List[VideoFrame], video_id: str) -> str:
+    def _create_simulation_video(self, frames: List[VideoFrame], video_id: str, settings: RenderSettings) -> str:
         """创建模拟视频文件"""
         # 创建一个简单的文本文件作为视频占位符
         video_path = os.path.join(self.output_dir, f"{video_id}_temp.txt")
@@ -581,18 +999,18 @@ class VideoGenerator:
         with open(video_path, 'w', encoding='utf-8') as f:
             f.write(f"模拟视频文件 - {video_id}\n")
             f.write(f"总帧数: {len(frames)}\n")
-            f.write(f"帧率: {self.fps}\n")
-            f.write(f"分辨率: {self.resolution}\n")
-            f.write(f"时长: {len(frames) / self.fps:.2f}秒\n")
+            f.write(f"帧率: {settings.fps}\n")
+            f.write(f"分辨率: {settings.resolution}\n")
+            f.write(f"时长: {len(frames) / settings.fps:.2f}秒\n")
         
         return video_path
     
-    def _generate_audio(self, script, video_id: str) -> str:
+    def _generate_audio(self, script, video_id: str, duration: float, state: RenderState) -> str:
         """生成音频"""
         try:
-            if self.tts_processor and self.tts_model and self.tts_vocoder:
-                # 使用AI模型生成语音
-                return self._generate_ai_audio(script, video_id)
+            if state.speech_clips or self.audio_mixer.music_path:
+                # 按时间轴混合AI合成的对白与背景音乐
+                return self._generate_ai_audio(video_id, duration, state)
             else:
                 # 生成占位音频
                 return self._generate_placeholder_audio(script, video_id)
@@ -601,64 +1019,93 @@ class VideoGenerator:
             print(f"⚠️ 音频生成失败: {e}")
             return self._generate_placeholder_audio(script, video_id)
     
-    def _generate_ai_audio(self, script, video_id: str) -> str:
-        """使用AI模型生成音频"""
+    def _synthesize_speech(self, script, characters: Optional[List] = None) -> List:
+        """使用AI模型逐句合成对白（TTS 模型未加载或合成失败时返回空列表，时间轴按字数估算）"""
         try:
             # 检查TTS模型是否可用
             if not (self.tts_processor and self.tts_model and self.tts_vocoder and self.default_speaker_embedding is not None):
-                raise Exception("TTS模型或speaker_embedding未加载")
+                return []
             
-            # 提取对话文本
-            dialogues = []
+            # 提取对话文本（每句台词单独合成，使用各自角色的说话人嵌入）
+            lines = []
             if hasattr(script, 'dialogues') and script.dialogues:
                 for dialogue in script.dialogues:
-                    dialogues.append(f"{dialogue.character}: {dialogue.content}")
-            
-            if not dialogues:
-                dialogues = ["欢迎观看AI生成的视频"]
-            
-            # 合并所有对话（限制长度避免过长）
-            full_text = " ".join(dialogues)[:200]  # 限制文本长度
+                    lines.append((dialogue.character, dialogue.content))
             
-            # 生成语音
-            audio_path = os.path.join(self.temp_dir, f"audio_{video_id}.wav")
-            
-            # 使用SpeechT5生成语音
-            inputs = self.tts_processor(text=full_text, return_tensors="pt")
-            
-            # 移动输入到GPU（如果可用）
-            if torch.cuda.is_available() and self.tts_model.device.type == 'cuda':
-                inputs = {k: v.to("cuda") for k, v in inputs.items()}
-            
-            # 确保speaker_embedding维度正确
-            speaker_embedding = self.default_speaker_embedding
-            if speaker_embedding.dim() == 1:
-                speaker_embedding = speaker_embedding.unsqueeze(0)
-            
-            # 生成语音
-            with torch.no_grad():
-                speech = self.tts_model.generate_speech(
-                    inputs["input_ids"], 
-                    speaker_embedding, 
-                    vocoder=self.tts_vocoder
-                )
+            if not lines:
+                lines = [("旁白", "欢迎观看AI生成的视频")]
             
-            # 保存音频文件
-            try:
-                import soundfile as sf
-                # 确保音频数据在CPU上
-                audio_data = speech.cpu().numpy() if hasattr(speech, 'cpu') else speech
-                sf.write(audio_path, audio_data, 16000)
-            except ImportError:
-                # 如果soundfile不可用，创建占位文件
-                raise Exception("soundfile库未安装")
-            
-            print(f"✅ AI音频生成成功: {audio_path}")
-            return audio_path
+            synthesizer = self._speech_synthesizer()
+            clips = synthesizer.synthesize(lines, [self._speaker_embedding(speaker, characters) for speaker, _ in lines])
+            print(f"✅ 对白合成完成: {len(clips)} 句，缓存命中 {synthesizer.stats['cache_hits']} 句，"
+                  f"合成 {synthesizer.stats['segments']} 段 / {synthesizer.stats['batches']} 批")
+            return clips
                 
         except Exception as e:
-            print(f"⚠️ AI音频生成失败: {e}")
-            return self._generate_placeholder_audio(script, video_id)
+            print(f"⚠️ 对白合成失败: {e}")
+            return []
+    
+    def _generate_ai_audio(self, video_id: str, duration: float, state: RenderState) -> str:
+        """把已定位的语音片段与背景音乐混成一条与视频等长的音轨（混音统计写入本次生成的 state）"""
+        audio_path = os.path.join(self.temp_dir, f"audio_{video_id}.wav")
+        state.audio_mix_stats = self.audio_mixer.mix_to_file(state.speech_clips, duration, audio_path)
+        print(f"✅ AI音频生成成功: {audio_path}（响度 {state.audio_mix_stats['loudness_lufs']} LUFS，"
+              f"增益 {state.audio_mix_stats['gain_db']} dB）")
+        return audio_path
+    
+    def _speech_synthesizer(self) -> SpeechSynthesizer:
+        return SpeechSynthesizer(
+            self.tts_processor, self.tts_model, self.tts_vocoder, self.profile,
+            cache=self.tts_cache,
+            model_id=self.model_store.identity("speecht5_tts"),
+            vocoder_id=self.model_store.identity("speecht5_hifigan"),
+        )
+    
+    def stream_speech(self, text: str, voice_model: Optional[str] = None) -> Optional[Iterator[bytes]]:
+        """
+        流式合成一句台词（台词试听）：先产出 WAV 文件头，之后每合成完一句产出一段 16 位 PCM
+        
+        :param text: 台词文本
+        :param voice_model: 声音库中的音色ID，默认音色为空
+        :return: 字节块迭代器；TTS 模型未加载时返回 None
+        """
+        if not (self.tts_processor and self.residency.available("tts") and self.residency.available("tts_vocoder")):
+            return None
+        speaker_embedding = self.voice_bank.resolve(voice_model)
+        
+        def chunks():
+            started = time.time()
+            scheduler = get_device_scheduler()
+            # 流式输出期间固定 TTS 模型，避免被并发的视频任务换出
+            with self.residency.use("tts"), self.residency.use("tts_vocoder"):
+                synthesizer = self._speech_synthesizer()
+                yield wav_stream_header(synthesizer.sample_rate)
+                first_audio = None
+                sentences = synthesizer.stream(text, speaker_embedding)
+                while True:
+                    # 每句作为一个 TTS 任务经设备调度器排队，与视频生成的模型任务共用槽位
+                    audio = scheduler.submit("tts", lambda slot: next(sentences, None)).result()
+                    if audio is None:
+                        break
+                    if first_audio is None:
+                        first_audio = time.time() - started
+                    yield pcm16_bytes(audio)
+            if first_audio is not None:
+                print(f"🔊 流式语音完成: 首段 {first_audio:.2f}秒，总计 {time.time() - started:.2f}秒，"
+                      f"缓存命中 {synthesizer.stats['cache_hits']} 句")
+        
+        return chunks()
+    
+    def _speaker_embedding(self, speaker: str, characters: Optional[List] = None):
+        """从声音库解析角色的说话人嵌入；角色未指定音色时按角色名区分，同一角色音色一致"""
+        voice_model = None
+        for character in characters or []:
+            if getattr(character, 'name', None) == speaker:
+                voice_model = getattr(character, 'voice_model', None)
+                break
+        if not voice_model or voice_model == DEFAULT_VOICE:
+            voice_model = speaker
+        return self.voice_bank.resolve(voice_model)
     
     def _generate_placeholder_audio(self, script, video_id: str) -> str:
         """生成占位音频文件"""
@@ -670,17 +1117,21 @@ class VideoGenerator:
         
         return audio_path
     
-    def _merge_audio_video(self, video_path: str, audio_path: str, video_id: str) -> str:
+    def _merge_audio_video(self, video_path: str, audio_path: str, video_id: str,
+                           subtitle_path: Optional[str] = None) -> str:
         """合并音视频"""
         try:
-            import cv2
-            
-            # 简单的音视频合并（实际应用中需要更复杂的处理）
             final_path = os.path.join(self.output_dir, f"{video_id}.mp4")
             
-            # 复制视频文件
-            import shutil
-            shutil.copy2(video_path, final_path)
+            # 封装混音音轨（视频流直接复制），无音频或封装失败时只复制视频文件
+            if not (audio_path.endswith('.wav') and video_path.endswith('.mp4')
+                    and mux_audio_track(video_path, audio_path, final_path)):
+                shutil.copy2(video_path, final_path)
+            
+            # 封装独立字幕轨道（失败时保留外挂字幕文件）
+            if subtitle_path and self.subtitle_mode in ("soft", "both") and video_path.endswith('.mp4'):
+                if mux_subtitle_track(final_path, subtitle_path):
+                    print(f"✅ 字幕轨道封装成功: {final_path}")
             
             return final_path
             
@@ -689,12 +1140,13 @@ class VideoGenerator:
             # 返回视频文件路径
             return video_path
     
-    def _calculate_duration(self, frames: List[VideoFrame]) -> float:
+    @staticmethod
+    def _calculate_duration(frames: List[VideoFrame], fps: int) -> float:
         """计算视频时长"""
-        return len(frames) / self.fps
+        return len(frames) / fps
     
     def _cleanup_temp_files(self, frames: List[VideoFrame], backgrounds: Dict[str, str], 
-                           characters: Dict[str, str]):
+                           characters: Dict[str, str], audio_path: Optional[str] = None):
         """清理临时文件"""
         try:
             # 删除帧图像
@@ -711,6 +1163,10 @@ class VideoGenerator:
             for char_path in characters.values():
                 if os.path.exists(char_path):
                     os.remove(char_path)
+            
+            # 删除混音音轨（已封装进最终视频）
+            if audio_path and os.path.exists(audio_path):
+                os.remove(audio_path)
                     
         except Exception as e:
             print(f"⚠️ 清理临时文件失败: {e}")
@@ -732,63 +1188,212 @@ class VideoGenerator:
             metadata={"status": "fallback", "error": "生成失败"}
         ) 
 
-class VideoGenerator:
+class SVDVideoGenerator:
     """使用 Stable Video Diffusion 生成视频"""
     
-    def __init__(self, model_id: str = "stabilityai/stable-video-diffusion"):
+    def __init__(self, model_id: str = "stabilityai/stable-video-diffusion-img2vid-xt", load_model: bool = True,
+                 clip_cache: Optional[MotionClipCache] = None, use_cache: bool = True):
         """
         初始化 Stable Video Diffusion 模型
         
         :param model_id: Hugging Face 模型 ID
+        :param load_model: 是否加载模型；为 False 时由调用方自行注入管线
+        :param clip_cache: 运动片段缓存，为空时使用默认缓存目录
+        :param use_cache: 是否启用运动片段缓存
         """
         self.output_dir = "data/videos"
         os.makedirs(self.output_dir, exist_ok=True)
         
+        self.fps = 8  # SVD 输出帧率
+        self.resolution = (1024, 576)  # SVD 训练分辨率
+        self.quality_tier = get_quality_tier()  # 默认质量档位（决定步数、交付帧率与插帧档位）
+        self.decode_chunk_size = 8
+        self.chunk_frames = 14  # 每次管线调用生成的固定帧数窗口
+        self.overlap_frames = 2  # 相邻窗口重叠帧数（用于衔接与过渡）
+        self.motion_bucket_id = 127  # 运动幅度
+        self.noise_aug_strength = 0.02  # 条件图像噪声增强强度
+        self.delivery_fps = 24  # 输出视频帧率（与合成器一致），通过插帧从 SVD 帧率上采样，受质量档位帧率上限约束
+        self.clip_cache = (clip_cache or MotionClipCache()) if use_cache else None
+        self.profile = get_inference_profile()
+        self.memory_plan = None
+        self.pipe = None
+        
+        if not load_model:
+            return
+        
         try:
             from diffusers import StableVideoDiffusionPipeline
             
-            self.pipe = StableVideoDiffusionPipeline.from_pretrained(
-                model_id, 
-                torch_dtype=torch.float16,
-                variant="fp16"
-            )
+            self.memory_plan = MemoryPlanner(self.profile).plan(["svd"], {"svd": self.resolution})
+            self.memory_plan.report()
+            svd_plan = self.memory_plan.get("svd")
             
-            # 如果有 GPU，移动模型到 GPU
-            if torch.cuda.is_available():
-                self.pipe = self.pipe.to("cuda")
+            self.pipe = get_model_store().load_pipeline(
+                model_id, StableVideoDiffusionPipeline,
+                **self.profile.pretrained_kwargs()
+            )
+            self.pipe = svd_plan.apply(self.pipe, self.profile)
+            self.decode_chunk_size = svd_plan.decode_chunk_size
         except Exception as e:
             print(f"视频生成模型加载失败: {e}")
             self.pipe = None
     
-    def generate_video(self, image_path: str, duration: float = 4.0) -> Optional[str]:
+    def generate_video_chunks(self, image_path: str, duration: float = 4.0,
+                              chunk_frames: Optional[int] = None,
+                              overlap_frames: Optional[int] = None,
+                              seed: Optional[int] = None, quality: Optional[str] = None):
         """
-        从图像生成视频
+        分块生成视频帧，每个窗口生成完成后立即产出
+        
+        每次管线调用只生成固定大小的帧窗口，内存占用与总时长无关。
+        下一个窗口以上一窗口倒数第 overlap_frames 帧为条件图像，
+        两个窗口的重叠帧做线性交叉过渡，避免拼接处跳变。
         
         :param image_path: 输入图像路径
         :param duration: 视频持续时间（秒）
+        :param chunk_frames: 每个窗口的帧数（至少为2：窗口需在重叠帧之外产出新帧）
+        :param overlap_frames: 相邻窗口的重叠帧数（至少为1）
+        :param seed: 随机种子
+        :param quality: 质量档位，默认使用 self.quality_tier
+        :return: 逐块产出 PIL 图像列表的生成器
+        """
+        num_inference_steps = (get_quality_tier(quality) if quality else self.quality_tier).svd_steps
+        chunk_frames = chunk_frames or self.chunk_frames
+        if chunk_frames < 2:
+            raise ValueError(f"每个窗口至少需要2帧: {chunk_frames}")
+        overlap = max(1, min(overlap_frames or self.overlap_frames, chunk_frames - 1))
+        total_frames = max(1, int(duration * self.fps))
+        
+        condition = Image.open(image_path).convert('RGB').resize(self.resolution)
+        
+        if self.clip_cache is None:
+            yield from self._generate_chunks(condition, total_frames, chunk_frames, overlap, num_inference_steps, seed)
+            return
+        
+        # 相同图像与运动参数的片段直接从缓存读取
+        key = self.clip_cache.make_key(
+            condition,
+            num_frames=total_frames,
+            num_inference_steps=num_inference_steps,
+            fps=self.fps,
+            motion_bucket_id=self.motion_bucket_id,
+            noise_aug_strength=self.noise_aug_strength,
+            seed=seed,
+            chunk_frames=chunk_frames,
+            overlap_frames=overlap,
+            resolution=list(self.resolution)
+        )
+        cached = self.clip_cache.get(key)
+        if cached is not None:
+            print("✅ 运动片段缓存命中")
+            yield from cached
+            return
+        
+        # 边生成边写入缓存，只有完整生成的片段才会提交
+        writer = self.clip_cache.open_writer(key)
+        committed = False
+        try:
+            for chunk in self._generate_chunks(condition, total_frames, chunk_frames, overlap,
+                                               num_inference_steps, seed):
+                writer.add_chunk(chunk)
+                yield chunk
+            writer.commit()
+            committed = True
+        finally:
+            if not committed:
+                writer.abort()
+    
+    def _generate_chunks(self, condition: Image.Image, total_frames: int, chunk_frames: int,
+                         overlap: int, num_inference_steps: int, seed: Optional[int] = None):
+        """逐窗口生成并产出帧块"""
+        # 每次调用独立的随机数生成器：不改动进程全局的随机状态，并发生成互不影响
+        generator = torch.Generator().manual_seed(seed) if seed is not None else None
+        
+        emitted = 0
+        held: List[Image.Image] = []  # 上一窗口末尾尚未输出的重叠帧
+        
+        while emitted < total_frames:
+            frames = self._generate_window(condition, chunk_frames, num_inference_steps, generator)
+            
+            # 与上一窗口的重叠帧做交叉过渡
+            if held:
+                weights = np.arange(len(held)) / len(held)
+                frames[:len(held)] = [
+                    Image.blend(previous, current, float(weight))
+                    for previous, current, weight in zip(held, frames, weights)
+                ]
+            
+            # 末尾 overlap 帧留待与下一窗口衔接；最后一个窗口全部输出
+            is_last = emitted + len(frames) >= total_frames
+            ready = frames if is_last else frames[:-overlap]
+            ready = ready[:total_frames - emitted]
+            held = [] if is_last else frames[-overlap:]
+            condition = frames[-overlap]
+            
+            emitted += len(ready)
+            if ready:
+                yield ready
+    
+    def _generate_window(self, condition: Image.Image, num_frames: int, num_inference_steps: int,
+                         generator=None) -> List[Image.Image]:
+        """调用管线生成单个帧窗口"""
+        with self.profile.inference():
+            result = self.pipe(
+                condition,
+                width=self.resolution[0],
+                height=self.resolution[1],
+                num_frames=num_frames,
+                num_inference_steps=num_inference_steps,
+                decode_chunk_size=self.decode_chunk_size,
+                fps=self.fps,
+                motion_bucket_id=self.motion_bucket_id,
+                noise_aug_strength=self.noise_aug_strength,
+                generator=generator
+            )
+        return list(result.frames[0])
+    
+    def generate_video(self, image_path: str, duration: float = 4.0, quality: Optional[str] = None) -> Optional[str]:
+        """
+        从图像生成视频（分块生成并逐块写入文件）
+        
+        :param image_path: 输入图像路径
+        :param duration: 视频持续时间（秒）
+        :param quality: 质量档位（draft / standard / high），默认使用 self.quality_tier
         :return: 生成的视频路径，如果失败则返回 None
         """
+        tier = get_quality_tier(quality) if quality else self.quality_tier
         if not self.pipe:
             print("视频生成模型未初始化")
             return None
         
+        writer = None
         try:
-            # 生成视频 ID（使用时间戳）
-            video_id = str(int(os.times().elapsed))
+            import cv2
+            
+            # 生成视频 ID
+            video_id = str(uuid.uuid4())
             video_path = os.path.join(self.output_dir, f"{video_id}.mp4")
             
-            # 生成视频
-            video = self.pipe(
-                image_path, 
-                num_frames=int(duration * 8),  # 假设 8 fps
-                num_inference_steps=50,
-                decode_chunk_size=8
-            )
+            chunks = self.generate_video_chunks(image_path, duration, quality=tier.name)
+            output_fps = self.fps
+            delivery_fps = tier.video_fps(self.delivery_fps) if self.delivery_fps else None
+            if delivery_fps and delivery_fps != self.fps:
+                # 插帧上采样到交付帧率，远比让扩散模型多生成帧便宜
+                interpolator = FrameInterpolator(delivery_fps, tier.interpolation_quality)
+                chunks = interpolator.interpolate_chunks(chunks, self.fps)
+                output_fps = delivery_fps
             
-            # 保存视频
-            video[0].save(video_path)
+            fourcc = cv2.VideoWriter_fourcc(*'mp4v')
+            for chunk in chunks:
+                for frame in chunk:
+                    if writer is None:
+                        writer = cv2.VideoWriter(video_path, fourcc, output_fps, frame.size)
+                    writer.write(cv2.cvtColor(np.asarray(frame.convert('RGB')), cv2.COLOR_RGB2BGR))
             
             return video_path
         except Exception as e:
             print(f"视频生成失败: {e}")
-            return None
\ No newline at end of file
+            return None
+        finally:
+            if writer is not None:
+                writer.release()
@@ -0,0 +1,288 @@
+import os
+import json
+import hashlib
+import threading
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from .speech_synthesizer import SAMPLE_RATE, seeded_speaker_embedding
+from .audio_mixer import resample
+from .tts_clip_cache import _lock_file, _unlock_file
+
+# 声音库目录（嵌入矩阵 embeddings.npy 与索引 index.json）
+VOICE_BANK_DIR_ENV = "AI_VIDEO_VOICE_BANK_DIR"
+DEFAULT_VOICE_BANK_DIR = "data/voices/bank"
+
+EMBEDDING_DIM = 512
+DEFAULT_VOICE = "default"
+# CharacterGenerator._select_voice_model 返回的内置音色
+BUILTIN_VOICES = (
+    DEFAULT_VOICE,
+    "male_young_01", "male_middle_01", "male_elder_01",
+    "female_young_01", "female_middle_01", "female_elder_01",
+)
+
+# 从参考音频提取 x-vector 说话人嵌入（SpeechT5 训练时使用的同一模型）
+XVECTOR_SOURCE = "speechbrain/spkrec-xvect-voxceleb"
+EXTRACT_BATCH_SIZE = 8
+
+
+class VoiceBank:
+    """声音库 - voice_model ID 到说话人嵌入的映射
+
+    所有嵌入存放在一个内存映射的 float32 矩阵中，另有 ID -> 行号索引，进程内只加载一次，
+    按 ID 解析为 O(1) 的行读取。新音色可从参考音频批量提取（speechbrain x-vector），
+    按音频内容哈希缓存，同一段参考音频不会重复提取。
+    多个进程共用同一目录：写入在索引文件锁内基于磁盘上的最新内容进行，解析时索引文件变化则重新加载。
+    """
+
+    EMBEDDINGS_FILE = "embeddings.npy"
+    INDEX_FILE = "index.json"
+    LOCK_FILE = "index.lock"
+
+    def __init__(self, bank_dir: Optional[str] = None):
+        """
+        :param bank_dir: 声音库目录，默认读取环境变量 AI_VIDEO_VOICE_BANK_DIR
+        """
+        self.bank_dir = bank_dir or os.environ.get(VOICE_BANK_DIR_ENV) or DEFAULT_VOICE_BANK_DIR
+        self._lock = threading.Lock()
+        self._classifier = None
+        os.makedirs(self.bank_dir, exist_ok=True)
+
+        self._index_mtime: Optional[int] = None
+        self._reload()
+        missing = [voice_id for voice_id in BUILTIN_VOICES if voice_id not in self._index["voices"]]
+        if missing:
+            # 内置音色以确定性嵌入初始化，可用 add / extract 替换为真实说话人嵌入
+            self.add_many({voice_id: seeded_speaker_embedding(voice_id).numpy() for voice_id in missing})
+
+    # ------------------------------------------------------------------
+    # 解析
+    # ------------------------------------------------------------------
+
+    def resolve(self, voice_id: Optional[str]):
+        """voice_model ID -> 说话人嵌入（torch 张量）；未登记的 ID 按 ID 生成确定性嵌入，保证同一 ID 音色一致"""
+        import torch
+
+        voice_id = voice_id or DEFAULT_VOICE
+        with self._lock:
+            self._refresh()
+            row = self._index["voices"].get(voice_id)
+            vector = None if row is None else np.array(self._matrix[row], dtype=np.float32)
+        if vector is None:
+            return seeded_speaker_embedding(voice_id, EMBEDDING_DIM)
+        return torch.from_numpy(vector)
+
+    def __contains__(self, voice_id: str) -> bool:
+        with self._lock:
+            self._refresh()
+            return voice_id in self._index["voices"]
+
+    def voices(self) -> List[str]:
+        with self._lock:
+            self._refresh()
+            return sorted(self._index["voices"])
+
+    # ------------------------------------------------------------------
+    # 登记与提取
+    # ------------------------------------------------------------------
+
+    def add(self, voice_id: str, embedding) -> None:
+        """登记或替换一个音色"""
+        self.add_many({voice_id: embedding})
+
+    def add_many(self, embeddings: Dict[str, np.ndarray]) -> None:
+        """批量登记音色（一次重写矩阵文件）"""
+        with self._lock:
+            self._write(embeddings)
+
+    def extract(self, references: Dict[str, str], batch_size: int = EXTRACT_BATCH_SIZE) -> Dict[str, str]:
+        """
+        从参考音频批量提取说话人嵌入并登记
+
+        :param references: voice_model ID -> 参考音频路径
+        :return: voice_model ID -> 来源（cached 为命中已提取的同一段音频，extracted 为新提取）
+        """
+        hashes = {voice_id: _file_hash(path) for voice_id, path in references.items()}
+        sources, embeddings, pending = {}, {}, []
+        with self._lock:
+            self._refresh()
+            for voice_id, digest in hashes.items():
+                row = self._index["audio"].get(digest)
+                if row is not None:
+                    embeddings[voice_id] = np.array(self._matrix[row])
+                    sources[voice_id] = "cached"
+                else:
+                    pending.append(voice_id)
+
+        for start in range(0, len(pending), batch_size):
+            batch = pending[start:start + batch_size]
+            for voice_id, embedding in zip(batch, self._encode([references[voice_id] for voice_id in batch])):
+                embeddings[voice_id] = embedding
+                sources[voice_id] = "extracted"
+
+        with self._lock:
+            self._write(embeddings, audio_hashes={hashes[voice_id]: voice_id for voice_id in embeddings})
+        print(f"🎙️ 音色登记完成: {len(pending)} 个新提取，{len(references) - len(pending)} 个命中缓存")
+        return sources
+
+    def _encode(self, paths: List[str]) -> np.ndarray:
+        """一批参考音频 -> 归一化的 x-vector（B, 512）"""
+        import torch
+
+        waves = [_load_audio(path) for path in paths]
+        length = max(len(wave) for wave in waves)
+        batch = torch.zeros(len(waves), length)
+        for i, wave in enumerate(waves):
+            batch[i, :len(wave)] = torch.from_numpy(wave)
+        lengths = torch.tensor([len(wave) / length for wave in waves])
+
+        with torch.inference_mode():
+            embeddings = self._load_classifier().encode_batch(batch, lengths)
+            embeddings = torch.nn.functional.normalize(embeddings.reshape(len(waves), -1), dim=-1)
+        return embeddings.cpu().numpy().astype(np.float32)
+
+    def _load_classifier(self):
+        if self._classifier is None:
+            try:
+                from speechbrain.inference.speaker import EncoderClassifier
+            except ImportError:
+                # speechbrain < 1.0
+                from speechbrain.pretrained import EncoderClassifier
+            from .model_store import get_model_store
+
+            savedir = os.path.join(get_model_store().store_dir, "spkrec-xvect-voxceleb")
+            self._classifier = EncoderClassifier.from_hparams(source=XVECTOR_SOURCE, savedir=savedir)
+        return self._classifier
+
+    # ------------------------------------------------------------------
+    # 存储（调用方持有 _lock）
+    # ------------------------------------------------------------------
+
+    def _write(self, embeddings: Dict[str, np.ndarray], audio_hashes: Optional[Dict[str, str]] = None):
+        """在索引文件锁内重新加载磁盘上的矩阵与索引（保留其他进程的写入），追加或替换行后原子重写并重新映射"""
+        with self._index_file_lock():
+            self._reload()
+            self._write_locked(embeddings, audio_hashes)
+
+    def _write_locked(self, embeddings: Dict[str, np.ndarray], audio_hashes: Optional[Dict[str, str]] = None):
+        matrix = np.array(self._matrix, dtype=np.float32) if len(self._matrix) else np.zeros((0, EMBEDDING_DIM), np.float32)
+        voices = dict(self._index["voices"])
+        new_rows, replaced = [], set()
+        for voice_id, embedding in embeddings.items():
+            vector = _as_vector(embedding)
+            if voice_id in voices:
+                matrix[voices[voice_id]] = vector
+                replaced.add(voices[voice_id])
+            else:
+                voices[voice_id] = len(matrix) + len(new_rows)
+                new_rows.append(vector)
+        if new_rows:
+            matrix = np.concatenate([matrix, np.stack(new_rows)])
+
+        # 被覆盖的行不再是原参考音频的嵌入，丢弃指向这些行的音频摘要
+        audio = {digest: row for digest, row in self._index["audio"].items() if row not in replaced}
+        for digest, voice_id in (audio_hashes or {}).items():
+            audio[digest] = voices[voice_id]
+
+        matrix_path = os.path.join(self.bank_dir, self.EMBEDDINGS_FILE)
+        with open(f"{matrix_path}.tmp", "wb") as f:
+            np.save(f, matrix)
+        # 先释放旧文件的内存映射：Windows 上无法替换仍被映射的文件
+        self._matrix = matrix
+        os.replace(f"{matrix_path}.tmp", matrix_path)
+
+        self._index = {"dim": EMBEDDING_DIM, "voices": voices, "audio": audio}
+        index_path = os.path.join(self.bank_dir, self.INDEX_FILE)
+        with open(f"{index_path}.tmp", "w", encoding="utf-8") as f:
+            json.dump(self._index, f, ensure_ascii=False)
+        os.replace(f"{index_path}.tmp", index_path)
+
+        self._matrix = self._open_matrix()
+        self._index_mtime = self._stat_index()
+
+    def _refresh(self):
+        """索引文件的修改时间变化（其他进程写入）时重新加载索引与矩阵"""
+        if self._stat_index() != self._index_mtime:
+            self._reload()
+
+    def _reload(self):
+        # 先记录修改时间再读取：读取期间发生的写入会在下次解析时再次触发重新加载
+        self._index_mtime = self._stat_index()
+        self._index = self._load_index()
+        self._matrix = self._open_matrix()
+
+    def _stat_index(self) -> Optional[int]:
+        try:
+            return os.stat(os.path.join(self.bank_dir, self.INDEX_FILE)).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    @contextmanager
+    def _index_file_lock(self):
+        """跨进程的索引文件锁（POSIX 为 fcntl，Windows 为 msvcrt）"""
+        with open(os.path.join(self.bank_dir, self.LOCK_FILE), "a+b") as f:
+            _lock_file(f)
+            try:
+                yield
+            finally:
+                _unlock_file(f)
+
+    def _open_matrix(self) -> np.ndarray:
+        path = os.path.join(self.bank_dir, self.EMBEDDINGS_FILE)
+        if not os.path.exists(path):
+            return np.zeros((0, EMBEDDING_DIM), np.float32)
+        return np.load(path, mmap_mode="r")
+
+    def _load_index(self) -> Dict:
+        path = os.path.join(self.bank_dir, self.INDEX_FILE)
+        if os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    index = json.load(f)
+                return {"dim": index.get("dim", EMBEDDING_DIM), "voices": index.get("voices", {}),
+                        "audio": index.get("audio", {})}
+            except Exception as e:
+                print(f"⚠️ 声音库索引读取失败，重建声音库: {e}")
+                matrix_path = os.path.join(self.bank_dir, self.EMBEDDINGS_FILE)
+                if os.path.exists(matrix_path):
+                    os.remove(matrix_path)
+        return {"dim": EMBEDDING_DIM, "voices": {}, "audio": {}}
+
+
+def _as_vector(embedding) -> np.ndarray:
+    if hasattr(embedding, "detach"):
+        embedding = embedding.detach().float().cpu().numpy()
+    vector = np.asarray(embedding, dtype=np.float32).reshape(-1)
+    if vector.shape[0] != EMBEDDING_DIM:
+        raise ValueError(f"说话人嵌入维度应为 {EMBEDDING_DIM}: {vector.shape[0]}")
+    return vector
+
+
+def _file_hash(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _load_audio(path: str) -> np.ndarray:
+    """读取参考音频为 16kHz 单声道 float32"""
+    import soundfile as sf
+
+    audio, rate = sf.read(path, dtype="float32", always_2d=True)
+    return resample(audio.mean(axis=1), rate, SAMPLE_RATE)
+
+
+_default_bank: Optional[VoiceBank] = None
+
+
+def get_voice_bank() -> VoiceBank:
+    """进程内共享的声音库（只加载一次）"""
+    global _default_bank
+    if _default_bank is None:
+        _default_bank = VoiceBank()
+    return _default_bank
@@ -1,8 +1,15 @@
 import os
+import threading
 import torch
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List, Tuple
 from transformers import SpeechT5Processor, SpeechT5ForTextToSpeech, SpeechT5HifiGan
 
+from .inference_profile import get_inference_profile
+from .model_store import get_model_store
+from .speech_synthesizer import SpeechSynthesizer, SpeechClip
+from .tts_clip_cache import get_tts_clip_cache
+from .voice_bank import get_voice_bank
+
 class VoiceGenerator:
     """使用 Microsoft SpeechT5 生成语音"""
     
@@ -17,76 +24,78 @@ class VoiceGenerator:
         """
         self.output_dir = "data/voices"
         os.makedirs(self.output_dir, exist_ok=True)
+        self.profile = get_inference_profile()
         
         try:
+            # 优先从本地模型快照库离线加载
+            model_store = get_model_store()
+            
             # 加载处理器
-            self.processor = SpeechT5Processor.from_pretrained(model_id)
+            self.processor = model_store.load_model(model_id, SpeechT5Processor)
             
             # 加载文本转语音模型
-            self.model = SpeechT5ForTextToSpeech.from_pretrained(model_id)
+            self.model = model_store.load_model(model_id, SpeechT5ForTextToSpeech)
             
             # 加载声码器
-            self.vocoder = SpeechT5HifiGan.from_pretrained(vocoder_id)
+            self.vocoder = model_store.load_model(vocoder_id, SpeechT5HifiGan)
             
-            # 如果有 GPU，移动模型到 GPU
-            if torch.cuda.is_available():
-                self.model = self.model.to("cuda")
-                self.vocoder = self.vocoder.to("cuda")
+            # 移动模型到推理配置指定的设备
+            self.model = self.profile.prepare_module(self.model)
+            self.vocoder = self.profile.prepare_module(self.vocoder)
+            self.synthesizer = SpeechSynthesizer(
+                self.processor, self.model, self.vocoder, self.profile,
+                cache=get_tts_clip_cache(),
+                model_id=model_store.identity(model_id),
+                vocoder_id=model_store.identity(vocoder_id),
+            )
         except Exception as e:
             print(f"语音生成模型加载失败: {e}")
             self.processor = None
             self.model = None
             self.vocoder = None
+            self.synthesizer = None
     
     def generate_voice(self, 
                        text: str, 
                        speaker_embedding: Optional[torch.Tensor] = None,
-                       language: str = 'zh-CN') -> Optional[str]:
+                       language: str = 'zh-CN',
+                       voice_model: Optional[str] = None) -> Optional[str]:
         """
         生成语音
         
         :param text: 要转换为语音的文本
         :param speaker_embedding: 说话人嵌入（可选）
         :param language: 语言代码
+        :param voice_model: 声音库中的音色 ID（未提供说话人嵌入时使用，默认 default）
         :return: 生成的语音文件路径
         """
         if not self.model or not self.processor or not self.vocoder:
             print("语音生成模型未初始化")
             return None
         
+        if not text.strip():
+            print("⚠️ 文本为空，未生成语音")
+            return None
+        
         try:
-            # 限制文本长度
-            text = text[:200] if len(text) > 200 else text
-            
-            # 生成语音 ID（使用时间戳）
-            import time
-            voice_id = str(int(time.time() * 1000))
-            voice_path = os.path.join(self.output_dir, f"{voice_id}.wav")
-            
-            # 处理输入文本
-            inputs = self.processor(text=text, return_tensors="pt")
-            
-            # 移动输入到GPU（如果可用）
-            if torch.cuda.is_available():
-                inputs = {k: v.to("cuda") for k, v in inputs.items()}
-            
-            # 如果没有提供说话人嵌入，使用默认嵌入
+            # 如果没有提供说话人嵌入，从声音库解析音色
             if speaker_embedding is None:
-                speaker_embedding = torch.zeros(512)
-                if torch.cuda.is_available():
-                    speaker_embedding = speaker_embedding.to("cuda")
+                speaker_embedding = get_voice_bank().resolve(voice_model)
             
-            # 生成语音
-            with torch.no_grad():
-                speech = self.model.generate_speech(
-                    inputs["input_ids"], 
-                    speaker_embedding.unsqueeze(0), 
-                    vocoder=self.vocoder
-                )
+            # 输出文件以语音片段缓存键命名：相同台词与音色重复请求时直接复用已写出的文件
+            voice_path = os.path.join(self.output_dir, f"{self.synthesizer.cache_key(text, speaker_embedding)}.wav")
+            if os.path.exists(voice_path):
+                print(f"✅ 语音命中缓存: {voice_path}")
+                return voice_path
             
-            # 保存语音文件
+            # 长文本在标点处分段批量合成，不再截断
+            clips = self.synthesizer.synthesize([("", text)], [speaker_embedding])
+            
+            # 保存语音文件（先写临时文件再替换，并发的相同请求不会读到写了一半的文件）
             import soundfile as sf
-            sf.write(voice_path, speech.cpu().numpy(), 16000)
+            temp_path = f"{voice_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            sf.write(temp_path, clips[0].audio, self.synthesizer.sample_rate, format="WAV")
+            os.replace(temp_path, voice_path)
             
             print(f"✅ 语音生成成功: {voice_path}")
             return voice_path
@@ -95,6 +104,20 @@ class VoiceGenerator:
             print(f"⚠️ 语音生成失败: {e}")
             return None
     
+    def generate_dialogue(self, lines: List[Tuple[str, str]],
+                          speaker_embeddings: List[torch.Tensor]) -> List[SpeechClip]:
+        """
+        逐句批量合成多句台词
+        
+        :param lines: (说话人, 台词) 列表
+        :param speaker_embeddings: 与 lines 一一对应的说话人嵌入
+        :return: 带起始时间的语音片段列表
+        """
+        if not self.model or not self.processor or not self.vocoder:
+            print("语音生成模型未初始化")
+            return []
+        return self.synthesizer.synthesize(lines, speaker_embeddings)
+    
     def load_speaker_embedding(self, embedding_path: Optional[str] = None) -> Optional[torch.Tensor]:
         """
         加载说话人嵌入
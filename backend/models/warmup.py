@@ -0,0 +1,173 @@
+import os
+import time
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass, asdict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from PIL import Image
+
+# 启动预热开关："1" 启用（默认关闭，关闭时模型加载完成即视为就绪）
+WARMUP_ENV = "AI_VIDEO_WARMUP"
+
+WARMUP_PROMPT = "warmup"
+WARMUP_TEXT = "你好"
+
+# 预热步数：两步即可走完调度器、UNet、VAE 解码的完整路径
+WARMUP_IMAGE_STEPS = 2
+WARMUP_SVD_STEPS = 1
+WARMUP_SVD_FRAMES = 2
+
+
+@dataclass
+class WarmupResult:
+    """单条管线的预热结果"""
+    name: str
+    seconds: float
+    ok: bool
+    error: Optional[str] = None
+
+
+class StartupWarmup:
+    """启动预热 - 用极小的代表性推理触发内核初始化、分配器增长与分词器加载，并提供就绪状态
+
+    状态: pending（等待预热）→ warming → ready；单条管线预热失败不阻塞就绪，只记录错误。
+    """
+
+    def __init__(self, enabled: Optional[bool] = None):
+        """
+        :param enabled: 是否预热，默认读取环境变量 AI_VIDEO_WARMUP
+        """
+        if enabled is None:
+            enabled = os.environ.get(WARMUP_ENV, "0").lower() in ("1", "true", "yes")
+        self.enabled = enabled
+        self.state = "pending"
+        self.results: List[WarmupResult] = []
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def ready(self) -> bool:
+        return self.state == "ready"
+
+    def start(self, targets: Dict[str, Callable[[], Any]]) -> Optional[threading.Thread]:
+        """在后台线程中依次预热（服务启动不被阻塞，预热完成前 ready 为 False）"""
+        if not self.enabled or not targets:
+            self._finish([])
+            return None
+        self._thread = threading.Thread(target=self.run, args=(targets,), name="startup-warmup", daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def run(self, targets: Dict[str, Callable[[], Any]]) -> List[WarmupResult]:
+        """同步预热所有目标"""
+        with self._lock:
+            self.state = "warming"
+            self.started_at = time.time()
+        print(f"🔥 开始预热: {', '.join(targets)}")
+
+        results = []
+        for name, warm in targets.items():
+            start = time.perf_counter()
+            try:
+                warm()
+                result = WarmupResult(name, time.perf_counter() - start, True)
+                print(f"✅ 预热完成: {name}（{result.seconds:.2f}s）")
+            except Exception as e:
+                result = WarmupResult(name, time.perf_counter() - start, False, str(e))
+                print(f"⚠️ 预热失败: {name}: {e}")
+            results.append(result)
+
+        self._finish(results)
+        return results
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """等待预热完成"""
+        if self._thread is not None:
+            self._thread.join(timeout)
+        return self.ready
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "ready": self.ready,
+            "state": self.state,
+            "warmup_enabled": self.enabled,
+            "warmup_seconds": (self.finished_at - self.started_at) if self.started_at and self.finished_at else None,
+            "pipelines": [asdict(result) for result in self.results],
+        }
+
+    def _finish(self, results: List[WarmupResult]):
+        with self._lock:
+            self.results = results
+            self.finished_at = time.time()
+            self.state = "ready"
+
+
+@contextmanager
+def _acquire(model, residency=None):
+    """取得预热用的模型：给出驻留管理器时 model 为模型名，预热期间固定该模型（不会被并发任务换出）"""
+    if residency is None:
+        yield model
+        return
+    with residency.use(model) as pinned:
+        if pinned is None:
+            raise RuntimeError(f"模型未登记: {model}")
+        yield pinned
+
+
+def sdxl_warmup(model, profile, prompt_cache, size: Tuple[int, int], tier,
+                negative_prompt: Optional[str] = None, residency=None) -> Callable[[], Any]:
+    """SDXL 预热：按档位采样器、引导尺度和实际生成尺寸运行两步
+
+    :param model: 管线对象；给出 residency 时为驻留管理器中的模型名
+    """
+    from .quality_tiers import pipeline_lock, scheduled_pipeline
+
+    def warm():
+        with _acquire(model, residency) as pipe, pipeline_lock(pipe):
+            scheduled = scheduled_pipeline(pipe, tier.scheduler)
+            with profile.inference():
+                scheduled(
+                    **prompt_cache.prompt_kwargs(scheduled, WARMUP_PROMPT, negative_prompt),
+                    num_inference_steps=WARMUP_IMAGE_STEPS,
+                    guidance_scale=tier.guidance_scale,
+                    width=size[0],
+                    height=size[1],
+                )
+    return warm
+
+
+def svd_warmup(model, profile, resolution: Tuple[int, int], decode_chunk_size: int = 2,
+               residency=None) -> Callable[[], Any]:
+    """SVD 预热：实际分辨率下生成两帧、单步去噪
+
+    :param model: 管线对象；给出 residency 时为驻留管理器中的模型名
+    """
+    def warm():
+        condition = Image.new("RGB", resolution, (128, 128, 128))
+        with _acquire(model, residency) as pipe, profile.inference():
+            pipe(
+                condition,
+                width=resolution[0],
+                height=resolution[1],
+                num_frames=WARMUP_SVD_FRAMES,
+                num_inference_steps=WARMUP_SVD_STEPS,
+                decode_chunk_size=min(decode_chunk_size, WARMUP_SVD_FRAMES),
+            )
+    return warm
+
+
+def speecht5_warmup(processor, model, vocoder, speaker_embedding, profile, residency=None) -> Callable[[], Any]:
+    """SpeechT5 预热：合成一句短文本（同时加载分词器）
+
+    :param model: 声学模型；给出 residency 时 model、vocoder 为驻留管理器中的模型名
+    """
+    def warm():
+        inputs = processor(text=WARMUP_TEXT, return_tensors="pt")
+        embedding = speaker_embedding.unsqueeze(0) if speaker_embedding.dim() == 1 else speaker_embedding
+        with _acquire(model, residency) as acoustic, _acquire(vocoder, residency) as hifigan:
+            embedding = embedding.to(acoustic.device)
+            with profile.inference():
+                acoustic.generate_speech(inputs["input_ids"].to(acoustic.device), embedding, vocoder=hifigan)
+    return warm
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+预分叉服务 - 父进程只加载一次模型权重，fork 出的工作进程以写时复制方式共享
+
+用法: python backend/prefork_server.py --workers 4 --port 8000
+仅支持 CPU 推理配置：CUDA 上下文不能跨 fork 继承，GPU 部署请使用单进程加设备调度器。
+"""
+
+import os
+import gc
+import sys
+import time
+import signal
+import socket
+import argparse
+
+from models.env_config import env_int
+from models.inference_profile import NUM_THREADS_ENV
+from models.shared_weights import PREFORK_PARENT_ENV
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="AI视频生成工具 - 预分叉服务（工作进程共享模型权重）")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=2, help="工作进程数")
+    parser.add_argument("--threads", type=int, default=None,
+                        help=f"每个工作进程的 CPU 线程数（默认 {NUM_THREADS_ENV} 或 核心数 / 工作进程数）")
+    parser.add_argument("--report-delay", type=float, default=10.0, help="启动后多少秒打印内存报告，0 表示不打印")
+    return parser.parse_args()
+
+
+def share_loaded_weights(api) -> int:
+    """将已加载的模型权重换成 safetensors 文件映射"""
+    from models.shared_weights import share_pipeline_weights
+
+    models = [
+        *api.video_generator.residency.loaded_models().values(),
+        api.character_generator.sd_model,
+        api.scene_generator.pipe,
+    ]
+    total = 0
+    for model in models:
+        if model is None:
+            continue
+        try:
+            total += share_pipeline_weights(model)
+        except Exception as e:
+            print(f"⚠️ 权重映射失败，保留写时复制共享: {type(model).__name__}: {e}")
+    return total
+
+
+def run_worker(app, sock: socket.socket, threads: int):
+    import torch
+    import uvicorn
+
+    torch.set_num_threads(threads)
+    config = uvicorn.Config(app, log_level="info")
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+def spawn_worker(app, sock: socket.socket, threads: int) -> int:
+    pid = os.fork()
+    if pid == 0:
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        try:
+            run_worker(app, sock, threads)
+        finally:
+            os._exit(0)
+    return pid
+
+
+def main():
+    args = parse_args()
+    cores = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else (os.cpu_count() or 1)
+    threads = args.threads or env_int(NUM_THREADS_ENV) or max(1, cores // args.workers)
+    
+    # 父进程加载阶段只用单线程：fork 前创建的 OpenMP 线程池在子进程中不可用
+    os.environ[NUM_THREADS_ENV] = "1"
+    os.environ[PREFORK_PARENT_ENV] = str(os.getpid())
+
+    from models.inference_profile import get_inference_profile
+    from models.shared_weights import memory_report, print_memory_report
+
+    if get_inference_profile().device != "cpu":
+        print("❌ 预分叉模式仅支持 CPU 推理配置（设置 AI_VIDEO_PROFILE=cpu），GPU 请使用单进程服务")
+        sys.exit(1)
+
+    # 1. 父进程加载全部模型
+    print("🔄 父进程加载模型...")
+    import main as api
+
+    # 2. 与权重文件一致的参数换成文件映射，其余参数依靠 fork 后的写时复制共享
+    remapped_mb = share_loaded_weights(api) / 1024 / 1024
+    print(f"📎 文件映射权重: {remapped_mb:.0f} MB")
+
+    # 3. 冻结已有对象，避免子进程垃圾回收写入对象头导致页面复制
+    gc.collect()
+    gc.freeze()
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((args.host, args.port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+
+    workers = {spawn_worker(api.app, sock, threads) for _ in range(args.workers)}
+    print(f"🚀 已启动 {args.workers} 个工作进程（每个 {threads} 线程）: http://{args.host}:{args.port}")
+
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in workers:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    report_at = time.time() + args.report_delay if args.report_delay > 0 else None
+    while workers:
+        if report_at and time.time() >= report_at:
+            print_memory_report(memory_report([os.getpid(), *workers]))
+            report_at = None
+
+        try:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+        except ChildProcessError:
+            break
+        if pid == 0:
+            time.sleep(0.5)
+            continue
+
+        workers.discard(pid)
+        if not stopping:
+            print(f"⚠️ 工作进程 {pid} 退出（状态 {status}），重新启动")
+            workers.add(spawn_worker(api.app, sock, threads))
+
+    print("🛑 预分叉服务已停止")
+
+
+if __name__ == "__main__":
+    main()
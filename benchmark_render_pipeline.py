@@ -0,0 +1,635 @@
+#!/usr/bin/env python3
+"""
+渲染管线基准测试 - 使用确定性的轻量桩模型替代 SDXL / SVD / SpeechT5，
+端到端运行 VideoGenerator，输出可跨提交对比的 JSON 结果。
+
+用法:
+    python benchmark_render_pipeline.py                      # 完整矩阵
+    python benchmark_render_pipeline.py --quick              # 快速矩阵
+    python benchmark_render_pipeline.py -o bench.json        # 保存结果
+    python benchmark_render_pipeline.py --compare old.json   # 与历史结果对比
+"""
+
+import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+import platform
+import tempfile
+import subprocess
+import tracemalloc
+import multiprocessing
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+# 添加backend目录到Python路径
+BACKEND_DIR = Path(__file__).parent / "backend"
+sys.path.append(str(BACKEND_DIR))
+
+SCHEMA_VERSION = 1
+
+
+# ---------------------------------------------------------------------------
+# 桩模型：接口与真实管线一致，输出只由输入决定
+# ---------------------------------------------------------------------------
+
+def _seed_from(*parts: Any) -> int:
+    """根据输入内容生成稳定的随机种子"""
+    digest = hashlib.sha256("|".join(str(p) for p in parts).encode("utf-8")).digest()
+    return int.from_bytes(digest[:4], "little")
+
+
+def _stub_image(seed: int, width: int, height: int):
+    """生成确定性的渐变图像"""
+    import numpy as np
+    from PIL import Image
+
+    rng = np.random.default_rng(seed)
+    base = rng.integers(0, 256, size=3)
+    xs = np.linspace(0.0, 1.0, width, dtype=np.float32)[None, :, None]
+    ys = np.linspace(0.0, 1.0, height, dtype=np.float32)[:, None, None]
+    pixels = (base * (0.5 + 0.25 * xs + 0.25 * ys)).clip(0, 255).astype(np.uint8)
+    return Image.fromarray(pixels)
+
+
+class _StubOutput:
+    """模拟 diffusers 管线的输出对象"""
+
+    def __init__(self, images=None, frames=None):
+        self.images = images
+        self.frames = frames
+
+
+class StubSDXLPipeline:
+    """StableDiffusionXLPipeline 的桩实现"""
+
+    def __call__(self, prompt, num_inference_steps: int = 50, guidance_scale: float = 7.5,
+                 width: int = 1024, height: int = 1024, num_images_per_prompt: int = 1, **kwargs):
+        prompts = prompt if isinstance(prompt, list) else [prompt]
+        images = [
+            _stub_image(_seed_from(p, num_inference_steps, i), width, height)
+            for p in prompts
+            for i in range(num_images_per_prompt)
+        ]
+        return _StubOutput(images=images)
+
+
+class StubSVDPipeline:
+    """StableVideoDiffusionPipeline 的桩实现"""
+
+    def __call__(self, image, num_frames: int = 25, num_inference_steps: int = 25,
+                 width: int = 1024, height: int = 576, **kwargs):
+        from PIL import Image
+
+        if isinstance(image, (str, os.PathLike)):
+            image = Image.open(image)
+        image = image.convert("RGB").resize((width, height))
+        frames = [image.rotate(i % 360) for i in range(num_frames)]
+        return _StubOutput(frames=[frames])
+
+
+class StubSpeechT5Processor:
+    """SpeechT5Processor 的桩实现（支持批量文本与填充）"""
+
+    def __call__(self, text="", return_tensors: str = "pt", **kwargs):
+        import torch
+
+        texts = [text] if isinstance(text, str) else list(text)
+        ids = [[(ord(ch) % 80) + 4 for ch in item] or [4] for item in texts]
+        length = max(len(item) for item in ids)
+        return {
+            "input_ids": torch.tensor([item + [1] * (length - len(item)) for item in ids], dtype=torch.long),
+            "attention_mask": torch.tensor([[1] * len(item) + [0] * (length - len(item)) for item in ids], dtype=torch.long),
+        }
+
+
+class StubSpeechT5Model:
+    """SpeechT5ForTextToSpeech 的桩实现，每个token约产生0.06秒音频"""
+
+    samples_per_token = 960
+
+    def __init__(self):
+        import torch
+        self.device = torch.device("cpu")
+
+    def generate_speech(self, input_ids, speaker_embeddings=None, vocoder=None, attention_mask=None,
+                        return_output_lengths=False, **kwargs):
+        import torch
+
+        tokens = attention_mask.sum(dim=-1) if attention_mask is not None else torch.full((input_ids.shape[0],), input_ids.shape[-1])
+        num_samples = int(input_ids.shape[-1]) * self.samples_per_token
+        t = torch.arange(num_samples, dtype=torch.float32) / 16000
+        wave = 0.1 * torch.sin(2 * torch.pi * 220.0 * t)
+        if not return_output_lengths:
+            return wave
+        lengths = [int(count) * self.samples_per_token for count in tokens]
+        return wave.expand(input_ids.shape[0], -1), lengths
+
+
+class StubHifiGan:
+    """SpeechT5HifiGan 的桩实现"""
+
+    def __call__(self, spectrogram):
+        return spectrogram
+
+
+def install_stub_models(generator) -> None:
+    """将桩模型注入 VideoGenerator"""
+    import torch
+
+    generator.sd_pipeline = StubSDXLPipeline()
+    generator.svd_pipeline = StubSVDPipeline()
+    generator.tts_processor = StubSpeechT5Processor()
+    generator.tts_model = StubSpeechT5Model()
+    generator.tts_vocoder = StubHifiGan()
+    generator.default_speaker_embedding = torch.zeros(512)
+
+
+# ---------------------------------------------------------------------------
+# 基准用例
+# ---------------------------------------------------------------------------
+
+BASELINE_CASE = {"scenes": 1, "duration": 2.0, "characters": 2, "resolution": [1280, 720]}
+
+SWEEPS = {
+    "scenes": [1, 2, 4],
+    "duration": [1.0, 2.0, 4.0],
+    "characters": [0, 1, 3, 6],
+    "resolution": [[640, 360], [1280, 720], [1920, 1080]],
+}
+
+QUICK_SWEEPS = {
+    "scenes": [1, 2],
+    "duration": [1.0],
+    "characters": [0, 2],
+    "resolution": [[640, 360], [1280, 720]],
+}
+
+# 插帧用例：质量档位与分辨率（8fps -> 24fps）
+INTERPOLATION_QUALITIES = ["fast", "balanced", "quality"]
+INTERPOLATION_RESOLUTIONS = [[512, 288], [1024, 576]]
+
+# SVD 分块生成用例：时长（秒）
+MOTION_DURATIONS = [2.0, 8.0, 32.0]
+QUICK_MOTION_DURATIONS = [2.0, 8.0]
+
+# 调度器扩展性用例：工作槽位数（假设备，任务以固定耗时模拟）
+SCHEDULER_SLOTS = [1, 2, 4]
+SCHEDULER_JOB_MIX = ["sdxl", "sdxl", "svd", "tts", "tts", "tts"]
+
+# SDXL 微批处理用例：并发客户端数（批量调用耗时 = 固定开销 + 每张图耗时 × 批大小）
+BATCH_CLIENTS = [1, 4, 8]
+BATCH_FIXED_S = 0.04
+BATCH_PER_IMAGE_S = 0.01
+
+
+def build_cases(quick: bool = False) -> List[Dict[str, Any]]:
+    """以基线用例为中心，逐个维度展开用例矩阵"""
+    sweeps = QUICK_SWEEPS if quick else SWEEPS
+    baseline = dict(BASELINE_CASE, duration=1.0) if quick else BASELINE_CASE
+
+    cases = {}
+    for dimension, values in sweeps.items():
+        for value in values:
+            params = dict(baseline, **{dimension: value})
+            name = "s{scenes}_d{duration:g}_c{characters}_r{w}x{h}".format(
+                w=params["resolution"][0], h=params["resolution"][1], **params
+            )
+            cases[name] = params
+
+    result = [{"name": name, "kind": "render", "params": params} for name, params in sorted(cases.items())]
+
+    for duration in (QUICK_MOTION_DURATIONS if quick else MOTION_DURATIONS):
+        result.append({"name": f"svd_d{duration:g}", "kind": "motion", "params": {"duration": duration}})
+    result.append({"name": "svd_cached_d8", "kind": "motion", "params": {"duration": 8.0, "cached": True}})
+
+    for quality in INTERPOLATION_QUALITIES:
+        for width, height in INTERPOLATION_RESOLUTIONS[:1] if quick else INTERPOLATION_RESOLUTIONS:
+            result.append({
+                "name": f"interp_{quality}_r{width}x{height}",
+                "kind": "interpolate",
+                "params": {"quality": quality, "resolution": [width, height], "source_fps": 8, "target_fps": 24},
+            })
+
+    for slots in SCHEDULER_SLOTS:
+        result.append({
+            "name": f"sched_slots{slots}",
+            "kind": "schedule",
+            "params": {"slots": slots, "jobs": 24 if quick else 48, "job_time_s": 0.02, "load_time_s": 0.05},
+        })
+
+    for clients in BATCH_CLIENTS:
+        for batching in (False, True):
+            result.append({
+                "name": f"sdxl_batch_c{clients}" + ("" if batching else "_off"),
+                "kind": "batch",
+                "params": {"clients": clients, "requests": 16 if quick else 32, "batching": batching},
+            })
+
+    return result
+
+
+def _build_script(num_scenes: int, num_characters: int):
+    """构建基准剧本"""
+    from models.script_parser import Script, Scene, Dialogue
+
+    locations = ["高级餐厅", "公园", "办公室", "家", "街道"]
+    scenes = [
+        Scene(
+            id=f"scene_{i + 1}",
+            description=locations[i % len(locations)],
+            location=locations[i % len(locations)],
+            characters=[],
+            actions=[],
+        )
+        for i in range(num_scenes)
+    ]
+    dialogues = [
+        Dialogue(character=f"角色{i % max(num_characters, 1) + 1}", content=f"这是第{i + 1}句测试台词。")
+        for i in range(max(num_scenes * 2, 2))
+    ]
+    return Script(
+        title="基准测试剧本",
+        characters=[],
+        scenes=scenes,
+        dialogues=dialogues,
+        metadata={},
+    )
+
+
+def _build_characters(num_characters: int) -> List[Any]:
+    """构建基准角色"""
+    from models.character_generator import Character
+
+    descriptions = ["男，30岁，西装革履", "女，28岁，优雅连衣裙", "男，60岁，慈祥老人", "女，年轻，休闲装"]
+    return [
+        Character(
+            id=f"char_{i}",
+            name=f"角色{i + 1}",
+            description=descriptions[i % len(descriptions)],
+            image_path="",
+            voice_model="default",
+            metadata={},
+        )
+        for i in range(num_characters)
+    ]
+
+
+def _peak_rss_mb() -> Optional[float]:
+    """进程峰值常驻内存（MB）"""
+    try:
+        import resource
+    except ImportError:
+        return None
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS 以字节为单位，Linux 以KB为单位
+    divisor = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return round(peak / divisor, 2)
+
+
+def run_case(case: Dict[str, Any]) -> Dict[str, Any]:
+    """运行单个用例"""
+    if case.get("kind") == "motion":
+        return run_motion_case(case)
+    if case.get("kind") == "interpolate":
+        return run_interpolation_case(case)
+    if case.get("kind") == "schedule":
+        return run_schedule_case(case)
+    if case.get("kind") == "batch":
+        return run_batch_case(case)
+    return run_render_case(case)
+
+
+def run_render_case(case: Dict[str, Any]) -> Dict[str, Any]:
+    """在临时工作目录中端到端运行 VideoGenerator"""
+    from models.video_generator import VideoGenerator
+    from models.latent_asset_store import LatentAssetStore
+    from models.tts_clip_cache import TTSClipCache
+
+    params = case["params"]
+    cwd = os.getcwd()
+
+    with tempfile.TemporaryDirectory(prefix="render_bench_") as work_dir:
+        os.chdir(work_dir)
+        try:
+            generator = VideoGenerator(load_models=False)
+            install_stub_models(generator)
+            generator.asset_store = LatentAssetStore(os.path.join(work_dir, "assets"))  # 每个用例从空资产库开始
+            generator.tts_cache = TTSClipCache(os.path.join(work_dir, "tts_clips"))  # 语音片段缓存同样从空开始
+            generator.resolution = tuple(params["resolution"])
+            generator.scene_duration = float(params["duration"])
+            generator.scene_timing = "fixed"  # 帧数由用例的场景时长决定，不随桩语音长度变化
+
+            script = _build_script(params["scenes"], params["characters"])
+            characters = _build_characters(params["characters"])
+
+            tracemalloc.start()
+            start = time.perf_counter()
+            video = generator.generate_video(script, characters, [])
+            wall_time = time.perf_counter() - start
+            _, traced_peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+        finally:
+            os.chdir(cwd)
+
+    frames = video.metadata.get("frames", 0)
+    stages = video.metadata.get("stage_timings", {})
+    return {
+        "name": case["name"],
+        "params": params,
+        "status": video.metadata.get("status", "unknown"),
+        "frames": frames,
+        "wall_time_s": round(wall_time, 4),
+        "frames_per_sec": round(frames / wall_time, 3) if wall_time > 0 else None,
+        "stage_latency_s": {stage: round(seconds, 4) for stage, seconds in stages.items()},
+        "frame_stage_ms_per_frame": round(1000 * stages.get("video_frames", 0.0) / frames, 3) if frames else None,
+        "compositor": video.metadata.get("compositor", {}),
+        "peak_traced_mb": round(traced_peak / (1024 * 1024), 2),
+        "peak_rss_mb": _peak_rss_mb(),
+    }
+
+
+def run_motion_case(case: Dict[str, Any]) -> Dict[str, Any]:
+    """在临时工作目录中运行 SVD 分块生成（逐块消费，不落盘）"""
+    from PIL import Image
+    from models.video_generator import SVDVideoGenerator
+
+    params = case["params"]
+    cwd = os.getcwd()
+
+    with tempfile.TemporaryDirectory(prefix="motion_bench_") as work_dir:
+        os.chdir(work_dir)
+        try:
+            generator = SVDVideoGenerator(load_model=False, use_cache=params.get("cached", False))
+            generator.pipe = StubSVDPipeline()
+            _stub_image(_seed_from("motion"), 1024, 576).save("input.png")
+
+            if params.get("cached"):
+                # 预热缓存，计时部分只测量命中后的读取
+                for _ in generator.generate_video_chunks("input.png", params["duration"]):
+                    pass
+
+            frames = 0
+            first_chunk_latency = None
+            tracemalloc.start()
+            start = time.perf_counter()
+            for chunk in generator.generate_video_chunks("input.png", params["duration"]):
+                if first_chunk_latency is None:
+                    first_chunk_latency = time.perf_counter() - start
+                frames += len(chunk)
+            wall_time = time.perf_counter() - start
+            _, traced_peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+        finally:
+            os.chdir(cwd)
+
+    return {
+        "name": case["name"],
+        "params": params,
+        "status": "completed" if frames == int(params["duration"] * generator.fps) else "incomplete",
+        "frames": frames,
+        "wall_time_s": round(wall_time, 4),
+        "frames_per_sec": round(frames / wall_time, 3) if wall_time > 0 else None,
+        "stage_latency_s": {"first_chunk": round(first_chunk_latency or 0.0, 4)},
+        "peak_traced_mb": round(traced_peak / (1024 * 1024), 2),
+        "peak_rss_mb": _peak_rss_mb(),
+    }
+
+
+def run_interpolation_case(case: Dict[str, Any]) -> Dict[str, Any]:
+    """测量 CPU 插帧吞吐量（输出帧/秒）"""
+    from models.frame_interpolator import FrameInterpolator
+
+    params = case["params"]
+    width, height = params["resolution"]
+    stub = StubSVDPipeline()
+    source = stub(_stub_image(_seed_from("interpolate"), width, height),
+                  num_frames=16, width=width, height=height).frames[0]
+
+    interpolator = FrameInterpolator(params["target_fps"], params["quality"])
+    tracemalloc.start()
+    start = time.perf_counter()
+    frames = sum(len(chunk) for chunk in interpolator.interpolate_chunks([source[:8], source[8:]], params["source_fps"]))
+    wall_time = time.perf_counter() - start
+    _, traced_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "name": case["name"],
+        "params": params,
+        "status": "completed" if frames == len(source) * params["target_fps"] // params["source_fps"] else "incomplete",
+        "frames": frames,
+        "wall_time_s": round(wall_time, 4),
+        "frames_per_sec": round(frames / wall_time, 3) if wall_time > 0 else None,
+        "stage_latency_s": {"interpolate": round(wall_time, 4)},
+        "peak_traced_mb": round(traced_peak / (1024 * 1024), 2),
+        "peak_rss_mb": _peak_rss_mb(),
+    }
+
+
+def run_schedule_case(case: Dict[str, Any]) -> Dict[str, Any]:
+    """在假设备槽位上测量调度吞吐量与利用率（任务和模型加载以 sleep 模拟）"""
+    from models.device_scheduler import DeviceScheduler
+    from models.memory_planner import MemoryPlanner
+
+    params = case["params"]
+    devices = [f"fake:{i}" for i in range(params["slots"])]
+
+    def load(slot, model):
+        time.sleep(params["load_time_s"])
+        return model
+
+    def job(slot):
+        time.sleep(params["job_time_s"])
+        return slot.device
+
+    # 模型内存按内存规划器估算（预算不设限，结果不随本机内存变化）；槽位放得下 SDXL + TTS，但 SVD 需要换出
+    model_memory = MemoryPlanner(device_budget_mb=1 << 30, host_budget_mb=1 << 30).peak_mb()
+    memory_mb = model_memory["sdxl"] + model_memory["tts"] + 1000
+    scheduler = DeviceScheduler.from_devices(devices, memory_mb=memory_mb, loader=load, model_memory=model_memory)
+    start = time.perf_counter()
+    futures = [
+        scheduler.submit(SCHEDULER_JOB_MIX[i % len(SCHEDULER_JOB_MIX)], job)
+        for i in range(params["jobs"])
+    ]
+    completed = sum(1 for future in futures if future.exception() is None)
+    wall_time = time.perf_counter() - start
+    metrics = scheduler.metrics()
+    scheduler.shutdown()
+
+    return {
+        "name": case["name"],
+        "params": params,
+        "status": "completed" if completed == params["jobs"] else "incomplete",
+        "frames": completed,
+        "wall_time_s": round(wall_time, 4),
+        "frames_per_sec": round(completed / wall_time, 3) if wall_time > 0 else None,
+        "stage_latency_s": {"schedule": round(wall_time, 4)},
+        "scheduler": metrics,
+        "peak_traced_mb": None,
+        "peak_rss_mb": _peak_rss_mb(),
+    }
+
+
+class _TimedStubSDXLPipeline(StubSDXLPipeline):
+    """按批大小计时的 SDXL 桩：固定开销在批内摊薄"""
+
+    def __call__(self, prompt, **kwargs):
+        batch_size = len(prompt) if isinstance(prompt, list) else 1
+        time.sleep(BATCH_FIXED_S + BATCH_PER_IMAGE_S * batch_size)
+        return super().__call__(prompt, **kwargs)
+
+
+def run_batch_case(case: Dict[str, Any]) -> Dict[str, Any]:
+    """并发客户端经 SDXL 微批处理器出图，测量吞吐量与单请求延迟（关闭合批时批大小为 1）"""
+    from concurrent.futures import ThreadPoolExecutor
+    from models.sdxl_batcher import SDXLMicroBatcher
+    from models.inference_profile import get_inference_profile
+    from models.prompt_embedding_cache import PromptEmbeddingCache
+    from models.quality_tiers import get_quality_tier
+
+    params = case["params"]
+    tier = get_quality_tier("draft")
+    batcher = SDXLMicroBatcher(
+        _TimedStubSDXLPipeline(), get_inference_profile(), PromptEmbeddingCache(),
+        max_batch_size=4 if params["batching"] else 1,
+    )
+
+    def request(index: int) -> float:
+        start = time.perf_counter()
+        batcher.generate(f"prompt {index}", 512, 512, tier)
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=params["clients"]) as pool:
+        latencies = list(pool.map(request, range(params["requests"])))
+    wall_time = time.perf_counter() - start
+    batcher.shutdown()
+
+    latencies.sort()
+    return {
+        "name": case["name"],
+        "params": params,
+        "status": "completed",
+        "frames": len(latencies),
+        "wall_time_s": round(wall_time, 4),
+        "frames_per_sec": round(len(latencies) / wall_time, 3) if wall_time > 0 else None,
+        "stage_latency_s": {
+            "request_p50": round(latencies[len(latencies) // 2], 4),
+            "request_max": round(latencies[-1], 4),
+        },
+        "batcher": dict(batcher.stats),
+        "peak_traced_mb": None,
+        "peak_rss_mb": _peak_rss_mb(),
+    }
+
+
+def _run_case_isolated(case: Dict[str, Any]) -> Dict[str, Any]:
+    """在独立子进程中运行用例，使峰值内存互不影响"""
+    ctx = multiprocessing.get_context("spawn")
+    with ctx.Pool(1) as pool:
+        return pool.apply(run_case, (case,))
+
+
+# ---------------------------------------------------------------------------
+# 结果输出与对比
+# ---------------------------------------------------------------------------
+
+def _git_commit() -> Optional[str]:
+    """当前提交哈希"""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=Path(__file__).parent, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+def _environment() -> Dict[str, Any]:
+    """运行环境信息"""
+    info = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+    try:
+        import torch
+        info["torch"] = torch.__version__
+        info["torch_threads"] = torch.get_num_threads()
+    except ImportError:
+        pass
+    return info
+
+
+def compare_results(current: Dict[str, Any], previous: Dict[str, Any]) -> None:
+    """打印与历史结果的对比"""
+    previous_cases = {case["name"]: case for case in previous.get("cases", [])}
+    print(f"\n📊 对比 {previous.get('git_commit')} -> {current.get('git_commit')}")
+    print(f"{'用例':<36}{'旧 fps':>10}{'新 fps':>10}{'变化':>10}")
+    for case in current["cases"]:
+        old = previous_cases.get(case["name"])
+        if not old or not old.get("frames_per_sec") or not case.get("frames_per_sec"):
+            print(f"{case['name']:<36}{'-':>10}{case.get('frames_per_sec') or '-':>10}{'-':>10}")
+            continue
+        change = (case["frames_per_sec"] / old["frames_per_sec"] - 1) * 100
+        print(f"{case['name']:<36}{old['frames_per_sec']:>10}{case['frames_per_sec']:>10}{change:>9.1f}%")
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="渲染管线基准测试（桩模型）")
+    parser.add_argument("--quick", action="store_true", help="运行快速用例矩阵")
+    parser.add_argument("--case", action="append", default=[], help="只运行指定名称的用例（可重复）")
+    parser.add_argument("-o", "--output", help="结果JSON输出路径")
+    parser.add_argument("--compare", help="与历史结果JSON对比")
+    parser.add_argument("--no-isolate", action="store_true", help="在当前进程中运行所有用例")
+    args = parser.parse_args()
+
+    cases = build_cases(args.quick)
+    if args.case:
+        cases = [case for case in cases if case["name"] in args.case]
+
+    print("🏁 渲染管线基准测试")
+    print("=" * 50)
+
+    results = []
+    for case in cases:
+        print(f"▶️  {case['name']}", flush=True)
+        result = run_case(case) if args.no_isolate else _run_case_isolated(case)
+        print(f"   {result['frames']} 帧, {result['frames_per_sec']} fps, 峰值RSS {result['peak_rss_mb']} MB")
+        results.append(result)
+
+    report = {
+        "schema": SCHEMA_VERSION,
+        "benchmark": "render_pipeline",
+        "git_commit": _git_commit(),
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "environment": _environment(),
+        "cases": results,
+    }
+
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        Path(args.output).write_text(output, encoding="utf-8")
+        print(f"\n💾 结果已保存: {args.output}")
+    else:
+        print(output)
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            compare_results(report, json.load(f))
+
+    failed = [result["name"] for result in results if result["status"] != "completed"]
+    if failed:
+        print(f"\n❌ 以下用例未完成: {', '.join(failed)}")
+        return False
+    return True
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
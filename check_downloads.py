@@ -5,11 +5,58 @@
 
 import os
 import sys
+import argparse
 from pathlib import Path
 import json
 
+# 添加backend目录到Python路径
+sys.path.append(str(Path(__file__).parent / "backend"))
+
+def check_model_store():
+    """检查本地模型快照库（清单与文件完整性）"""
+    from models.model_store import MODEL_SPECS, get_model_store
+    
+    store = get_model_store()
+    print(f"🗄️ 模型快照库: {store.store_dir}")
+    print("=" * 50)
+    
+    all_complete = True
+    for name in MODEL_SPECS:
+        manifest = store.manifest(name)
+        problems = store.verify(name)
+        if manifest is None:
+            all_complete = False
+            print(f"❌ {name} (未物化)")
+        elif problems:
+            all_complete = False
+            print(f"⚠️ {name} ({len(problems)} 个问题)")
+            for problem in problems[:5]:
+                print(f"   {problem}")
+        else:
+            print(f"✅ {name}")
+            print(f"   提交: {manifest['revision'][:12]}")
+            print(f"   文件数: {len(manifest['files'])}")
+            print(f"   大小: {manifest['total_bytes'] / (1024**3):.2f} GB")
+    
+    if not all_complete:
+        print("\n💡 物化缺失的模型: python check_downloads.py --materialize")
+    return all_complete
+
+def materialize_models(names):
+    """下载模型并物化到本地快照库"""
+    from models.model_store import MODEL_SPECS, get_model_store
+    
+    store = get_model_store()
+    for name in names or list(MODEL_SPECS):
+        try:
+            store.materialize(name)
+        except Exception as e:
+            print(f"❌ {name} 物化失败: {e}")
+            return False
+    return True
+
 def check_model_downloads():
-    """检查模型下载状态"""
+    """检查 Hugging Face 缓存中的模型下载状态"""
     print("🔍 检查AI模型下载状态")
     print("=" * 50)
     
@@ -114,39 +161,45 @@ def check_dependencies():
     return len(missing_deps) == 0
 
 def test_model_loading():
-    """测试模型加载"""
+    """测试模型加载（优先从快照库离线并行加载，并报告冷启动耗时）"""
     print("\n🧪 测试模型加载")
     print("=" * 30)
     
     try:
-        import torch
+        from models.model_store import get_model_store
+        from models.inference_profile import get_inference_profile
+        
+        store = get_model_store()
+        profile = get_inference_profile()
         
         # 测试图像生成模型
         print("测试 Stable Diffusion XL...")
-        from diffusers import StableDiffusionPipeline
-        pipeline = StableDiffusionPipeline.from_pretrained(
-            "stabilityai/stable-diffusion-xl-base-1.0",
-            torch_dtype=torch.float16,
-            safety_checker=None
-        )
+        from diffusers import StableDiffusionXLPipeline
+        pipeline = store.load_pipeline("sdxl", StableDiffusionXLPipeline, use_safetensors=True,
+                                       **profile.pretrained_kwargs())
         print("✅ Stable Diffusion XL 加载成功")
+        del pipeline
         
         # 测试视频生成模型
         print("测试 Stable Video Diffusion...")
         from diffusers import StableVideoDiffusionPipeline
-        svd_pipeline = StableVideoDiffusionPipeline.from_pretrained(
-            "stabilityai/stable-video-diffusion-img2vid-xt",
-            torch_dtype=torch.float16,
-            variant="fp16"
-        )
+        svd_pipeline = store.load_pipeline("svd", StableVideoDiffusionPipeline, **profile.pretrained_kwargs())
         print("✅ Stable Video Diffusion 加载成功")
+        del svd_pipeline
         
         # 测试语音合成模型
         print("测试 SpeechT5...")
-        from transformers import pipeline
-        tts_pipeline = pipeline("text-to-speech", model="microsoft/speecht5_tts")
+        from transformers import SpeechT5Processor, SpeechT5ForTextToSpeech, SpeechT5HifiGan
+        store.load_model("speecht5_tts", SpeechT5Processor)
+        store.load_model("speecht5_tts", SpeechT5ForTextToSpeech)
+        store.load_model("speecht5_hifigan", SpeechT5HifiGan)
         print("✅ SpeechT5 加载成功")
         
+        report = store.cold_start_report()
+        print(f"\n⏱️ 冷启动合计: {report['total_seconds']:.1f}s")
+        for timing in report["models"]:
+            print(f"   {timing['name']} ({timing['source']}): {timing['seconds']:.1f}s")
+        
         print("\n🎉 所有模型加载成功！")
         return True
         
@@ -156,11 +209,21 @@ def test_model_loading():
 
 def main():
     """主函数"""
+    parser = argparse.ArgumentParser(description="检查AI模型下载状态")
+    parser.add_argument("--materialize", nargs="*", metavar="MODEL",
+                        help="下载并物化模型到本地快照库（不指定名称时物化全部）")
+    args = parser.parse_args()
+    
+    if args.materialize is not None:
+        sys.exit(0 if materialize_models(args.materialize) else 1)
+    
     print("🔍 AI模型下载状态检查")
     print("=" * 60)
     
-    # 检查下载状态
-    downloads_ok = check_model_downloads()
+    # 检查快照库与 Hugging Face 缓存（任一完整即可加载）
+    store_ok = check_model_store()
+    print()
+    downloads_ok = check_model_downloads() or store_ok
     
     # 检查依赖
     deps_ok = check_dependencies()
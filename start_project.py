@@ -111,10 +111,16 @@ def setup_frontend():
     
     return True
 
-def start_backend():
-    """启动后端服务"""
+def start_backend(workers: int = 1):
+    """启动后端服务（多个工作进程时使用预分叉模式共享模型权重）"""
     print("🚀 启动后端服务...")
     try:
+        if workers > 1:
+            subprocess.run([
+                sys.executable, "backend/prefork_server.py",
+                "--host", "0.0.0.0", "--port", "8000", "--workers", str(workers)
+            ], check=True)
+            return
         subprocess.run([
             sys.executable, "-m", "uvicorn", "backend.main:app", 
             "--host", "0.0.0.0", "--port", "8000", "--reload"
@@ -193,6 +199,7 @@ def main():
     parser.add_argument("--install", action="store_true", help="安装依赖")
     parser.add_argument("--setup", action="store_true", help="初始化项目")
     parser.add_argument("--backend", action="store_true", help="启动后端服务")
+    parser.add_argument("--workers", type=int, default=1, help="后端工作进程数（大于 1 时预分叉并共享模型权重，仅 CPU）")
     parser.add_argument("--frontend", action="store_true", help="启动前端服务")
     parser.add_argument("--test", action="store_true", help="运行测试")
     parser.add_argument("--info", action="store_true", help="显示项目信息")
@@ -234,7 +241,7 @@ def main():
         return
     
     if args.backend:
-        start_backend()
+        start_backend(args.workers)
         return
     
     if args.frontend:
@@ -4,8 +4,18 @@
 """
 
 import os
+import sys
 import torch
 from datetime import datetime
+from pathlib import Path
+
+# 添加backend目录到Python路径
+sys.path.append(str(Path(__file__).parent / "backend"))
+
+from models.inference_profile import get_inference_profile
+
+# 模型精度与设备由推理配置决定（环境变量 AI_VIDEO_PROFILE）
+profile = get_inference_profile()
 
 def quick_test_stable_diffusion_xl():
     """快速测试 Stable Diffusion XL 模型加载"""
@@ -18,16 +28,11 @@ def quick_test_stable_diffusion_xl():
         print("🔄 加载模型...")
         pipeline = StableDiffusionXLPipeline.from_pretrained(
             "stabilityai/stable-diffusion-xl-base-1.0",
-            torch_dtype=torch.float16 if torch.cuda.is_available() else torch.float32,
-            variant="fp16" if torch.cuda.is_available() else None,
-            use_safetensors=True
+            use_safetensors=True,
+            **profile.pretrained_kwargs()
         )
-        
-        if torch.cuda.is_available():
-            pipeline = pipeline.to("cuda")
-            print("✅ 模型已加载到GPU")
-        else:
-            print("✅ 模型已加载到CPU")
+        pipeline = profile.prepare_pipeline(pipeline)
+        print(f"✅ 模型已加载到 {profile.device} ({profile.dtype})")
         
         # 检查模型组件
         print(f"   UNet: {type(pipeline.unet).__name__}")
@@ -56,15 +61,10 @@ def quick_test_stable_video_diffusion():
         print("🔄 加载模型...")
         pipeline = StableVideoDiffusionPipeline.from_pretrained(
             "stabilityai/stable-video-diffusion-img2vid-xt",
-            torch_dtype=torch.float16 if torch.cuda.is_available() else torch.float32,
-            variant="fp16" if torch.cuda.is_available() else None
+            **profile.pretrained_kwargs()
         )
-        
-        if torch.cuda.is_available():
-            pipeline = pipeline.to("cuda")
-            print("✅ 模型已加载到GPU")
-        else:
-            print("✅ 模型已加载到CPU")
+        pipeline = profile.prepare_pipeline(pipeline)
+        print(f"✅ 模型已加载到 {profile.device} ({profile.dtype})")
         
         # 检查模型组件
         print(f"   UNet: {type(pipeline.unet).__name__}")
@@ -102,12 +102,9 @@ def quick_test_speecht5():
         vocoder = SpeechT5HifiGan.from_pretrained("microsoft/speecht5_hifigan")
         print("✅ 声码器加载成功")
         
-        if torch.cuda.is_available():
-            model = model.to("cuda")
-            vocoder = vocoder.to("cuda")
-            print("✅ 模型已移动到GPU")
-        else:
-            print("✅ 模型在CPU上运行")
+        model = profile.prepare_module(model)
+        vocoder = profile.prepare_module(vocoder)
+        print(f"✅ 模型已移动到 {profile.device}")
         
         # 检查模型配置
         print(f"   词汇表大小: {model.config.vocab_size}")